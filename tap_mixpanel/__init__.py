@@ -8,8 +8,10 @@ import singer
 from singer import utils
 from singer.utils import strftime, strptime_to_utc
 
+from tap_mixpanel.cassette import REPLAY, Cassette
 from tap_mixpanel.client import MixpanelClient
 from tap_mixpanel.discover import discover as _discover
+from tap_mixpanel.rate_limiter import EXPORT_RATE_LIMIT, QUERY_RATE_LIMIT, RateLimiter
 from tap_mixpanel.sync import sync as _sync
 
 LOGGER = singer.get_logger()
@@ -24,20 +26,40 @@ REQUIRED_CONFIG_KEYS = [
 ]
 
 
-def do_discover(client, properties_flag):
+def do_discover(client, properties_flag, config=None):
     """Call the discovery function.
 
     Args:
         client (MixpanelClient): Client object to make http calls.
         properties_flag (str): Setting this argument to `true` ensures that new properties on
                                events and engage records are captured.
+        config (dict, optional): The tap config, for the replication of the streams.
     """
     LOGGER.info("Starting discover")
-    catalog = _discover(client, properties_flag)
+    catalog = _discover(client, properties_flag, config)
     json.dump(catalog.to_dict(), sys.stdout, indent=2)
     LOGGER.info("Finished discover")
 
 
+def get_rate_limit(config, key, default):
+    """Get the requests per second rate limit from the config.
+
+    Args:
+        config (dict): The tap config.
+        key (str): Config key of the rate limit.
+        default (float): Value used if the key is not passed.
+
+    Returns:
+        float: Requests per second, None if the requests are not paced.
+    """
+    if key not in config:
+        return default
+    # 0, "0", "" or null disable the pacing
+    if config[key] and float(config[key]):
+        return float(config[key])
+    return None
+
+
 @singer.utils.handle_top_exception(LOGGER)
 def main():
     """
@@ -71,11 +93,32 @@ def main():
     else:
         api_domain = "mixpanel.com"
 
+    # Requests per second paced up front for the export and query APIs
+    rate_limiter = RateLimiter(
+        export_rate_limit=get_rate_limit(
+            parsed_args.config, "export_rate_limit", EXPORT_RATE_LIMIT
+        ),
+        query_rate_limit=get_rate_limit(
+            parsed_args.config, "query_rate_limit", QUERY_RATE_LIMIT
+        ),
+    )
+
+    # Record the responses to a cassette directory, or replay them offline
+    cassette = None
+    if parsed_args.config.get("cassette_dir"):
+        cassette = Cassette(
+            parsed_args.config["cassette_dir"],
+            parsed_args.config.get("cassette_mode", REPLAY),
+        )
+
     with MixpanelClient(
         parsed_args.config["api_secret"],
         api_domain,
         request_timeout,
         parsed_args.config["user_agent"],
+        rate_limiter,
+        cassette,
+        parsed_args.config.get("api_base_url"),
     ) as client:
 
         state = {}
@@ -87,11 +130,11 @@ def main():
         properties_flag = config.get("select_properties_by_default")
 
         if parsed_args.discover:
-            do_discover(client, properties_flag)
+            do_discover(client, properties_flag, config)
         else:
             catalog = parsed_args.catalog
             if not catalog:
-                catalog = _discover(client, properties_flag)
+                catalog = _discover(client, properties_flag, config)
             _sync(
                 client=client,
                 config=config,
@@ -0,0 +1,408 @@
+"""Benchmark of the tap sync, stream by stream.
+
+Runs the sync of each stream against the local fake server (see fake_server.py)
+or offline from a recorded cassette, and reports per stream the records/sec,
+MB/sec of Singer output, requests issued, CPU time split between decode,
+transform and serialize, and peak RSS:
+
+    python -m tap_mixpanel.bench --output bench.json
+    python -m tap_mixpanel.bench --output bench.json --baseline baseline.json
+
+With --baseline, the exit code is 1 if any stream is slower than the baseline
+by more than --max-regression.
+"""
+
+import argparse
+import contextlib
+import importlib
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from importlib import metadata as importlib_metadata
+from unittest import mock
+
+import singer
+from singer import metadata
+
+from tap_mixpanel import decoder
+from tap_mixpanel.cassette import REPLAY, Cassette
+from tap_mixpanel.client import MixpanelClient
+from tap_mixpanel.discover import discover
+from tap_mixpanel.fake_server import FakeMixpanelServer, SyntheticData
+from tap_mixpanel.rate_limiter import RateLimiter
+from tap_mixpanel.streams import STREAMS
+from tap_mixpanel.sync import sync
+
+LOGGER = singer.get_logger()
+
+DECODE = "decode"
+TRANSFORM = "transform"
+SERIALIZE = "serialize"
+
+# Functions whose CPU time is accounted to each stage, as (stage, module, attribute).
+# A call made inside another profiled call is accounted to the outer stage only.
+PROFILED_FUNCTIONS = [
+    (DECODE, "tap_mixpanel.decoder", "JSON_LOADS"),
+    (DECODE, "requests.models", "Response.json"),
+    (TRANSFORM, "tap_mixpanel.streams", "transform_record"),
+    (TRANSFORM, "tap_mixpanel.streams", "normalize_datetime"),
+    (TRANSFORM, "singer.transform", "Transformer.transform"),
+    (TRANSFORM, "tap_mixpanel.record_transformer", "RecordTransformer.transform"),
+    (SERIALIZE, "singer.messages", "write_message"),
+    (SERIALIZE, "tap_mixpanel.output", "BufferedOutput.write_record"),
+    (SERIALIZE, "tap_mixpanel.output", "BufferedOutput.flush"),
+]
+
+BENCH_STREAMS = ["export", "engage", "funnels", "cohorts", "cohort_members", "annotations"]
+
+MB = 1024 * 1024
+
+
+class OutputCounter:
+    """Stand-in for stdout counting the Singer messages and bytes written."""
+
+    def __init__(self):
+        self.bytes = 0
+        self.records = 0
+
+    def write(self, data):
+        """Count the written message."""
+        self.bytes += len(data.encode("utf-8"))
+        self.records += data.count('{"type": "RECORD"')
+        return len(data)
+
+    def flush(self):
+        """Nothing is buffered."""
+
+
+class StageProfiler:
+    """Accumulator of the thread CPU time spent in the profiled functions."""
+
+    def __init__(self):
+        self.cpu_seconds = dict.fromkeys((DECODE, TRANSFORM, SERIALIZE), 0.0)
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+
+    def wrap(self, stage, function):
+        """Wrap the function to account its CPU time to the stage."""
+
+        @wraps(function)
+        def profiled(*args, **kwargs):
+            if getattr(self.__local, "active", False):
+                return function(*args, **kwargs)
+            self.__local.active = True
+            start = time.thread_time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.thread_time() - start
+                self.__local.active = False
+                with self.__lock:
+                    self.cpu_seconds[stage] += elapsed
+
+        return profiled
+
+    @contextlib.contextmanager
+    def patch(self):
+        """Patch the profiled functions."""
+        with contextlib.ExitStack() as stack:
+            for stage, module_name, attribute in PROFILED_FUNCTIONS:
+                target = importlib.import_module(module_name)
+                *owners, name = attribute.split(".")
+                for owner in owners:
+                    target = getattr(target, owner)
+                if hasattr(target, name):
+                    stack.enter_context(
+                        mock.patch.object(target, name, self.wrap(stage, getattr(target, name)))
+                    )
+            yield self
+
+
+class RequestCounter:
+    """Counter of the requests sent to the API or replayed from a cassette."""
+
+    def __init__(self):
+        self.count = 0
+        self.__lock = threading.Lock()
+
+    def wrap(self, function):
+        """Wrap the function to count its calls."""
+
+        @wraps(function)
+        def counted(*args, **kwargs):
+            with self.__lock:
+                self.count += 1
+            return function(*args, **kwargs)
+
+        return counted
+
+    @contextlib.contextmanager
+    def patch(self):
+        """Patch the functions sending or replaying the requests."""
+        with mock.patch("requests.Session.request", self.wrap(
+            __import__("requests").Session.request
+        )), mock.patch.object(Cassette, "replay", self.wrap(Cassette.replay)):
+            yield self
+
+
+def serve_fake_server(data_kwargs, url_queue):
+    """Serve the fake server, in its own process so its CPU is not measured."""
+    server = FakeMixpanelServer(SyntheticData(**data_kwargs))
+    url_queue.put(server.url)
+    server.serve_forever()
+
+
+def start_fake_server(data_kwargs):
+    """Start the fake server in a child process.
+
+    Args:
+        data_kwargs (dict): Arguments of the SyntheticData.
+
+    Returns:
+        tuple: Tuple of the server process and the server URL.
+    """
+    url_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve_fake_server, args=(data_kwargs, url_queue), daemon=True)
+    process.start()
+    return process, url_queue.get(timeout=30)
+
+
+def reset_peak_rss():
+    """Reset the peak RSS of the process, if the platform allows it.
+
+    Returns:
+        bool: True if the peak RSS was reset.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def get_peak_rss_mb():
+    """Get the peak RSS of the process, since the last reset if any, in MB."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+
+def select_stream(catalog, stream_name):
+    """Select only the stream in the catalog."""
+    for stream in catalog.streams:
+        mdata = metadata.to_map(stream.metadata)
+        mdata = metadata.write(mdata, (), "selected", stream.tap_stream_id == stream_name)
+        stream.metadata = metadata.to_list(mdata)
+    return catalog
+
+
+def get_package_version(name):
+    """Get the installed version of a package, None if it is not installed."""
+    try:
+        return importlib_metadata.version(name)
+    except importlib_metadata.PackageNotFoundError:
+        return None
+
+
+def bench_stream(client, config, catalog, stream_name):
+    """Run the sync of a single stream and measure it.
+
+    Args:
+        client (MixpanelClient): Client of the API or cassette.
+        config (dict): The tap config.
+        catalog (singer.Catalog): Catalog of the streams.
+        stream_name (str): Name of the stream to sync.
+
+    Returns:
+        dict: Measures of the stream sync.
+    """
+    select_stream(catalog, stream_name)
+    output = OutputCounter()
+    rss_reset = reset_peak_rss()
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    with StageProfiler().patch() as profiler, RequestCounter().patch() as requests_counter, \
+            contextlib.redirect_stdout(output):
+        sync(client, config, catalog, {}, config["start_date"])
+    seconds = time.perf_counter() - start
+    cpu_seconds = time.process_time() - cpu_start
+
+    other = cpu_seconds - sum(profiler.cpu_seconds.values())
+    output_mb = output.bytes / MB
+    return {
+        "records": output.records,
+        "seconds": round(seconds, 3),
+        "records_per_sec": round(output.records / seconds, 1) if seconds else None,
+        "output_mb": round(output_mb, 3),
+        "output_mb_per_sec": round(output_mb / seconds, 3) if seconds else None,
+        "requests": requests_counter.count,
+        "cpu_seconds": {
+            **{stage: round(value, 3) for stage, value in profiler.cpu_seconds.items()},
+            "other": round(max(other, 0), 3),
+            "total": round(cpu_seconds, 3),
+        },
+        # Without a reset, the peak RSS is the one of the whole process so far
+        "peak_rss_mb": round(get_peak_rss_mb(), 1),
+        "peak_rss_reset": rss_reset,
+    }
+
+
+def compare_results(results, baseline, max_regression):
+    """Compare the results to the baseline results.
+
+    Args:
+        results (dict): Results of this run.
+        baseline (dict): Results of the baseline run.
+        max_regression (float): Maximum accepted slowdown, e.g. 0.1 for 10%.
+
+    Returns:
+        list: Names of the streams slower than the baseline by more than max_regression.
+    """
+    regressions = []
+    for stream_name, stream_results in results["streams"].items():
+        baseline_results = baseline.get("streams", {}).get(stream_name)
+        if not baseline_results or not baseline_results.get("records_per_sec"):
+            continue
+        ratio = (stream_results["records_per_sec"] or 0) / baseline_results["records_per_sec"]
+        LOGGER.info(
+            "%s: %.1f records/sec, baseline %.1f records/sec (%.2fx)",
+            stream_name,
+            stream_results["records_per_sec"] or 0,
+            baseline_results["records_per_sec"],
+            ratio,
+        )
+        if ratio < 1 - max_regression:
+            regressions.append(stream_name)
+    return regressions
+
+
+def run(args):
+    """Run the benchmark of the selected streams.
+
+    Args:
+        args (argparse.Namespace): Command line arguments.
+
+    Returns:
+        dict: Environment and measures of each stream.
+    """
+    end_date = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    config = {
+        "api_secret": "bench",
+        "project_timezone": "UTC",
+        "attribution_window": 0,
+        "user_agent": "tap-mixpanel-bench",
+        "select_properties_by_default": "true",
+        "start_date": (end_date - timedelta(days=args.days)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "end_date": (end_date - timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+    if args.config:
+        with open(args.config, encoding="utf-8") as file:
+            config.update(json.load(file))
+
+    server_process = None
+    base_url = None
+    cassette = None
+    if args.cassette_dir:
+        cassette = Cassette(args.cassette_dir, REPLAY)
+    else:
+        server_process, base_url = start_fake_server({
+            "seed": args.seed,
+            "events_per_day": args.events_per_day,
+            "profiles": args.profiles,
+            "properties_per_profile": args.properties_per_profile,
+            "cohorts": args.cohorts,
+            "funnels": args.funnels,
+        })
+
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "singer-python": get_package_version("singer-python"),
+            "requests": get_package_version("requests"),
+            "json_backend": decoder.JSON_BACKEND,
+            "source": args.cassette_dir or "fake_server",
+        },
+        "arguments": {
+            key: value for key, value in vars(args).items()
+            if key not in ("output", "baseline", "max_regression")
+        },
+        "streams": {},
+    }
+    try:
+        with MixpanelClient(
+            config["api_secret"],
+            "mixpanel.com",
+            300,
+            config["user_agent"],
+            # Requests are not paced, the benchmark measures the tap itself
+            RateLimiter(None, None),
+            cassette,
+            base_url,
+        ) as client:
+            # Read by the discovery, as set by the tap's main
+            client.__api_domain = "mixpanel.com"  # pylint: disable=protected-access
+            catalog = discover(client, config["select_properties_by_default"])
+            for stream_name in args.streams.split(","):
+                if stream_name not in STREAMS:
+                    raise ValueError(f"Unknown stream {stream_name}.")
+                LOGGER.info("Benchmarking stream %s", stream_name)
+                results["streams"][stream_name] = bench_stream(client, config, catalog, stream_name)
+                LOGGER.info("%s: %s", stream_name, json.dumps(results["streams"][stream_name]))
+    finally:
+        if server_process:
+            server_process.terminate()
+            server_process.join()
+    return results
+
+
+def main():
+    """Run the benchmark and write the results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", default=",".join(BENCH_STREAMS), help="Comma separated streams")
+    parser.add_argument("--days", type=int, default=3, help="Days of export, funnels and annotations")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--events-per-day", type=int, default=20000)
+    parser.add_argument("--profiles", type=int, default=5000)
+    parser.add_argument("--properties-per-profile", type=int, default=50)
+    parser.add_argument("--cohorts", type=int, default=5)
+    parser.add_argument("--funnels", type=int, default=3)
+    parser.add_argument("--cassette-dir", help="Replay this cassette instead of the fake server")
+    parser.add_argument("--config", help="Tap config overriding the benchmark config")
+    parser.add_argument("--output", help="JSON file of the results")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument("--max-regression", type=float, default=0.1,
+                        help="Maximum accepted slowdown relative to the baseline")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare_results(results, baseline, args.max_regression)
+        if regressions:
+            LOGGER.error("Throughput regression for streams: %s", ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
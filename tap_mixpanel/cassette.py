@@ -0,0 +1,174 @@
+"""Record/replay of the HTTP responses received by the MixpanelClient."""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+import requests
+import singer
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3 import HTTPResponse
+
+LOGGER = singer.get_logger()
+
+RECORD = "record"
+REPLAY = "replay"
+CASSETTE_MODES = (RECORD, REPLAY)
+
+INDEX_FILE = "index.json"
+
+# Headers describing the transfer of the original body, not the recorded one
+TRANSFER_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+class CassetteError(Exception):
+    """Custom error for a request which is not recorded in the cassette."""
+
+
+class Cassette:
+    """Directory of recorded responses, indexed by method, URL and params.
+
+    Each response body is stored gzip compressed in its own file and the index
+    file maps the key of the request to its status code, headers and body file.
+
+    Args:
+        directory (str): Cassette directory.
+        mode (str): RECORD to capture the responses, REPLAY to serve them offline.
+    """
+
+    def __init__(self, directory, mode):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Invalid cassette_mode {mode}, expected one of {CASSETTE_MODES}.")
+        self.directory = directory
+        self.mode = mode
+        self.__lock = threading.Lock()
+        self.__index = {}
+
+        index_path = os.path.join(directory, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, encoding="utf-8") as file:
+                self.__index = json.load(file)
+        elif mode == REPLAY:
+            raise CassetteError(f"No cassette found in {directory}.")
+        os.makedirs(directory, exist_ok=True)
+        LOGGER.info("Cassette %s mode, directory: %s", mode, directory)
+
+    @staticmethod
+    def get_key(method, url, params=None):
+        """Get the key of a request from its method, URL and params.
+
+        Args:
+            method (str): HTTP request method.
+            url (str): URL of the request.
+            params (dict|str, optional): Query params. Defaults to None.
+
+        Returns:
+            tuple: Tuple of the key and the full URL of the request.
+        """
+        full_url = requests.Request(method, url, params=params).prepare().url
+        key = hashlib.sha256(f"{method.upper()} {full_url}".encode("utf-8")).hexdigest()
+        return key, full_url
+
+    def write_index(self):
+        """Write the index file atomically."""
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.__index, file, indent=2, sort_keys=True)
+        os.replace(tmp_path, index_path)
+
+    def record(self, method, url, params, response, stream=False):
+        """Store the response in the cassette.
+
+        A streamed response is downloaded to the cassette first and served from it,
+        so the caller reads exactly the recorded body.
+
+        Args:
+            method (str): HTTP request method.
+            url (str): URL of the request.
+            params (dict|str): Query params.
+            response (requests.Response): Response to record.
+            stream (bool, optional): True if the response body is not read yet. Defaults to False.
+
+        Returns:
+            requests.Response: Response with the same body.
+        """
+        key, full_url = self.get_key(method, url, params)
+        body_file = f"{key}.gz"
+        body_path = os.path.join(self.directory, body_file)
+        tmp_path = f"{body_path}.tmp"
+
+        if not stream:
+            with open(tmp_path, "wb") as file:
+                file.write(gzip.compress(response.content))
+        elif response.headers.get("Content-Encoding", "").lower() == "gzip":
+            # Keep the body as transferred, it is already gzip compressed
+            with open(tmp_path, "wb") as file:
+                for chunk in response.raw.stream(1024 * 1024, decode_content=False):
+                    file.write(chunk)
+        else:
+            with gzip.open(tmp_path, "wb") as file:
+                for chunk in response.raw.stream(1024 * 1024, decode_content=True):
+                    file.write(chunk)
+        os.replace(tmp_path, body_path)
+
+        headers = {
+            name: value
+            for name, value in response.headers.items()
+            if name.lower() not in TRANSFER_HEADERS
+        }
+        with self.__lock:
+            self.__index[key] = {
+                "method": method.upper(),
+                "url": full_url,
+                "status_code": response.status_code,
+                "headers": headers,
+                "body": body_file,
+            }
+            self.write_index()
+        LOGGER.info("Recorded response of %s %s", method, full_url)
+
+        if stream:
+            return self.replay(method, url, params)
+        return response
+
+    def replay(self, method, url, params=None):
+        """Serve the recorded response of a request.
+
+        Args:
+            method (str): HTTP request method.
+            url (str): URL of the request.
+            params (dict|str, optional): Query params. Defaults to None.
+
+        Raises:
+            CassetteError: Raises if the request is not recorded in the cassette.
+
+        Returns:
+            requests.Response: Recorded response, with its gzip compressed body.
+        """
+        key, full_url = self.get_key(method, url, params)
+        with self.__lock:
+            entry = self.__index.get(key)
+        if entry is None:
+            raise CassetteError(f"No recorded response for {method} {full_url}.")
+
+        headers = CaseInsensitiveDict(entry["headers"])
+        headers["Content-Encoding"] = "gzip"
+        body_path = os.path.join(self.directory, entry["body"])
+
+        response = requests.Response()
+        response.status_code = entry["status_code"]
+        response.url = entry["url"]
+        response.headers = headers
+        response.encoding = get_encoding_from_headers(headers)
+        response.raw = HTTPResponse(
+            body=open(body_path, "rb"),  # pylint: disable=consider-using-with
+            headers=dict(headers),
+            status=entry["status_code"],
+            preload_content=False,
+            decode_content=True,
+        )
+        return response
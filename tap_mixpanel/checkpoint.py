@@ -0,0 +1,78 @@
+"""Day boundaries of the export records within a date window, see `export_day_checkpoints`.
+
+The export of a date window is written before its bookmark, so a failure
+late in a long window starts the whole window over. The export API returns
+the events of a window day by day, in the project timezone. Once the first
+event of a day is read, the earlier days are complete and the bookmark can be
+written: a restarted sync resumes from the last complete day.
+
+The order of the days is checked for every event. An event of an earlier day
+means the export is not in day order. Checkpoints then stop for the rest of the
+window, and the bookmark written before the window is restored.
+"""
+
+from operator import itemgetter
+
+import singer
+
+from tap_mixpanel.transform import get_project_day
+
+LOGGER = singer.get_logger()
+
+# Status of the parts of a batch split by DayCheckpoints.split
+DAY_CONTINUES = "day_continues"
+DAY_FINISHED = "day_finished"
+OUT_OF_ORDER = "out_of_order"
+
+
+class DayCheckpoints:
+    """Tracker of the current export day of a date window.
+
+    Args:
+        project_timezone (str): Time zone of the project, the export days.
+        get_time (callable, optional): Get the normalized event time of a record.
+                                       Defaults to the `time` of the record.
+    """
+
+    def __init__(self, project_timezone, get_time=itemgetter("time")):
+        self.project_timezone = project_timezone
+        self.get_time = get_time
+        self.day = None
+        self.enabled = True
+
+    def split(self, records):
+        """Split a batch of records at the day boundaries.
+
+        Args:
+            records (list): Batch of records, in export order.
+
+        Yields:
+            tuple: Consecutive parts of the batch, with their status: DAY_FINISHED if
+                   the part completes a day, OUT_OF_ORDER if the next part starts with
+                   an event of an earlier day, otherwise DAY_CONTINUES.
+        """
+        start = 0
+        if self.enabled:
+            for index, record in enumerate(records):
+                event_time = self.get_time(record)
+                if not event_time:
+                    continue
+                day = get_project_day(event_time, self.project_timezone)
+                if self.day is None or day == self.day:
+                    self.day = day
+                elif day > self.day:
+                    yield records[start:index], DAY_FINISHED
+                    start = index
+                    self.day = day
+                else:
+                    LOGGER.warning(
+                        "Export event of %s after an event of %s, day checkpoints are disabled "
+                        "for the rest of the date window",
+                        day,
+                        self.day,
+                    )
+                    self.enabled = False
+                    yield records[start:index], OUT_OF_ORDER
+                    start = index
+                    break
+        yield records[start:], DAY_CONTINUES
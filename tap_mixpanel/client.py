@@ -1,13 +1,18 @@
 import base64
+import threading
+from urllib.parse import urlparse
 
 import backoff
-import jsonlines
 import requests
 import singer
 from requests.exceptions import ChunkedEncodingError, ConnectionError, Timeout
 from requests.models import ProtocolError
 from singer import metrics
 
+from tap_mixpanel.cassette import RECORD, REPLAY
+from tap_mixpanel.decoder import iter_jsonl, iter_response_chunks
+from tap_mixpanel.rate_limiter import RateLimiter
+
 LOGGER = singer.get_logger()
 
 BACKOFF_MAX_TRIES_REQUEST = 7
@@ -135,14 +140,34 @@ class MixpanelClient:
     """
     The client class used for making REST calls to the Mixpanel API.
     """
-    def __init__(self, api_secret, api_domain, request_timeout, user_agent=None):
+    def __init__(
+        self,
+        api_secret,
+        api_domain,
+        request_timeout,
+        user_agent=None,
+        rate_limiter=None,
+        cassette=None,
+        base_url=None,
+    ):
         self.__api_secret = api_secret
         self.__api_domain = api_domain
         self.__request_timeout = request_timeout
         self.__user_agent = user_agent
+        # One rate limiter per client, shared by all the streams and worker threads
+        self.__rate_limiter = rate_limiter or RateLimiter()
+        # Optional cassette to record the responses or replay them offline
+        self.__cassette = cassette
+        # Optional base URL (e.g. a local fake server) replacing the scheme and host of the requests
+        self.__base_url = base_url
         self.__session = requests.Session()
         self.__verified = False
         self.disable_engage_endpoint = False
+        # Responses received and their decompressed bytes, to size the date windows,
+        #   counted by the worker threads under the lock
+        self.response_count = 0
+        self.response_bytes = 0
+        self.__counters_lock = threading.Lock()
 
     def __enter__(self):
         self.__verified = self.check_access()
@@ -151,6 +176,33 @@ class MixpanelClient:
     def __exit__(self, exception_type, exception_value, traceback):
         self.__session.close()
 
+    def count_response(self, responses=0, response_bytes=0):
+        """Add to the responses received and their decompressed bytes, from any thread.
+
+        Args:
+            responses (int, optional): Number of responses. Defaults to 0.
+            response_bytes (int, optional): Decompressed bytes. Defaults to 0.
+        """
+        with self.__counters_lock:
+            self.response_count += responses
+            self.response_bytes += response_bytes
+
+    def get_session_url(self, url):
+        """Get the URL to send the request to, on the base URL if one is set.
+
+        The rate limiter and the cassette keep using the original URL.
+
+        Args:
+            url (str): URL of the request.
+
+        Returns:
+            str: URL with the scheme and host of the base URL.
+        """
+        if not self.__base_url:
+            return url
+        base_url = urlparse(self.__base_url)
+        return urlparse(url)._replace(scheme=base_url.scheme, netloc=base_url.netloc).geturl()
+
     @backoff.on_exception(
         backoff.expo,
         (Server5xxError, Server429Error, ReadTimeoutError, ConnectionError, Timeout, ProtocolError),
@@ -170,6 +222,9 @@ class MixpanelClient:
         """
         if self.__api_secret is None:
             raise Exception("Error: Missing api_secret in tap config.json.")
+        if self.__cassette and self.__cassette.mode == REPLAY:
+            # Offline replay, the credentials are not used
+            return True
         headers = {}
         # Endpoint: simple API call to return a single record (org settings) to test access
         url = f"https://{self.__api_domain}/api/2.0/engage"
@@ -180,15 +235,17 @@ class MixpanelClient:
             "Authorization"
         ] = f"Basic {str(base64.urlsafe_b64encode(self.__api_secret.encode('utf-8')), 'utf-8')}"
 
+        self.__rate_limiter.acquire(url)
         try:
             response = self.__session.get(
-                url=url,
+                url=self.get_session_url(url),
                 timeout=self.__request_timeout,  # Request timeout parameter
                 headers=headers,
             )
         except requests.exceptions.Timeout as err:
             LOGGER.error("TIMEOUT ERROR: %s", str(err))
             raise ReadTimeoutError from None
+        self.__rate_limiter.update_from_response(url, response)
 
         if response.status_code == 402:
             # 402 Payment Requirement does not indicate a permissions or authentication error
@@ -230,22 +287,31 @@ class MixpanelClient:
         Returns:
             dict: With status code 200, returns JSON formatted response.
         """
+        if self.__cassette and self.__cassette.mode == REPLAY:
+            return self.__cassette.replay(method, url, params)
+
+        # Pace the request up front, rather than waiting for a 429
+        self.__rate_limiter.acquire(url)
         try:
             response = self.__session.request(
                 method=method,
-                url=url,
+                url=self.get_session_url(url),
                 params=params,
                 json=json,
                 stream=stream,
                 timeout=self.__request_timeout,  # Request timeout parameter
                 **kwargs,
             )
+            self.__rate_limiter.update_from_response(url, response)
 
             if response.status_code > 500:
                 raise Server5xxError()
 
             if response.status_code != 200:
                 raise_for_error(response)
+
+            if self.__cassette and self.__cassette.mode == RECORD:
+                response = self.__cassette.record(method, url, params, response, stream)
             return response
         except requests.exceptions.Timeout as err:
             LOGGER.error("TIMEOUT ERROR: %s", str(err))
@@ -264,6 +330,24 @@ class MixpanelClient:
         Returns:
             dict: JSON object of response.
         """
+        response_json, _ = self.request_with_size(
+            method, url=url, path=path, params=params, json=json, **kwargs
+        )
+        return response_json
+
+    def request_with_size(self, method, url=None, path=None, params=None, json=None, **kwargs):
+        """Request method to return JSON response of HTTP call, with the size of the response.
+
+        Args:
+            method (str): GET or POST method.
+            url (str, optional): Base URL. Defaults to None.
+            path (str, optional): Path for the stream. Defaults to None.
+            params (dict, optional): Query params. Defaults to None.
+            json (dict, optional): JSON data (For POST requests). Defaults to None.
+
+        Returns:
+            tuple: JSON object of response and the decompressed bytes of the response.
+        """
         if not self.__verified:
             self.__verified = self.check_access()
 
@@ -299,13 +383,14 @@ class MixpanelClient:
 
             timer.tags[metrics.Tag.http_status_code] = response.status_code
 
+        self.count_response(responses=1, response_bytes=len(response.content))
         response_json = response.json()
-        return response_json
+        return response_json, len(response.content)
 
-    def request_export(
+    def request_export_chunks(
         self, method, url=None, path=None, params=None, json=None, **kwargs
     ):
-        """Method to read jsonline from export stream response.
+        """Method to read the decompressed jsonl body of the export stream response in chunks.
 
         Args:
             method (str): HTTP request method.
@@ -315,7 +400,7 @@ class MixpanelClient:
             json (dict, optional): JSON data (For POST request). Defaults to None.
 
         Yields:
-            dict: Records of export stream.
+            bytes: Chunks of the jsonl body, lines may span chunks.
         """
         if not self.__verified:
             self.__verified = self.check_access()
@@ -335,6 +420,8 @@ class MixpanelClient:
             kwargs["headers"] = {}
 
         kwargs["headers"]["Accept"] = "application/json"
+        # The jsonl export body is highly repetitive, request it compressed
+        kwargs["headers"]["Accept-Encoding"] = "gzip"
 
         if self.__user_agent:
             kwargs["headers"]["User-Agent"] = self.__user_agent
@@ -345,14 +432,45 @@ class MixpanelClient:
         kwargs["headers"][
             "Authorization"
         ] = f"Basic {str(base64.urlsafe_b64encode(self.__api_secret.encode('utf-8')), 'utf-8')}"
-        with metrics.http_request_timer(endpoint) as timer:
+        tags = {metrics.Tag.endpoint: endpoint}
+        with metrics.http_request_timer(endpoint) as timer, metrics.Counter(
+            "http_compressed_bytes", tags
+        ) as compressed_counter, metrics.Counter(
+            "http_decompressed_bytes", tags
+        ) as decompressed_counter:
             response = self.perform_request(
                 method=method, url=url, params=params, json=json, stream=True, **kwargs
             )
             timer.tags[metrics.Tag.http_status_code] = response.status_code
+            self.count_response(responses=1)
+
+            # The body is decompressed incrementally
+            for chunk in iter_response_chunks(
+                response, compressed_counter, decompressed_counter
+            ):
+                self.count_response(response_bytes=len(chunk))
+                yield chunk
 
-            # 'export' endpoint returns jsonl results;
-            #  Other endpoints return json with array of results
-            #  jsonlines reference: https://jsonlines.readthedocs.io/en/latest/
-            reader = jsonlines.Reader(response.iter_lines())
-            yield from reader.iter(allow_none=True, skip_empty=True)
+    def request_export(
+        self, method, url=None, path=None, params=None, json=None, **kwargs
+    ):
+        """Method to read jsonline from export stream response.
+
+        Args:
+            method (str): HTTP request method.
+            url (str, optional): Base URL for the export endpoint. Defaults to None.
+            path (str, optional): Path to the stream(export). Defaults to None.
+            params (dict, optional): Request calls params. Defaults to None.
+            json (dict, optional): JSON data (For POST request). Defaults to None.
+
+        Yields:
+            dict: Records of export stream.
+        """
+        # 'export' endpoint returns jsonl results;
+        #  Other endpoints return json with array of results
+        #  The body is split into lines over bytes and decoded with the fastest JSON backend
+        yield from iter_jsonl(
+            self.request_export_chunks(
+                method, url=url, path=path, params=params, json=json, **kwargs
+            )
+        )
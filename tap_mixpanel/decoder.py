@@ -0,0 +1,245 @@
+"""Decoder for the JSON lines (jsonl) responses of the export endpoint."""
+
+import json
+import zlib
+
+import jsonlines
+import singer
+from requests.exceptions import ChunkedEncodingError, ConnectionError, ContentDecodingError
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+LOGGER = singer.get_logger()
+
+# Size of the raw chunks read from the export response
+EXPORT_CHUNK_SIZE = 1024 * 1024
+
+# zlib window bits of the gzip format
+GZIP_WBITS = zlib.MAX_WBITS | 16
+
+# Integers out of the 64 bits range are decoded as floats by the fast JSON backends
+OVERFLOW_FLOAT = 2.0 ** 63
+
+
+def has_overflow_float(value):
+    """Check if a decoded JSON value has a float which may be an overflowed integer.
+
+    Args:
+        value (object): Decoded JSON value.
+
+    Returns:
+        bool: True if any float of the value is out of the 64 bits integer range.
+    """
+    value_type = type(value)
+    if value_type is dict:
+        values = value.values()
+    elif value_type is list:
+        values = value
+    else:
+        values = (value,)
+
+    for item in values:
+        item_type = type(item)
+        if item_type is float:
+            if item >= OVERFLOW_FLOAT or item <= -OVERFLOW_FLOAT:
+                return True
+        elif item_type is dict or item_type is list:
+            if has_overflow_float(item):
+                return True
+    return False
+
+
+def stdlib_loads(line):
+    """Decode a JSON line with the standard library, as jsonlines.Reader does.
+
+    Args:
+        line (bytes): UTF-8 encoded JSON line.
+
+    Returns:
+        object: Decoded JSON value.
+    """
+    return json.loads(line.decode("utf-8"))
+
+
+def get_json_loads():
+    """Get the fastest JSON decoder available: orjson, simdjson or the standard library.
+
+    The optional backends are only used when they are installed. Lines which a
+    fast backend rejects, or which may have an integer out of the 64 bits range
+    decoded as a float, are decoded again with the standard library, so the
+    decoded records do not depend on the backend.
+
+    Returns:
+        tuple: Tuple of the backend name and its loads function for a bytes line.
+    """
+    try:
+        import orjson  # pylint: disable=import-outside-toplevel
+
+        fast_loads = orjson.loads
+        backend = "orjson"
+    except ImportError:
+        try:
+            import simdjson  # pylint: disable=import-outside-toplevel
+
+            fast_loads = simdjson.loads
+            backend = "simdjson"
+        except ImportError:
+            return "json", stdlib_loads
+
+    def loads(line):
+        try:
+            value = fast_loads(line)
+        except ValueError:
+            return stdlib_loads(line)
+        if has_overflow_float(value):
+            return stdlib_loads(line)
+        return value
+
+    return backend, loads
+
+
+JSON_BACKEND, JSON_LOADS = get_json_loads()
+
+
+def iter_raw_chunks(response):
+    """Read the raw, still compressed, chunks of a streamed response.
+
+    The urllib3 errors are raised as the requests errors iter_content raises,
+    so the callers retry on the same errors (e.g. ChunkedEncodingError).
+
+    Args:
+        response (requests.Response): Streamed response.
+
+    Yields:
+        bytes: Raw chunks of the response body.
+    """
+    try:
+        yield from response.raw.stream(EXPORT_CHUNK_SIZE, decode_content=False)
+    except ProtocolError as err:
+        raise ChunkedEncodingError(err) from err
+    except ReadTimeoutError as err:
+        raise ConnectionError(err) from err
+
+
+def gunzip(chunks):
+    """Decompress gzip chunks incrementally, including multi-member gzip bodies.
+
+    Args:
+        chunks (iterable): Chunks of a gzip body.
+
+    Raises:
+        ContentDecodingError: Raises if the body is not valid gzip.
+
+    Yields:
+        bytes: Decompressed chunks.
+    """
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    try:
+        for chunk in chunks:
+            while chunk:
+                data = decompressor.decompress(chunk)
+                if data:
+                    yield data
+                if not decompressor.eof:
+                    break
+                # Start the next gzip member
+                chunk = decompressor.unused_data
+                decompressor = zlib.decompressobj(GZIP_WBITS)
+        data = decompressor.flush()
+    except zlib.error as err:
+        raise ContentDecodingError(err) from err
+    if data:
+        yield data
+
+
+def count_bytes(chunks, counter):
+    """Increment the counter by the size of each chunk.
+
+    Args:
+        chunks (iterable): Bytes chunks.
+        counter (singer.metrics.Counter): Counter of the bytes.
+
+    Yields:
+        bytes: The same chunks.
+    """
+    for chunk in chunks:
+        counter.increment(len(chunk))
+        yield chunk
+
+
+def iter_response_chunks(response, compressed_counter, decompressed_counter):
+    """Read the decompressed body of a streamed response in large chunks.
+
+    A gzip body is read raw and decompressed incrementally, so both its transferred
+    (compressed) and decompressed sizes are counted. Other bodies are read with
+    iter_content and both counters get the same sizes.
+
+    Args:
+        response (requests.Response): Streamed response.
+        compressed_counter (singer.metrics.Counter): Counter of the transferred bytes.
+        decompressed_counter (singer.metrics.Counter): Counter of the decompressed bytes.
+
+    Yields:
+        bytes: Decompressed chunks of the response body.
+    """
+    headers = getattr(response, "headers", None) or {}
+    if headers.get("Content-Encoding", "").lower() == "gzip":
+        chunks = gunzip(count_bytes(iter_raw_chunks(response), compressed_counter))
+    else:
+        chunks = count_bytes(
+            response.iter_content(chunk_size=EXPORT_CHUNK_SIZE), compressed_counter
+        )
+    yield from count_bytes(chunks, decompressed_counter)
+
+
+def iter_lines(chunks):
+    """Split raw byte chunks into lines, like requests.Response.iter_lines.
+
+    Args:
+        chunks (iterable): Raw bytes chunks of the response body.
+
+    Yields:
+        bytes: Lines of the response body.
+    """
+    pending = b""
+    for chunk in chunks:
+        if pending:
+            chunk = pending + chunk
+        lines = chunk.splitlines()
+        # Keep the incomplete last line for the next chunk
+        if lines and chunk[-1:] not in (b"\n", b"\r"):
+            pending = lines.pop()
+        else:
+            pending = b""
+        yield from lines
+
+    if pending:
+        yield pending
+
+
+def iter_jsonl(chunks, loads=None):
+    """Decode the JSON lines of raw byte chunks.
+
+    Yields the same values as jsonlines.Reader(lines).iter(allow_none=True, skip_empty=True).
+
+    Args:
+        chunks (iterable): Raw bytes chunks of the response body.
+        loads (callable, optional): Decoder of a bytes line. Defaults to the fastest backend found.
+
+    Raises:
+        jsonlines.InvalidLineError: Raises if a line is not valid JSON.
+
+    Yields:
+        object: Decoded JSON value of each non-empty line.
+    """
+    loads = loads or JSON_LOADS
+    for lineno, line in enumerate(iter_lines(chunks), 1):
+        try:
+            value = loads(line)
+        except ValueError as err:
+            # Skip empty lines and lines containing only whitespace
+            if not line.strip():
+                continue
+            raise jsonlines.InvalidLineError(
+                f"line contains invalid json: {err}", line, lineno
+            ) from err
+        yield value
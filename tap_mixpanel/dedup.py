@@ -0,0 +1,151 @@
+"""Disk-backed index of the export events already emitted, see `dedup_index_path`.
+
+Every incremental sync re-exports the last `attribution_window` days and the
+events on or after the bookmark are written again. DedupIndex keeps a compact
+key of every emitted event in a SQLite table, so the events emitted by an
+earlier sync are dropped before they are serialized.
+
+The keys follow the Mixpanel deduplication of the events: event name,
+distinct_id, time and $insert_id. They are hashed to 12 bytes and stored with
+the day of the event, so the entries older than the attribution window are
+expired at the start of each sync.
+
+The keys are committed only after the STATE message covering their records is
+written: if the sync fails before, the records are emitted again by the next
+sync instead of being lost.
+"""
+
+import hashlib
+import os
+import sqlite3
+from datetime import date
+
+import singer
+from singer.utils import strptime_to_utc
+
+LOGGER = singer.get_logger()
+
+# Size in bytes of the stored event keys
+KEY_SIZE = 12
+# Keys looked up by a single query, below the SQLite limit of bound parameters
+LOOKUP_SIZE = 500
+
+
+def get_dedup_entry(record):
+    """Get the key and the day of an export event.
+
+    Args:
+        record (dict): Export record, with its converted event time.
+
+    Returns:
+        tuple: Key of the event as bytes and day of the event as a proleptic Gregorian ordinal.
+    """
+    insert_id = record.get("$insert_id") or record.get("mp_reserved_insert_id")
+    event_time = record.get("time")
+    key = "\x00".join(
+        str(value or "") for value in (record.get("event"), record.get("distinct_id"), event_time, insert_id)
+    )
+    try:
+        day = date.fromisoformat(str(event_time)[:10]).toordinal()
+    except ValueError:
+        # Expired by the next sync
+        day = 0
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=KEY_SIZE).digest(), day
+
+
+class DedupIndex:
+    """SQLite index of the keys of the emitted export events.
+
+    Args:
+        path (str): Path of the SQLite database, created if it does not exist.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS emitted (key BLOB PRIMARY KEY, day INTEGER NOT NULL) WITHOUT ROWID"
+        )
+        self.connection.commit()
+        self.dropped = 0
+
+    def expire(self, oldest_datetime):
+        """Delete the keys of the events before the day of oldest_datetime.
+
+        Args:
+            oldest_datetime (str): Oldest date-time of the events which may be exported again.
+        """
+        oldest_day = strptime_to_utc(oldest_datetime).date().toordinal()
+        expired = self.connection.execute("DELETE FROM emitted WHERE day < ?", (oldest_day,)).rowcount
+        self.connection.commit()
+        LOGGER.info(
+            "Dedup index %s: expired %s events before %s", self.path, expired, date.fromordinal(oldest_day)
+        )
+
+    def get_emitted(self, keys):
+        """Get the keys already in the index.
+
+        Args:
+            keys (list): Keys of the events.
+
+        Returns:
+            set: Keys already in the index.
+        """
+        emitted = set()
+        for index in range(0, len(keys), LOOKUP_SIZE):
+            lookup = keys[index:index + LOOKUP_SIZE]
+            rows = self.connection.execute(
+                f"SELECT key FROM emitted WHERE key IN ({','.join('?' * len(lookup))})", lookup
+            )
+            emitted.update(row[0] for row in rows)
+        return emitted
+
+    def drop_emitted(self, records, entries):
+        """Drop the records already emitted, and add the others to the index.
+
+        The added keys are committed by commit, once the records are written.
+
+        Args:
+            records (list): Records to write.
+            entries (list): Key and day of each record, see get_dedup_entry.
+
+        Returns:
+            list: Records not emitted yet, in the same order.
+        """
+        if not records:
+            return records
+        emitted = self.get_emitted(list({key for key, _ in entries}))
+        new_records = []
+        new_entries = []
+        for record, entry in zip(records, entries):
+            # Duplicates within the batch are dropped too
+            if entry[0] in emitted:
+                continue
+            emitted.add(entry[0])
+            new_records.append(record)
+            new_entries.append(entry)
+
+        self.connection.executemany("INSERT OR IGNORE INTO emitted VALUES (?, ?)", new_entries)
+        dropped = len(records) - len(new_records)
+        if dropped:
+            self.dropped += dropped
+            LOGGER.info("Dropped %s export records already emitted", dropped)
+        return new_records
+
+    def commit(self):
+        """Commit the keys of the written records, after their STATE message."""
+        self.connection.commit()
+
+    def close(self):
+        """Close the index, discarding the keys which are not committed."""
+        LOGGER.info("Dedup index %s: dropped %s export records already emitted", self.path, self.dropped)
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
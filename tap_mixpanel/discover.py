@@ -4,18 +4,19 @@ from tap_mixpanel.schema import get_schemas
 from tap_mixpanel.streams import STREAMS
 
 
-def discover(client, properties_flag):
+def discover(client, properties_flag, config=None):
     """Run the discovery mode, prepare the catalog file and return catalog.
 
     Args:
         client (MixpanelClient): Client object to make http calls.
         properties_flag (str): Setting this argument to `true` ensures that new properties on
                                events and engage records are captured.
+        config (dict, optional): The tap config, for the replication of the streams.
 
     Returns:
         singer.Catalog: Catalog object having schema and metadata of all the streams.
     """
-    schemas, field_metadata = get_schemas(client, properties_flag)
+    schemas, field_metadata = get_schemas(client, properties_flag, config)
     catalog = Catalog([])
 
     for stream_name, schema_dict in schemas.items():
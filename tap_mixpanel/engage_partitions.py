@@ -0,0 +1,240 @@
+"""Engage profiles scanned as concurrent partitions, see `engage_partitions`.
+
+The engage endpoint pages through the profiles one page at a time, each page
+needing the session_id of the first one. The profiles are instead split into
+disjoint ranges of their distinct_id with `where` expressions, and the ranges
+are paged concurrently, a page of each range at a time.
+
+The range bounds are quantiles of a sample of the distinct_ids: the first,
+unfiltered page and up to SAMPLE_PAGES - 1 pages spread over its session, so
+they follow the format and the distribution of the distinct_ids of the
+project. The first page of every range is requested before any profile is
+written: their totals must cover the total of the unfiltered page, otherwise
+some profiles match no range and the profiles are paged sequentially instead.
+The profiles are also paged sequentially if the largest range has more than
+MAX_PARTITION_SKEW times its even share of the profiles, as the ranges would
+then mostly be paged one after the other.
+"""
+
+import json
+import urllib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import singer
+
+LOGGER = singer.get_logger()
+
+# Expression of the distinct_id of a profile, in the engage `where` param
+DISTINCT_ID_EXPRESSION = 'properties["$distinct_id"]'
+# Unfiltered pages sampled for the range bounds, the first page included
+SAMPLE_PAGES = 4
+# Maximum ratio of the profiles of the largest range to an even share of the profiles
+MAX_PARTITION_SKEW = 2
+
+
+def get_partition_bounds(distinct_ids, partitions):
+    """Get the bounds splitting the distinct_ids into ranges of similar sizes.
+
+    Args:
+        distinct_ids (list): Sample of the distinct_ids of the project.
+        partitions (int): Maximum number of ranges.
+
+    Returns:
+        list: Sorted, distinct bounds, one less than the ranges.
+    """
+    distinct_ids = sorted({str(distinct_id) for distinct_id in distinct_ids if distinct_id})
+    if not distinct_ids:
+        return []
+    bounds = {distinct_ids[len(distinct_ids) * index // partitions] for index in range(1, partitions)}
+    # The lowest distinct_id would leave the first range empty
+    bounds.discard(distinct_ids[0])
+    return sorted(bounds)
+
+
+def get_partition_wheres(bounds):
+    """Get the `where` expressions of the ranges between the bounds.
+
+    The first range has no lower bound and the last no upper bound, so every
+    profile with a distinct_id is in exactly one range.
+
+    Args:
+        bounds (list): Sorted bounds of the ranges.
+
+    Returns:
+        list: Expression of each range.
+    """
+    literals = [json.dumps(bound) for bound in bounds]
+    wheres = []
+    for lower, upper in zip([None] + literals, literals + [None]):
+        conditions = []
+        if lower:
+            conditions.append(f"{DISTINCT_ID_EXPRESSION} >= {lower}")
+        if upper:
+            conditions.append(f"{DISTINCT_ID_EXPRESSION} < {upper}")
+        wheres.append(" and ".join(conditions))
+    return wheres
+
+
+class PartitionedScan:
+    """Concurrent paging of the engage profiles in ranges of distinct_id.
+
+    Args:
+        client (MixpanelClient): Client of the Mixpanel API.
+        url (str): Base URL of the engage endpoint.
+        path (str): Path of the engage endpoint.
+        params (dict): Query params of every request.
+        page_size (int): Profiles per page.
+        where (str, optional): Expression filtering all the profiles, combined with the ranges.
+    """
+
+    def __init__(self, client, url, path, params, page_size, where=None):  # pylint: disable=too-many-arguments
+        self.client = client
+        self.url = url
+        self.path = path
+        self.params = params
+        self.page_size = page_size
+        self.where = where
+        # Total of the profiles of each range, from its first page
+        self.totals = {}
+
+    def request_page(self, where=None, page=0, session_id=None):
+        """Request a page of the profiles of a range.
+
+        Args:
+            where (str, optional): Expression of the range, None for all the profiles.
+            page (int, optional): Page number.
+            session_id (str, optional): Session of the first page, for the next pages.
+
+        Returns:
+            dict: Engage response.
+        """
+        params = {**self.params, "page_size": self.page_size}
+        where = " and ".join(condition for condition in (self.where, where) if condition)
+        if where:
+            params["where"] = urllib.parse.quote(where)
+        if page:
+            params["session_id"] = session_id
+            params["page"] = page
+        querystring = "&".join(f"{key}={value}" for key, value in params.items())
+        return self.client.request(
+            method="GET",
+            url=self.url,
+            path=self.path,
+            params=querystring,
+            endpoint="engage",
+        )
+
+    def get_sample_pages(self, first_page):
+        """Request the unfiltered pages spread over the session of the first page.
+
+        Args:
+            first_page (dict): Unfiltered first page.
+
+        Returns:
+            list: First page and the sampled pages.
+        """
+        session_id = first_page.get("session_id")
+        last_page = (first_page.get("total", 0) - 1) // self.page_size
+        pages = sorted(
+            {max(1, last_page * index // (SAMPLE_PAGES - 1)) for index in range(1, SAMPLE_PAGES)}
+        )
+        if session_id is None or last_page < 1 or not pages:
+            return [first_page]
+        with ThreadPoolExecutor(max_workers=len(pages)) as executor:
+            sample_pages = list(executor.map(lambda page: self.request_page(None, page, session_id), pages))
+        return [first_page] + sample_pages
+
+    def get_first_pages(self, partitions):
+        """Split the profiles into ranges and request their first pages.
+
+        Args:
+            partitions (int): Maximum number of ranges.
+
+        Returns:
+            list: Tuples of the expression and the first page of each range, None if
+                  the ranges do not cover all the profiles or are skewed.
+        """
+        first_page = self.request_page()
+        bounds = get_partition_bounds(
+            [
+                record.get("$distinct_id")
+                for page in self.get_sample_pages(first_page)
+                for record in page.get("results", [])
+            ],
+            partitions,
+        )
+        if not bounds:
+            LOGGER.info("Engage profiles are not partitioned, too few distinct_ids")
+            return None
+        wheres = get_partition_wheres(bounds)
+        with ThreadPoolExecutor(max_workers=len(wheres)) as executor:
+            first_pages = list(zip(wheres, executor.map(self.request_page, wheres)))
+
+        total = first_page.get("total", 0)
+        self.totals = {where: page.get("total", 0) for where, page in first_pages}
+        partitions_total = sum(self.totals.values())
+        LOGGER.info(
+            "Engage profiles split into %s partitions of %s profiles, total: %s",
+            len(wheres),
+            list(self.totals.values()),
+            total,
+        )
+        if partitions_total < total:
+            LOGGER.warning(
+                "Engage partitions cover %s of the %s profiles, the profiles are paged sequentially",
+                partitions_total,
+                total,
+            )
+            return None
+        if partitions_total > total:
+            LOGGER.info("%s engage profiles created since the first page", partitions_total - total)
+        if max(self.totals.values()) > MAX_PARTITION_SKEW * partitions_total / len(wheres):
+            LOGGER.warning(
+                "Engage partitions of %s profiles are skewed, the profiles are paged sequentially",
+                list(self.totals.values()),
+            )
+            return None
+        return first_pages
+
+    def has_next_page(self, where, page, data):
+        """Check if a range has a page after the page."""
+        return (
+            bool(data.get("results"))
+            and data.get("session_id") is not None
+            and (page + 1) * self.page_size < self.totals[where]
+        )
+
+    def iter_pages(self, first_pages):
+        """Page the ranges concurrently, one outstanding page per range.
+
+        Args:
+            first_pages (list): Tuples of the expression and the first page of each range.
+
+        Yields:
+            dict: Engage responses, in the order they are received.
+        """
+        with ThreadPoolExecutor(max_workers=len(first_pages)) as executor:
+            pending = {}
+
+            def request_next_page(where, page, data):
+                if self.has_next_page(where, page, data):
+                    future = executor.submit(self.request_page, where, page + 1, data["session_id"])
+                    pending[future] = (where, page + 1)
+
+            try:
+                for where, data in first_pages:
+                    request_next_page(where, 0, data)
+                    yield data
+
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        where, page = pending.pop(future)
+                        data = future.result()
+                        # The next page is downloaded while this one is written
+                        request_next_page(where, page, data)
+                        yield data
+            finally:
+                # On failure, do not start the pages which are still queued
+                for future in pending:
+                    future.cancel()
@@ -0,0 +1,171 @@
+"""Export date windows downloaded as parallel event shards, see `export_event_shards`.
+
+A date window is a single export request, so a day too large for one request
+cannot be split any further by date. The event names of the project are split
+into disjoint sets, and the date window is requested once per set, in
+parallel. Each shard body is spooled to a temporary file, in memory up to
+SPOOL_MEMORY_SIZE, so a retried shard starts over without the records of the
+failed attempt. Once all the shards are downloaded, their events are merged by
+time into a single stream, in the order of a single request.
+
+Without `export_events`, the event names are those of the events/names
+endpoint, which only lists the events of the last EVENT_NAMES_DAYS days. The
+date windows starting before are not sharded, so the events missing from the
+list are not dropped.
+"""
+
+import heapq
+import json
+import tempfile
+import urllib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+import backoff
+import requests
+import singer
+
+from tap_mixpanel.decoder import EXPORT_CHUNK_SIZE, iter_jsonl
+
+LOGGER = singer.get_logger()
+
+# Bytes of a shard body kept in memory before it is spooled to disk
+SPOOL_MEMORY_SIZE = 16 * 1024 * 1024
+# Maximum number of event names requested from events/names
+EVENT_NAMES_LIMIT = 10000
+# Days of the events listed by events/names
+EVENT_NAMES_DAYS = 31
+
+
+def get_event_querystring(events):
+    """Get the querystring param restricting the export to events.
+
+    Args:
+        events (list): Event names.
+
+    Returns:
+        str: URL encoded event param, starting with &.
+    """
+    return f"&event={urllib.parse.quote(json.dumps(list(events)))}"
+
+
+def split_event_names(names, shards):
+    """Split the event names into disjoint sets of similar sizes.
+
+    Args:
+        names (list): Event names of the project.
+        shards (int): Maximum number of sets.
+
+    Returns:
+        list: Lists of event names, without empty lists.
+    """
+    names = sorted(set(names))
+    shards = max(min(shards, len(names)), 1)
+    return [names[index::shards] for index in range(shards) if names[index::shards]]
+
+
+def get_event_time(event):
+    """Get the time of a raw export event, to merge the shards."""
+    return (event.get("properties") or {}).get("time") or 0
+
+
+def iter_spool(spool):
+    """Read the events of a downloaded shard.
+
+    Args:
+        spool (file): Spooled body of the shard.
+
+    Yields:
+        dict: Raw export events, in download order.
+    """
+    spool.seek(0)
+    yield from iter_jsonl(iter(lambda: spool.read(EXPORT_CHUNK_SIZE), b""))
+
+
+class EventShards:
+    """Downloader of the export date windows as parallel event shards.
+
+    Args:
+        client (MixpanelClient): Client of the Mixpanel API.
+        event_sets (list): Disjoint lists of event names, one per shard.
+        since (str, optional): First day covered by the event names, in the project timezone,
+                               None if the names cover every day.
+    """
+
+    def __init__(self, client, event_sets, since=None):
+        self.client = client
+        self.event_sets = event_sets
+        self.since = since
+
+    def covers(self, querystring):
+        """Check if the event names cover all the days of a date window.
+
+        Args:
+            querystring (str): Params in URL query format, with the from_date of the date window.
+
+        Returns:
+            bool: Whether the date window can be sharded.
+        """
+        if not self.since:
+            return True
+        from_date = urllib.parse.parse_qs(querystring).get("from_date", [""])[0]
+        return from_date >= self.since
+
+    @backoff.on_exception(
+        backoff.expo,
+        (requests.exceptions.ChunkedEncodingError,),
+        max_tries=5,
+        factor=2,
+    )
+    def download(self, url, path, querystring, spool):
+        """Download a shard body to its spool, replacing any earlier attempt.
+
+        Args:
+            url (str): Base URL of the export endpoint.
+            path (str): Path of the export endpoint.
+            querystring (str): Params in URL query format, with the event param of the shard.
+            spool (file): Spool of the shard.
+        """
+        spool.seek(0)
+        spool.truncate()
+        for chunk in self.client.request_export_chunks(
+            method="GET",
+            url=url,
+            path=path,
+            params=querystring,
+            endpoint="export",
+        ):
+            spool.write(chunk)
+
+    def request_export(self, url, path, querystring):
+        """Download the shards of a date window and merge their events.
+
+        Args:
+            url (str): Base URL of the export endpoint.
+            path (str): Path of the export endpoint.
+            querystring (str): Params in URL query format, without event param.
+
+        Yields:
+            dict: Raw export events of all the shards, ordered by time.
+        """
+        with ExitStack() as stack:
+            spools = [
+                stack.enter_context(tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_SIZE))
+                for _ in self.event_sets
+            ]
+            executor = stack.enter_context(ThreadPoolExecutor(max_workers=len(self.event_sets)))
+            futures = [
+                executor.submit(self.download, url, path, querystring + get_event_querystring(events), spool)
+                for events, spool in zip(self.event_sets, spools)
+            ]
+            try:
+                for future in futures:
+                    future.result()
+            finally:
+                # On failure, do not start the shards which are still queued
+                for future in futures:
+                    future.cancel()
+            LOGGER.info("Downloaded %s export event shards", len(futures))
+
+            # Each shard is ordered by time, as a single request would be
+            yield from heapq.merge(*(iter_spool(spool) for spool in spools), key=get_event_time)
@@ -0,0 +1,571 @@
+"""Local stand-in for the Mixpanel API, serving seeded synthetic data.
+
+It implements the endpoints used by the tap, so the tap can be run, measured and
+regression-tested on a dev box without credentials, with `api_base_url` in the
+tap config pointing to the server:
+
+    python -m tap_mixpanel.fake_server --port 8080 --events-per-day 100000
+
+Latency, 429s, 5xx and chunked-encoding breaks can be injected to exercise the
+retry and rate limit handling.
+"""
+
+import argparse
+import calendar
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import singer
+
+LOGGER = singer.get_logger()
+
+API_PATH = "/api/2.0/"
+GZIP_WBITS = zlib.MAX_WBITS | 16
+# Size of the chunks of the streamed export body
+STREAM_CHUNK_SIZE = 64 * 1024
+# Condition of an engage `where` expression, e.g. properties["$last_seen"] >= "2022-01-01"
+WHERE_CONDITION = re.compile(r'properties\["(?P<name>[^"]+)"\]\s*(?P<op>>=|<=|==|!=|>|<)\s*(?P<value>"(?:[^"\\]|\\.)*")')
+WHERE_OPERATORS = {
+    ">=": lambda left, right: left >= right,
+    "<=": lambda left, right: left <= right,
+    "==": lambda left, right: left == right,
+    "!=": lambda left, right: left != right,
+    ">": lambda left, right: left > right,
+    "<": lambda left, right: left < right,
+}
+
+EVENT_NAMES = ["Page View", "Sign Up", "Log In", "Search", "Add To Cart", "Purchase", "Share", "Log Out"]
+BROWSERS = ["Chrome", "Firefox", "Safari", "Edge"]
+CITIES = ["San Francisco", "New York", "Paris", "Tokyo", "São Paulo", "Berlin"]
+PROFILE_PROPERTY_TYPES = ["string", "number", "boolean", "datetime", "list", "object"]
+
+
+class SyntheticData:
+    """Seeded generator of the Mixpanel project data.
+
+    The same seed and scale always generate the same data.
+
+    Args:
+        seed (int): Seed of the generator.
+        events_per_day (int): Number of export events per day.
+        event_properties (int): Number of custom properties per event.
+        event_names (int): Number of distinct event names.
+        profiles (int): Number of engage profiles.
+        properties_per_profile (int): Number of custom properties per profile.
+        cohorts (int): Number of cohorts, each profile is a member of one cohort.
+        funnels (int): Number of funnels.
+    """
+
+    def __init__(
+        self,
+        seed=0,
+        events_per_day=1000,
+        event_properties=10,
+        event_names=len(EVENT_NAMES),
+        profiles=1000,
+        properties_per_profile=10,
+        cohorts=5,
+        funnels=3,
+    ):
+        self.seed = seed
+        self.events_per_day = events_per_day
+        self.event_properties = event_properties
+        self.event_names = [
+            EVENT_NAMES[i] if i < len(EVENT_NAMES) else f"Event {i}"
+            for i in range(event_names)
+        ]
+        self.profiles = profiles
+        self.properties_per_profile = properties_per_profile
+        self.cohorts = cohorts
+        self.funnels = funnels
+        self.today = datetime.now(timezone.utc).date()
+
+    def get_rng(self, *keys):
+        """Get a random generator seeded with the seed and the keys."""
+        return random.Random(":".join(map(str, (self.seed,) + keys)))
+
+    def event_properties_top(self):
+        """Response of events/properties/top."""
+        names = ["$browser", "$city", "mp_lib"]
+        names += [f"prop_{i}" for i in range(self.event_properties)]
+        return {name: {"count": self.events_per_day} for name in names}
+
+    def generate_events(self, day, events=None):
+        """Generate the export events of a day, ordered by time.
+
+        Args:
+            day (date): Day of the events.
+            events (list, optional): Event names to keep. Defaults to None (all).
+
+        Yields:
+            dict: Export event.
+        """
+        rng = self.get_rng("events", day.isoformat())
+        day_start = calendar.timegm(day.timetuple())
+        step = 86400 / max(self.events_per_day, 1)
+        for i in range(self.events_per_day):
+            event = rng.choice(self.event_names)
+            properties = {
+                "time": day_start + int(i * step),
+                "distinct_id": f"user-{rng.randrange(max(self.profiles, 1))}",
+                "$insert_id": f"{rng.getrandbits(64):016x}",
+                "$browser": rng.choice(BROWSERS),
+                "$city": rng.choice(CITIES),
+                "mp_lib": "web",
+            }
+            for j in range(self.event_properties):
+                properties[f"prop_{j}"] = f"value_{rng.randrange(1000)}"
+            if events is None or event in events:
+                yield {"event": event, "properties": properties}
+
+    def profile_property_type(self, index):
+        """Type of the custom profile property at index."""
+        return PROFILE_PROPERTY_TYPES[index % len(PROFILE_PROPERTY_TYPES)]
+
+    def engage_properties(self):
+        """Response of engage/properties."""
+        results = {
+            "$email": {"count": self.profiles, "type": "string"},
+            "$name": {"count": self.profiles, "type": "string"},
+            "$city": {"count": self.profiles, "type": "string"},
+            "$last_seen": {"count": self.profiles, "type": "datetime"},
+        }
+        for i in range(self.properties_per_profile):
+            results[f"custom_{i}"] = {
+                "count": self.profiles,
+                "type": self.profile_property_type(i),
+            }
+        return {"status": "ok", "results": results}
+
+    def generate_profile(self, index):
+        """Generate the engage profile at index."""
+        rng = self.get_rng("profile", index)
+        last_seen = datetime.combine(
+            self.today - timedelta(days=rng.randrange(90)), datetime.min.time()
+        ) + timedelta(seconds=rng.randrange(86400))
+        properties = {
+            "$email": f"user{index}@example.com",
+            "$name": f"User {index}",
+            "$city": rng.choice(CITIES),
+            "$last_seen": last_seen.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        for i in range(self.properties_per_profile):
+            property_type = self.profile_property_type(i)
+            if property_type == "string":
+                value = f"value_{rng.randrange(1000)}"
+            elif property_type == "number":
+                value = round(rng.uniform(0, 1000), 2)
+            elif property_type == "boolean":
+                value = rng.random() > 0.5
+            elif property_type == "datetime":
+                value = (last_seen - timedelta(days=rng.randrange(365))).strftime("%Y-%m-%dT%H:%M:%S")
+            elif property_type == "list":
+                value = [f"item_{rng.randrange(10)}" for _ in range(rng.randrange(4))]
+            else:
+                value = {"key": f"value_{rng.randrange(10)}"}
+            properties[f"custom_{i}"] = value
+        return {"$distinct_id": f"user-{index}", "$properties": properties}
+
+    def cohort_profiles(self, cohort_id):
+        """Indexes of the profiles which are members of the cohort."""
+        return range(cohort_id - 1, self.profiles, max(self.cohorts, 1))
+
+    def cohorts_list(self):
+        """Response of cohorts/list."""
+        return [
+            {
+                "id": cohort_id,
+                "name": f"Cohort {cohort_id}",
+                "description": f"Synthetic cohort {cohort_id}",
+                "created": "2020-01-01 00:00:00",
+                "count": len(self.cohort_profiles(cohort_id)),
+                "is_visible": 1,
+                "project_id": 1,
+            }
+            for cohort_id in range(1, self.cohorts + 1)
+        ]
+
+    def funnels_list(self):
+        """Response of funnels/list."""
+        return [
+            {"funnel_id": funnel_id, "name": f"Funnel {funnel_id}"}
+            for funnel_id in range(1, self.funnels + 1)
+        ]
+
+    def funnel(self, funnel_id, days):
+        """Response of funnels for the funnel and days."""
+        data = {}
+        for day in days:
+            rng = self.get_rng("funnel", funnel_id, day.isoformat())
+            count = rng.randrange(100, 1000)
+            steps = []
+            for step, event in enumerate(self.event_names[:3]):
+                step_count = count if step == 0 else int(steps[-1]["count"] * rng.uniform(0.3, 0.9))
+                steps.append({
+                    "count": step_count,
+                    "avg_time": round(rng.uniform(1, 100), 2) if step else None,
+                    "goal": event,
+                    "overall_conv_ratio": round(step_count / count, 4),
+                    "step_conv_ratio": round(step_count / steps[-1]["count"], 4) if step else 1,
+                    "event": event,
+                    "step_label": event,
+                })
+            data[day.isoformat()] = {
+                "steps": steps,
+                "analysis": {
+                    "completion": steps[-1]["count"],
+                    "starting_amount": count,
+                    "steps": len(steps),
+                    "worst": 1,
+                },
+            }
+        return {"meta": {"dates": [day.isoformat() for day in days]}, "data": data}
+
+    def annotations(self, days):
+        """Response of annotations for the days, one annotation per week."""
+        return {
+            "annotations": [
+                {
+                    "date": f"{day.isoformat()} 00:00:00",
+                    "project_id": 1,
+                    "id": day.toordinal(),
+                    "description": f"Release of {day.isoformat()}",
+                }
+                for day in days
+                if day.toordinal() % 7 == 0
+            ]
+        }
+
+
+class FakeMixpanelServer(ThreadingHTTPServer):
+    """HTTP server standing in for the Mixpanel API.
+
+    Args:
+        data (SyntheticData): Generator of the served data.
+        host (str, optional): Host to bind. Defaults to 127.0.0.1.
+        port (int, optional): Port to bind, 0 for any free port. Defaults to 0.
+        latency (float, optional): Seconds added to every response. Defaults to 0.
+        error_429_rate (float, optional): Share of the requests answered with a 429. Defaults to 0.
+        error_5xx_rate (float, optional): Share of the requests answered with a 503. Defaults to 0.
+        chunked_break_rate (float, optional): Share of the export bodies broken in the middle.
+                                              Defaults to 0.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        data,
+        host="127.0.0.1",
+        port=0,
+        latency=0,
+        error_429_rate=0,
+        error_5xx_rate=0,
+        chunked_break_rate=0,
+    ):
+        super().__init__((host, port), FakeMixpanelHandler)
+        self.data = data
+        self.latency = latency
+        self.error_429_rate = error_429_rate
+        self.error_5xx_rate = error_5xx_rate
+        self.chunked_break_rate = chunked_break_rate
+        self.fault_rng = random.Random(data.seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": {}, "bytes_sent": 0}
+        self.thread = None
+
+    @property
+    def url(self):
+        """Base URL of the server, for the `api_base_url` of the tap config."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count_request(self, endpoint, bytes_sent=0):
+        """Count a request and the bytes sent for it."""
+        with self.lock:
+            self.stats["requests"][endpoint] = self.stats["requests"].get(endpoint, 0) + 1
+            self.stats["bytes_sent"] += bytes_sent
+
+    def draw_fault(self, export=False):
+        """Draw the fault injected in the next response, if any."""
+        with self.lock:
+            draw = self.fault_rng.random()
+        if draw < self.error_429_rate:
+            return 429
+        draw -= self.error_429_rate
+        if draw < self.error_5xx_rate:
+            return 503
+        draw -= self.error_5xx_rate
+        if export and draw < self.chunked_break_rate:
+            return "chunked_break"
+        return None
+
+    def start(self):
+        """Serve the requests on a background thread."""
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        LOGGER.info("Fake Mixpanel server listening on %s", self.url)
+        return self
+
+    def stop(self):
+        """Stop serving the requests and close the socket."""
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.stop()
+
+
+def match_where(profile, where):
+    """Check if a profile matches an engage `where` expression.
+
+    Only conditions comparing a property to a string, joined by `and`, are supported.
+
+    Args:
+        profile (dict): Engage profile.
+        where (str): Expression.
+
+    Returns:
+        bool: Whether the profile matches every condition.
+    """
+    for condition in where.split(" and "):
+        match = WHERE_CONDITION.fullmatch(condition.strip())
+        if not match:
+            raise ValueError(f"Unsupported where condition: {condition}")
+        name = match.group("name")
+        value = profile["$distinct_id"] if name == "$distinct_id" else profile["$properties"].get(name)
+        if value is None or not WHERE_OPERATORS[match.group("op")](str(value), json.loads(match.group("value"))):
+            return False
+    return True
+
+
+def get_days(params):
+    """Days from the from_date to the to_date params, both included."""
+    from_date = date.fromisoformat(params["from_date"])
+    to_date = date.fromisoformat(params["to_date"])
+    return [from_date + timedelta(days=i) for i in range((to_date - from_date).days + 1)]
+
+
+class FakeMixpanelHandler(BaseHTTPRequestHandler):
+    """Request handler of the FakeMixpanelServer."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Log the requests at debug level only."""
+        LOGGER.debug("Fake Mixpanel server: " + format, *args)
+
+    def send_json(self, status, body, headers=None):
+        """Send a JSON response."""
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+        return len(payload)
+
+    def write_chunk(self, payload):
+        """Write a chunk of a chunked encoded body."""
+        self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+        return len(payload)
+
+    def send_jsonl(self, records, break_body=False):
+        """Stream jsonl records with chunked encoding, gzip compressed if accepted.
+
+        Args:
+            records (iterable): Records to send.
+            break_body (bool, optional): Close the connection in the middle of the body.
+
+        Returns:
+            int: Number of bytes of the body sent.
+        """
+        compress = "gzip" in self.headers.get("Accept-Encoding", "")
+        compressor = zlib.compressobj(6, zlib.DEFLATED, GZIP_WBITS) if compress else None
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        if compress:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+
+        bytes_sent = 0
+        buffer = []
+        buffered = 0
+        chunks_sent = 0
+        for record in records:
+            line = json.dumps(record).encode("utf-8") + b"\n"
+            buffer.append(line)
+            buffered += len(line)
+            if buffered < STREAM_CHUNK_SIZE:
+                continue
+            payload = b"".join(buffer)
+            buffer, buffered = [], 0
+            if compressor:
+                payload = compressor.compress(payload)
+            if payload:
+                bytes_sent += self.write_chunk(payload)
+                chunks_sent += 1
+            if break_body and chunks_sent == 2:
+                # Close the connection without the last chunk
+                self.close_connection = True
+                self.wfile.flush()
+                return bytes_sent
+
+        payload = b"".join(buffer)
+        if compressor:
+            payload = compressor.compress(payload) + compressor.flush()
+        if payload:
+            bytes_sent += self.write_chunk(payload)
+        if break_body:
+            self.close_connection = True
+            self.wfile.flush()
+            return bytes_sent
+        self.wfile.write(b"0\r\n\r\n")
+        return bytes_sent
+
+    def do_GET(self):  # pylint: disable=invalid-name,too-many-branches
+        """Route a GET request to its endpoint."""
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        endpoint = url.path.split(API_PATH, 1)[-1].strip("/")
+        server = self.server
+        data = server.data
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if "Authorization" not in self.headers:
+            server.count_request(endpoint, self.send_json(401, {"error": "Invalid authorization credentials."}))
+            return
+
+        fault = server.draw_fault(export=endpoint == "export")
+        if fault == 429:
+            server.count_request(endpoint, self.send_json(
+                429, {"error": "Rate limit exceeded."}, {"Retry-After": "1"}))
+            return
+        if fault == 503:
+            server.count_request(endpoint, self.send_json(503, {"error": "Service unavailable."}))
+            return
+
+        if endpoint == "export":
+            events = json.loads(params["event"]) if params.get("event") else None
+            records = (
+                event
+                for day in get_days(params)
+                for event in data.generate_events(day, events)
+            )
+            bytes_sent = self.send_jsonl(records, break_body=fault == "chunked_break")
+        elif endpoint == "engage":
+            bytes_sent = self.send_json(200, self.engage_page(params))
+        elif endpoint == "engage/properties":
+            bytes_sent = self.send_json(200, data.engage_properties())
+        elif endpoint == "events/names":
+            bytes_sent = self.send_json(200, data.event_names[:int(params.get("limit", 255))])
+        elif endpoint == "events/properties/top":
+            bytes_sent = self.send_json(200, data.event_properties_top())
+        elif endpoint == "cohorts/list":
+            bytes_sent = self.send_json(200, data.cohorts_list())
+        elif endpoint == "funnels/list":
+            bytes_sent = self.send_json(200, data.funnels_list())
+        elif endpoint == "funnels":
+            bytes_sent = self.send_json(200, data.funnel(int(params["funnel_id"]), get_days(params)))
+        elif endpoint == "annotations":
+            bytes_sent = self.send_json(200, data.annotations(get_days(params)))
+        else:
+            bytes_sent = self.send_json(404, {"error": f"Unknown endpoint {endpoint}."})
+        server.count_request(endpoint, bytes_sent)
+
+    def engage_page(self, params):
+        """Page of engage profiles, paged with session_id and page.
+
+        Args:
+            params (dict): Query params of the request.
+
+        Returns:
+            dict: Engage response.
+        """
+        data = self.server.data
+        if params.get("filter_by_cohort"):
+            cohort_id = json.loads(params["filter_by_cohort"])["id"]
+            indexes = data.cohort_profiles(int(cohort_id))
+        else:
+            indexes = range(data.profiles)
+        if params.get("where"):
+            indexes = [index for index in indexes if match_where(data.generate_profile(index), params["where"])]
+
+        page = int(params.get("page", 0))
+        page_size = int(params.get("page_size", 1000))
+        page_indexes = indexes[page * page_size:(page + 1) * page_size]
+        return {
+            "page": page,
+            "page_size": page_size,
+            "session_id": params.get("session_id") or f"session-{data.seed}",
+            "status": "ok",
+            "total": len(indexes),
+            "results": [data.generate_profile(index) for index in page_indexes],
+        }
+
+
+def main():
+    """Run the fake Mixpanel server until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--events-per-day", type=int, default=1000)
+    parser.add_argument("--event-properties", type=int, default=10)
+    parser.add_argument("--event-names", type=int, default=len(EVENT_NAMES))
+    parser.add_argument("--profiles", type=int, default=1000)
+    parser.add_argument("--properties-per-profile", type=int, default=10)
+    parser.add_argument("--cohorts", type=int, default=5)
+    parser.add_argument("--funnels", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0, help="Seconds added to every response")
+    parser.add_argument("--error-429-rate", type=float, default=0)
+    parser.add_argument("--error-5xx-rate", type=float, default=0)
+    parser.add_argument("--chunked-break-rate", type=float, default=0)
+    args = parser.parse_args()
+
+    data = SyntheticData(
+        seed=args.seed,
+        events_per_day=args.events_per_day,
+        event_properties=args.event_properties,
+        event_names=args.event_names,
+        profiles=args.profiles,
+        properties_per_profile=args.properties_per_profile,
+        cohorts=args.cohorts,
+        funnels=args.funnels,
+    )
+    server = FakeMixpanelServer(
+        data,
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        error_429_rate=args.error_429_rate,
+        error_5xx_rate=args.error_5xx_rate,
+        chunked_break_rate=args.chunked_break_rate,
+    )
+    LOGGER.info("Fake Mixpanel server listening on %s", server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
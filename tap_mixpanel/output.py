@@ -0,0 +1,297 @@
+"""Buffered output of the Singer messages.
+
+singer.write_record writes and flushes stdout for every record. The RECORD
+messages are instead serialized into a buffer, written to stdout in one call
+when the buffer is full or old enough. Any other message (STATE, SCHEMA) first
+flushes the buffered records, so the messages keep their order and a STATE
+message is never written before the records it covers.
+
+Records may also be written to compressed jsonl files announced by BATCH
+messages, for the targets which bulk-load them, see BatchWriter.
+"""
+
+import gzip
+import os
+import pathlib
+import sys
+import threading
+import time
+import uuid
+
+import pytz
+import simplejson
+import singer
+from singer import utils
+
+LOGGER = singer.get_logger()
+
+# Size of the buffered RECORD messages, in characters, flushed to stdout at once
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+# Maximum age of the buffered RECORD messages, in seconds
+OUTPUT_FLUSH_INTERVAL = 1.0
+
+# Records of each BATCH file before it is rotated
+BATCH_MAX_RECORDS = 1000000
+BATCH_COMPRESSION_LEVEL = 6
+# Serialized records written at once to the BATCH file
+BATCH_WRITE_SIZE = 1024 * 1024
+
+
+class BufferedOutput:
+    """Buffer of the serialized RECORD messages written to stdout.
+
+    Args:
+        buffer_size (int, optional): Buffered characters flushed at once.
+        flush_interval (float, optional): Maximum age in seconds of the buffered messages.
+    """
+
+    def __init__(self, buffer_size=OUTPUT_BUFFER_SIZE, flush_interval=OUTPUT_FLUSH_INTERVAL):
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.__buffer = []
+        self.__buffered = 0
+        self.__buffered_at = None
+        self.__time_extracted = (None, None)
+        self.__record_prefixes = {}
+        self.__lock = threading.RLock()
+
+    def format_time_extracted(self, time_extracted):
+        """Format the time_extracted of a RECORD message, cached as every record of a batch shares it."""
+        cached_time_extracted, formatted = self.__time_extracted
+        if time_extracted is not cached_time_extracted:
+            formatted = utils.strftime(time_extracted.astimezone(pytz.utc))
+            self.__time_extracted = (time_extracted, formatted)
+        return formatted
+
+    def format_record(self, stream_name, record, time_extracted=None):
+        """Serialize a RECORD message, as singer.format_message(singer.RecordMessage(...)).
+
+        Args:
+            stream_name (str): Name of the stream.
+            record (dict): Record of the message.
+            time_extracted (datetime, optional): Datetime when the record was extracted.
+
+        Returns:
+            str: Serialized message, without the trailing new line.
+        """
+        return self.format_record_json(
+            stream_name, simplejson.dumps(record, use_decimal=True), time_extracted
+        )
+
+    def format_record_json(self, stream_name, record_json, time_extracted=None):
+        """Serialize a RECORD message of an already serialized record.
+
+        The message is assembled with the separators of simplejson.dumps, so it is
+        identical to the format_record one.
+
+        Args:
+            stream_name (str): Name of the stream.
+            record_json (str): Record serialized with simplejson.dumps(record, use_decimal=True).
+            time_extracted (datetime, optional): Datetime when the record was extracted.
+
+        Returns:
+            str: Serialized message, without the trailing new line.
+        """
+        prefix = self.__record_prefixes.get(stream_name)
+        if prefix is None:
+            prefix = f'{{"type": "RECORD", "stream": {simplejson.dumps(stream_name)}, "record": '
+            self.__record_prefixes[stream_name] = prefix
+        if time_extracted:
+            # The formatted date-time has no character to escape
+            return f'{prefix}{record_json}, "time_extracted": "{self.format_time_extracted(time_extracted)}"}}'
+        return f"{prefix}{record_json}}}"
+
+    def write_record(self, stream_name, record, time_extracted=None):
+        """Buffer a RECORD message, flushing the buffer if it is full or old enough.
+
+        Args:
+            stream_name (str): Name of the stream.
+            record (dict): Record of the message.
+            time_extracted (datetime, optional): Datetime when the record was extracted.
+        """
+        self.write_line(self.format_record(stream_name, record, time_extracted) + "\n")
+
+    def write_record_json(self, stream_name, record_json, time_extracted=None):
+        """Buffer a RECORD message of an already serialized record.
+
+        Args:
+            stream_name (str): Name of the stream.
+            record_json (str): Record serialized with simplejson.dumps(record, use_decimal=True).
+            time_extracted (datetime, optional): Datetime when the record was extracted.
+        """
+        self.write_line(self.format_record_json(stream_name, record_json, time_extracted) + "\n")
+
+    def write_line(self, line):
+        """Buffer a serialized message, flushing the buffer if it is full or old enough."""
+        with self.__lock:
+            if not self.__buffer:
+                self.__buffered_at = time.monotonic()
+            self.__buffer.append(line)
+            self.__buffered += len(line)
+            if (
+                self.__buffered >= self.buffer_size
+                or time.monotonic() - self.__buffered_at >= self.flush_interval
+            ):
+                self.flush()
+
+    def flush(self):
+        """Write the buffered messages to stdout."""
+        with self.__lock:
+            if self.__buffer:
+                sys.stdout.write("".join(self.__buffer))
+                self.__buffer = []
+                self.__buffered = 0
+            sys.stdout.flush()
+
+    def write_schema(self, stream_name, schema, key_properties):
+        """Write a SCHEMA message after the buffered RECORD messages.
+
+        Args:
+            stream_name (str): Name of the stream.
+            schema (dict): Schema of the stream.
+            key_properties (list): Key properties of the stream.
+        """
+        with self.__lock:
+            self.flush()
+            singer.write_schema(stream_name, schema, key_properties)
+
+    def write_batch(self, stream_name, manifest):
+        """Write a BATCH message of gzip compressed jsonl files, after the buffered RECORD messages.
+
+        Args:
+            stream_name (str): Name of the stream.
+            manifest (list): URIs of the files of the batch.
+        """
+        message = {
+            "type": "BATCH",
+            "stream": stream_name,
+            "encoding": {"format": "jsonl", "compression": "gzip"},
+            "manifest": manifest,
+        }
+        with self.__lock:
+            self.flush()
+            sys.stdout.write(simplejson.dumps(message, use_decimal=True) + "\n")
+            sys.stdout.flush()
+
+    def write_state(self, value):
+        """Write a STATE message after the buffered RECORD messages.
+
+        Args:
+            value (dict): State of the sync.
+        """
+        with self.__lock:
+            self.flush()
+            singer.write_state(value)
+
+
+class BatchWriter:
+    """Writer of the records of a stream to rotated, gzip compressed jsonl files.
+
+    Each file is announced by a BATCH message once it is complete. finish must be
+    called before the state covering the records is written.
+
+    Args:
+        stream_name (str): Name of the stream.
+        batch_dir (str): Directory of the BATCH files.
+        max_records (int, optional): Records of each file before it is rotated.
+    """
+
+    def __init__(self, stream_name, batch_dir, max_records=BATCH_MAX_RECORDS):
+        self.stream_name = stream_name
+        self.batch_dir = os.path.abspath(batch_dir)
+        self.max_records = max_records
+        self.prefix = f"{stream_name}-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.file_count = 0
+        self.__file = None
+        self.__path = None
+        self.__records = 0
+        self.__buffer = []
+        self.__buffered = 0
+        os.makedirs(self.batch_dir, exist_ok=True)
+
+    def write_record(self, record):
+        """Write a record to the current BATCH file, rotating it when it is full.
+
+        Args:
+            record (dict): Transformed record.
+        """
+        self.write_record_json(simplejson.dumps(record, use_decimal=True))
+
+    def write_record_json(self, record_json):
+        """Write an already serialized record to the current BATCH file, rotating it when it is full.
+
+        Args:
+            record_json (str): Record serialized with simplejson.dumps(record, use_decimal=True).
+        """
+        if self.__file is None:
+            self.file_count += 1
+            self.__path = os.path.join(self.batch_dir, f"{self.prefix}-{self.file_count:05d}.jsonl.gz")
+            # Written under a temporary name, no BATCH message points at an incomplete file
+            self.__file = gzip.open(f"{self.__path}.tmp", "wb", compresslevel=BATCH_COMPRESSION_LEVEL)
+
+        line = record_json + "\n"
+        self.__buffer.append(line)
+        self.__buffered += len(line)
+        self.__records += 1
+        if self.__buffered >= BATCH_WRITE_SIZE:
+            self.write_buffer()
+        if self.__records >= self.max_records:
+            self.finish()
+
+    def write_buffer(self):
+        """Write the buffered records to the current BATCH file."""
+        if self.__buffer:
+            self.__file.write("".join(self.__buffer).encode("utf-8"))
+            self.__buffer = []
+            self.__buffered = 0
+
+    def finish(self):
+        """Complete the current BATCH file, if any, and write its BATCH message."""
+        if self.__file is None:
+            return
+        self.write_buffer()
+        self.__file.close()
+        os.replace(f"{self.__path}.tmp", self.__path)
+        LOGGER.info("Wrote %s records of stream %s to %s", self.__records, self.stream_name, self.__path)
+        OUTPUT.write_batch(self.stream_name, [pathlib.Path(self.__path).as_uri()])
+        self.__file = None
+        self.__path = None
+        self.__records = 0
+
+
+OUTPUT = BufferedOutput()
+
+
+def configure(config):
+    """Set the output buffer size and flush interval from the tap config.
+
+    Args:
+        config (dict): The tap config.
+    """
+    OUTPUT.buffer_size = int(config.get("output_buffer_size") or OUTPUT_BUFFER_SIZE)
+    OUTPUT.flush_interval = float(config.get("output_flush_interval") or OUTPUT_FLUSH_INTERVAL)
+
+
+def write_record(stream_name, record, time_extracted=None):
+    """Write a RECORD message through the output buffer."""
+    OUTPUT.write_record(stream_name, record, time_extracted=time_extracted)
+
+
+def write_record_json(stream_name, record_json, time_extracted=None):
+    """Write a RECORD message of an already serialized record through the output buffer."""
+    OUTPUT.write_record_json(stream_name, record_json, time_extracted=time_extracted)
+
+
+def write_schema(stream_name, schema, key_properties):
+    """Write a SCHEMA message, after the buffered RECORD messages."""
+    OUTPUT.write_schema(stream_name, schema, key_properties)
+
+
+def write_state(value):
+    """Write a STATE message, after the buffered RECORD messages."""
+    OUTPUT.write_state(value)
+
+
+def flush():
+    """Write the buffered RECORD messages."""
+    OUTPUT.flush()
@@ -0,0 +1,143 @@
+"""Page sizes of the paginated streams adapted to the responses, see `engage_page_size`.
+
+The engage and cohort_members pages are requested by page number, the API
+returning the profiles from `page * page_size` of the session. A page size
+can therefore only change at an offset which is a multiple of the new size:
+the sizes are the default size doubled or halved, so a larger size applies
+once enough pages are read, and a smaller one at once.
+
+PageSizer keeps a moving average of the seconds and bytes per record of the
+pages, grows the page size while a page of twice the size stays within the
+budgets, and halves it when a page exceeds them or when a request fails with
+a timeout or a 5xx after its retries. The averages are kept in the state,
+under `page_stats`, so the next sync starts with the learned size.
+"""
+
+import singer
+
+LOGGER = singer.get_logger()
+
+# Weight of the latest page in the moving averages
+SMOOTHING = 0.5
+MIN_PAGE_SIZE = 125
+MAX_PAGE_SIZE = 1000
+DEFAULT_SECONDS_BUDGET = 30
+DEFAULT_BYTE_BUDGET = 16 * 1024 * 1024
+
+
+class PageSizer:
+    """Size of the pages of a stream, adapted to the latency and size of the responses.
+
+    Args:
+        page_size (int): Page size, used until the responses are measured.
+        seconds_budget (float, optional): Seconds targeted per page.
+        byte_budget (int, optional): Decompressed bytes targeted per page.
+        stats (dict, optional): Averages per record and page size, from the state.
+    """
+
+    def __init__(
+        self,
+        page_size,
+        seconds_budget=DEFAULT_SECONDS_BUDGET,
+        byte_budget=DEFAULT_BYTE_BUDGET,
+        stats=None,
+    ):
+        self.seconds_budget = seconds_budget
+        self.byte_budget = byte_budget
+        self.stats = dict(stats or {})
+        self.page_size = self.stats.get("page_size") or page_size
+        # Lowered by the failed requests of this sync
+        self.max_page_size = MAX_PAGE_SIZE
+
+    def get_page_seconds_and_bytes(self, page_size):
+        """Estimate the seconds and bytes of a page from the averages per record."""
+        return (
+            page_size * self.stats.get("seconds_per_record", 0),
+            page_size * self.stats.get("bytes_per_record", 0),
+        )
+
+    def fits(self, page_size):
+        """Check if a page of the size is expected to stay within the budgets."""
+        seconds, response_bytes = self.get_page_seconds_and_bytes(page_size)
+        return seconds <= self.seconds_budget and response_bytes <= self.byte_budget
+
+    @staticmethod
+    def can_halve(page_size):
+        """Check if a page size can be halved, at the offsets of the current size."""
+        return page_size % 2 == 0 and page_size // 2 >= MIN_PAGE_SIZE
+
+    def observe(self, records, response_bytes, seconds):
+        """Update the averages from a page and size the next pages.
+
+        Args:
+            records (int): Records of the page.
+            response_bytes (int): Decompressed bytes of the response.
+            seconds (float): Duration of the request.
+        """
+        if records <= 0:
+            return
+        observed = {
+            "seconds_per_record": seconds / records,
+            "bytes_per_record": response_bytes / records,
+        }
+        for key, value in observed.items():
+            previous = self.stats.get(key)
+            if previous is None:
+                self.stats[key] = value
+            else:
+                self.stats[key] = SMOOTHING * value + (1 - SMOOTHING) * previous
+
+        previous_size = self.page_size
+        if not self.fits(self.page_size):
+            while self.can_halve(self.page_size) and not self.fits(self.page_size):
+                self.page_size //= 2
+        # Only grown after a full page, a partial one says little about the larger pages
+        elif (
+            records >= self.page_size
+            and self.page_size * 2 <= self.max_page_size
+            and self.fits(self.page_size * 2)
+        ):
+            self.page_size *= 2
+        self.stats["page_size"] = self.page_size
+        if self.page_size != previous_size:
+            LOGGER.info(
+                "Page size changed from %s to %s (%.4f seconds, %.0f bytes per record)",
+                previous_size,
+                self.page_size,
+                self.stats["seconds_per_record"],
+                self.stats["bytes_per_record"],
+            )
+
+    def back_off(self, page_size):
+        """Halve the page size after a failed request, for the rest of the sync.
+
+        Args:
+            page_size (int): Page size of the failed request.
+
+        Returns:
+            bool: Whether the page size was halved, False at the minimum size.
+        """
+        if not self.can_halve(page_size):
+            return False
+        LOGGER.warning("Page size lowered from %s to %s after a failed request", page_size, page_size // 2)
+        self.page_size = page_size // 2
+        self.max_page_size = self.page_size
+        self.stats["page_size"] = self.page_size
+        return True
+
+    def get_next_page(self, offset, limit):
+        """Get the page size and number of the page at the offset.
+
+        The page size changes when the offset is a multiple of the new size,
+        otherwise the current one is kept until then.
+
+        Args:
+            offset (int): Number of records of the pages already read.
+            limit (int): Current page size.
+
+        Returns:
+            tuple: Page size and page number.
+        """
+        if self.page_size != limit and offset % self.page_size == 0:
+            limit = self.page_size
+        return limit, offset // limit
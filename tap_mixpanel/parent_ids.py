@@ -0,0 +1,32 @@
+"""Ids of the parent records handed to a child stream, see `MixPanel.child`.
+
+A child stream is synced with the records of each parent page, before the
+parent records are transformed and written. The child only reads the id of
+each parent record, so it gets a view of the ids instead of a copy of the
+parent response: the records are neither copied nor exposed to the child.
+"""
+
+from types import MappingProxyType
+
+
+class ParentIds:
+    """Read-only view of the ids of the parent records, read lazily.
+
+    Each parent record is seen by the child as a read-only mapping of its id
+    field, built when the child reaches it.
+
+    Args:
+        records (list): Parent records.
+        id_field (str): Field of the parent id, the `parent_id_field` of the child.
+    """
+
+    def __init__(self, records, id_field):
+        self.__records = records
+        self.__id_field = id_field
+
+    def __iter__(self):
+        for record in self.__records:
+            yield MappingProxyType({self.__id_field: record.get(self.__id_field)})
+
+    def __len__(self):
+        return len(self.__records)
@@ -0,0 +1,243 @@
+"""Staged pipeline of the export stream download.
+
+Downloading, decoding, transforming and writing the export records on a single
+thread leaves the socket idle while the records are transformed. The pipeline
+runs them as stages connected by bounded queues:
+
+- a reader thread pulling the decompressed body and cutting it into blocks of
+  complete lines,
+- transform workers decoding and transforming the blocks,
+- a single writer, the consumer of the pipeline, getting the transformed
+  blocks back in the order they were read.
+
+The queues hold at most `queue_size` blocks each, so a slow writer stops the
+reader instead of growing the memory. The busy time of every stage is measured
+to find the bottleneck stage, see PipelineStats.
+"""
+
+import queue
+import threading
+import time
+
+import singer
+from singer import metrics
+
+LOGGER = singer.get_logger()
+
+# Blocks waiting between two stages
+PIPELINE_QUEUE_SIZE = 8
+# Seconds between two checks of the stop event by the stages blocked on a queue
+QUEUE_TIMEOUT = 0.1
+
+# End of the blocks of a stage
+STOP = object()
+
+
+class StageError:
+    """Exception raised by a stage, re-raised by the writer.
+
+    Args:
+        error (BaseException): Exception raised by the stage.
+    """
+
+    def __init__(self, error):
+        self.error = error
+
+
+class PipelineStats:
+    """Busy time of the pipeline stages.
+
+    A stage is busy while it reads, transforms or writes a block, and idle while
+    it waits on a queue. The stage with the highest utilization is the bottleneck:
+    a reader close to 100% means the network is saturated.
+
+    Args:
+        stages (list): Names of the stages.
+    """
+
+    def __init__(self, stages):
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.busy = {stage: 0.0 for stage in stages}
+        self.blocks = {stage: 0 for stage in stages}
+        self.__lock = threading.Lock()
+
+    def add(self, stage, busy):
+        """Add the busy time of a block to a stage."""
+        with self.__lock:
+            self.busy[stage] += busy
+            self.blocks[stage] += 1
+
+    def finish(self):
+        """Stop the clock of the pipeline."""
+        if self.finished_at is None:
+            self.finished_at = time.monotonic()
+
+    @property
+    def elapsed(self):
+        """Seconds the pipeline ran."""
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def utilization(self, workers=None):
+        """Busy fraction of every stage.
+
+        Args:
+            workers (dict, optional): Number of threads of the stages running on several threads.
+
+        Returns:
+            dict: Utilization between 0 and 1 by stage name.
+        """
+        workers = workers or {}
+        elapsed = self.elapsed or 1e-9
+        return {
+            stage: min(busy / (elapsed * workers.get(stage, 1)), 1.0)
+            for stage, busy in self.busy.items()
+        }
+
+
+class Pipeline:
+    """Pipeline reading, transforming and writing blocks of lines.
+
+    Iterating the pipeline starts the reader and the transform workers, and yields
+    the transformed blocks in read order. Any exception of a stage is raised by the
+    iteration; closing the iteration stops the other stages.
+
+    Args:
+        chunks (iterable): Chunks of bytes of the jsonl body, lines may span chunks.
+        transform (callable): Transform a block of complete lines into a list of records.
+        workers (int, optional): Number of transform workers.
+        queue_size (int, optional): Blocks waiting between two stages.
+        name (str, optional): Name of the pipeline in the logs and metrics.
+    """
+
+    def __init__(self, chunks, transform, workers=1, queue_size=PIPELINE_QUEUE_SIZE, name="pipeline"):
+        self.chunks = chunks
+        self.transform = transform
+        self.workers = max(int(workers), 1)
+        self.name = name
+        self.stats = PipelineStats(["read", "transform", "write"])
+        self.__blocks = queue.Queue(maxsize=queue_size)
+        self.__results = queue.Queue(maxsize=queue_size)
+        self.__stop = threading.Event()
+
+    def put(self, target, item):
+        """Put an item on a queue, giving up if the pipeline is stopped.
+
+        Returns:
+            bool: Whether the item was put on the queue.
+        """
+        while not self.__stop.is_set():
+            try:
+                target.put(item, timeout=QUEUE_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, source):
+        """Get an item of a queue, STOP if the pipeline is stopped."""
+        while not self.__stop.is_set():
+            try:
+                return source.get(timeout=QUEUE_TIMEOUT)
+            except queue.Empty:
+                continue
+        return STOP
+
+    def read(self):
+        """Reader stage: cut the chunks into numbered blocks of complete lines."""
+        try:
+            sequence = 0
+            pending = b""
+            chunks = iter(self.chunks)
+            while not self.__stop.is_set():
+                started_at = time.monotonic()
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                data = pending + chunk
+                cut = data.rfind(b"\n") + 1
+                pending = data[cut:]
+                self.stats.add("read", time.monotonic() - started_at)
+                if cut and not self.put(self.__blocks, (sequence, data[:cut])):
+                    return
+                if cut:
+                    sequence += 1
+            # The last line may not end with a new line
+            if pending and not self.put(self.__blocks, (sequence, pending)):
+                return
+        except BaseException as err:  # pylint: disable=broad-except
+            self.put(self.__results, StageError(err))
+        finally:
+            for _ in range(self.workers):
+                self.put(self.__blocks, STOP)
+
+    def work(self):
+        """Transform stage: transform the blocks into lists of records."""
+        try:
+            while True:
+                item = self.get(self.__blocks)
+                if item is STOP:
+                    return
+                sequence, block = item
+                started_at = time.monotonic()
+                records = self.transform(block)
+                self.stats.add("transform", time.monotonic() - started_at)
+                if not self.put(self.__results, (sequence, records)):
+                    return
+        except BaseException as err:  # pylint: disable=broad-except
+            self.put(self.__results, StageError(err))
+        finally:
+            self.put(self.__results, STOP)
+
+    def __iter__(self):
+        threads = [threading.Thread(target=self.read, name=f"{self.name}-read", daemon=True)]
+        threads += [
+            threading.Thread(target=self.work, name=f"{self.name}-transform-{index}", daemon=True)
+            for index in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        # Transformed blocks waiting for an earlier block, at most one per worker and queued block
+        done = {}
+        next_sequence = 0
+        stopped = 0
+        try:
+            while stopped < self.workers:
+                item = self.get(self.__results)
+                if item is STOP:
+                    stopped += 1
+                    continue
+                if isinstance(item, StageError):
+                    raise item.error
+                sequence, records = item
+                done[sequence] = records
+                while next_sequence in done:
+                    started_at = time.monotonic()
+                    yield done.pop(next_sequence)
+                    self.stats.add("write", time.monotonic() - started_at)
+                    next_sequence += 1
+        finally:
+            self.__stop.set()
+            self.stats.finish()
+            self.log_stats()
+
+    def log_stats(self):
+        """Log the utilization of every stage as singer metrics."""
+        utilization = self.stats.utilization({"transform": self.workers})
+        for stage, value in utilization.items():
+            metrics.log(
+                LOGGER,
+                metrics.Point(
+                    "gauge",
+                    "pipeline_stage_utilization",
+                    round(value, 3),
+                    {"pipeline": self.name, "stage": stage, "blocks": self.stats.blocks[stage]},
+                ),
+            )
+        LOGGER.info(
+            "Pipeline %s ran %.1f seconds, bottleneck stage: %s",
+            self.name,
+            self.stats.elapsed,
+            max(utilization, key=utilization.get),
+        )
@@ -0,0 +1,66 @@
+"""Look-ahead requests of the next pages of the paginated streams, see `page_prefetch`.
+
+The pages of engage and cohort_members are requested one after the other, and
+each page is transformed and written before the next one is requested. Once the
+first page gives the session_id and the total, the next pages are known: the
+PagePrefetcher requests up to `max_pages` of them on worker threads, while the
+current page is transformed and written.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import singer
+
+LOGGER = singer.get_logger()
+
+
+class PagePrefetcher:
+    """Pages requested ahead, by querystring.
+
+    Args:
+        request (callable): Request a page from its querystring, see `MixPanel.request_page`.
+        max_pages (int): Maximum number of pages requested ahead and not read yet.
+    """
+
+    def __init__(self, request, max_pages):
+        self.request = request
+        self.max_pages = max_pages
+        self.executor = ThreadPoolExecutor(max_workers=max_pages)
+        self.pages = {}
+
+    def prefetch(self, querystrings):
+        """Request the next pages, up to max_pages not read yet.
+
+        Args:
+            querystrings (iterable): Querystrings of the next pages, in page order.
+        """
+        for querystring in querystrings:
+            if len(self.pages) >= self.max_pages:
+                break
+            if querystring not in self.pages:
+                self.pages[querystring] = self.executor.submit(self.request, querystring)
+
+    def get(self, querystring):
+        """Get a page, waiting for it if it was requested ahead.
+
+        Args:
+            querystring (str): Querystring of the page.
+
+        Returns:
+            object: Result of the request of the page.
+        """
+        future = self.pages.pop(querystring, None)
+        if future is None:
+            return self.request(querystring)
+        return future.result()
+
+    def cancel(self):
+        """Drop the pages not read yet, cancelling those which are not requested yet."""
+        for future in self.pages.values():
+            future.cancel()
+        self.pages = {}
+
+    def close(self):
+        """Cancel the pages which are not requested yet and stop the workers."""
+        self.cancel()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,178 @@
+"""Token-bucket rate limiter shared by all the requests of a MixpanelClient."""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import singer
+
+LOGGER = singer.get_logger()
+
+# Endpoint classes with separate rate limits
+# Reference: https://developer.mixpanel.com/reference/rate-limits
+EXPORT_ENDPOINT = "export"
+QUERY_ENDPOINT = "query"
+
+# The Raw Export API allows 3 queries per second.
+EXPORT_RATE_LIMIT = 3
+# The Query API is limited per hour and by concurrency, it is not paced up front by default.
+QUERY_RATE_LIMIT = None
+
+
+def get_endpoint_class(url):
+    """Get the endpoint class (export or query API) of the URL.
+
+    Args:
+        url (str): URL of the request.
+
+    Returns:
+        str: EXPORT_ENDPOINT for the raw export API, QUERY_ENDPOINT otherwise.
+    """
+    parsed_url = urlparse(url or "")
+    if parsed_url.netloc.startswith("data") or parsed_url.path.endswith("/export"):
+        return EXPORT_ENDPOINT
+    return QUERY_ENDPOINT
+
+
+def parse_retry_after(value):
+    """Parse the `Retry-After` header value to a number of seconds.
+
+    Args:
+        value (str): Delay in seconds or an HTTP date.
+
+    Returns:
+        float: Seconds to wait, None if the value can not be parsed.
+    """
+    try:
+        return max(float(value), 0)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class TokenBucket:
+    """Token bucket of a single host and endpoint class.
+
+    Args:
+        rate (float): Requests per second, None to not pace the requests.
+        capacity (int): Maximum number of requests sent in a burst.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0
+
+    def reserve(self, now):
+        """Take a token from the bucket.
+
+        Args:
+            now (float): Current monotonic time.
+
+        Returns:
+            float: Seconds to wait before the request can be sent.
+        """
+        wait = max(self.blocked_until - now, 0)
+        if self.rate:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            # Tokens may go negative, the following requests then wait for their turn
+            self.tokens -= 1
+            if self.tokens < 0:
+                wait = max(wait, -self.tokens / self.rate)
+        return wait
+
+    def block(self, seconds, now):
+        """Do not allow any request for the next seconds.
+
+        Args:
+            seconds (float): Seconds to block the requests for.
+            now (float): Current monotonic time.
+        """
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class RateLimiter:
+    """Rate limiter with a token bucket per host and endpoint class.
+
+    A single RateLimiter is used by the client, so every stream and every worker
+    thread draws from the same budget.
+
+    Args:
+        export_rate_limit (float, optional): Requests per second for the export API.
+        query_rate_limit (float, optional): Requests per second for the query API.
+    """
+
+    def __init__(self, export_rate_limit=EXPORT_RATE_LIMIT, query_rate_limit=QUERY_RATE_LIMIT):
+        self.__rate_limits = {
+            EXPORT_ENDPOINT: export_rate_limit,
+            QUERY_ENDPOINT: query_rate_limit,
+        }
+        self.__buckets = {}
+        self.__lock = threading.Lock()
+
+    def get_bucket(self, url):
+        """Get the token bucket of the URL's host and endpoint class.
+
+        Args:
+            url (str): URL of the request.
+
+        Returns:
+            TokenBucket: Token bucket of the URL.
+        """
+        endpoint_class = get_endpoint_class(url)
+        key = (urlparse(url or "").netloc, endpoint_class)
+        if key not in self.__buckets:
+            rate = self.__rate_limits[endpoint_class]
+            capacity = max(int(rate), 1) if rate else 1
+            self.__buckets[key] = TokenBucket(rate, capacity)
+        return self.__buckets[key]
+
+    def acquire(self, url):
+        """Wait until a request to the URL is allowed by the rate limit.
+
+        Args:
+            url (str): URL of the request.
+        """
+        with self.__lock:
+            wait = self.get_bucket(url).reserve(time.monotonic())
+        if wait > 0:
+            LOGGER.info("Rate limit reached, waiting %.2f seconds before the request.", wait)
+            time.sleep(wait)
+
+    def update_from_response(self, url, response):
+        """Block the URL's bucket as requested by the rate limit headers of the response.
+
+        `Retry-After` is honored on any response. When `X-RateLimit-Remaining` is
+        0, the requests are blocked until `X-RateLimit-Reset`.
+
+        Args:
+            url (str): URL of the request.
+            response (requests.Response): Response of the request.
+        """
+        headers = getattr(response, "headers", None) or {}
+        wait = None
+
+        if headers.get("Retry-After") is not None:
+            wait = parse_retry_after(headers["Retry-After"])
+        elif str(headers.get("X-RateLimit-Remaining")) == "0":
+            try:
+                reset = float(headers.get("X-RateLimit-Reset"))
+            except (TypeError, ValueError):
+                reset = None
+            if reset is not None:
+                # The reset is either an epoch timestamp or a delay in seconds
+                wait = max(reset - time.time(), 0) if reset > 1e9 else reset
+
+        if wait:
+            LOGGER.warning("Rate limit headers received, pausing requests for %.2f seconds.", wait)
+            with self.__lock:
+                self.get_bucket(url).block(wait, time.monotonic())
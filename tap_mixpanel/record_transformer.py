@@ -0,0 +1,297 @@
+"""Record transformer compiled once per stream from the catalog schema and metadata.
+
+singer.Transformer walks the full JSON schema for every record, including the
+six-branch `anyOf` of every engage property. RecordTransformer resolves the
+schema walk once: each field gets a converter doing the type coercions of
+singer.Transformer, in the same order, and the deselected fields are found up
+front. The transformed records are identical to the singer.Transformer ones.
+"""
+
+import decimal
+
+import singer
+from singer import Transformer
+from singer.transform import string_to_datetime
+
+from tap_mixpanel.transform import is_normalized_datetime
+
+LOGGER = singer.get_logger()
+
+# Returned by the converters when the value does not match the schema
+FAIL = object()
+
+
+def identity(value):
+    """Converter of a schema without typing information."""
+    return value
+
+
+def convert_null(value):
+    """Converter of the null type."""
+    if value is None or value == "":
+        return None
+    return FAIL
+
+
+def convert_datetime(value):
+    """Converter of the date-time format, for any non-null type."""
+    if value is None or value == "":
+        return FAIL
+    # Normalized date-times, e.g. the converted export event times, are not parsed again
+    if is_normalized_datetime(value):
+        return value
+    value = string_to_datetime(value)
+    if value is None:
+        return FAIL
+    return value
+
+
+def convert_decimal(value):
+    """Converter of the singer.decimal format, for any non-null type."""
+    if isinstance(value, (str, float, int)):
+        try:
+            return str(decimal.Decimal(str(value)))
+        except Exception:  # pylint: disable=broad-except
+            return FAIL
+    if isinstance(value, decimal.Decimal):
+        try:
+            if value.is_snan():
+                return "NaN"
+            return str(value)
+        except Exception:  # pylint: disable=broad-except
+            return FAIL
+    return FAIL
+
+
+def convert_string(value):
+    """Converter of the string type."""
+    if value is None:
+        return FAIL
+    try:
+        return str(value)
+    except Exception:  # pylint: disable=broad-except
+        return FAIL
+
+
+def convert_integer(value):
+    """Converter of the integer type."""
+    if isinstance(value, str):
+        value = value.replace(",", "")
+    try:
+        return int(value)
+    except Exception:  # pylint: disable=broad-except
+        return FAIL
+
+
+def convert_number(value):
+    """Converter of the number type."""
+    if isinstance(value, str):
+        value = value.replace(",", "")
+    try:
+        return float(value)
+    except Exception:  # pylint: disable=broad-except
+        return FAIL
+
+
+def convert_boolean(value):
+    """Converter of the boolean type."""
+    if isinstance(value, str) and value.lower() == "false":
+        return False
+    try:
+        return bool(value)
+    except Exception:  # pylint: disable=broad-except
+        return FAIL
+
+
+def convert_dict(value):
+    """Converter of an object type without properties, kept as it is."""
+    if isinstance(value, dict):
+        return value
+    return FAIL
+
+
+def convert_list(value):
+    """Converter of an array type whose items have no typing information."""
+    if isinstance(value, list):
+        return list(value)
+    return FAIL
+
+
+def fail(value):  # pylint: disable=unused-argument
+    """Converter of an unknown type."""
+    return FAIL
+
+
+SCALAR_CONVERTERS = {
+    "string": convert_string,
+    "integer": convert_integer,
+    "number": convert_number,
+    "boolean": convert_boolean,
+}
+
+
+def first_match(converters):
+    """Get a converter returning the first successful conversion of the converters."""
+    if len(converters) == 1:
+        return converters[0]
+
+    def convert(value):
+        for converter in converters:
+            result = converter(value)
+            if result is not FAIL:
+                return result
+        return FAIL
+
+    return convert
+
+
+def generic_converter(schema):
+    """Get a converter delegating to singer.Transformer, for the schemas which are not compiled."""
+    transformer = Transformer()
+
+    def convert(value):
+        success, result = transformer.transform_recur(value, schema, [])
+        # Keep the errors of the failed conversions from piling up
+        transformer.errors.clear()
+        return result if success else FAIL
+
+    return convert
+
+
+def compile_object(properties):
+    """Get the converter of an object type with properties."""
+    converters = {key: compile_schema(sub_schema) for key, sub_schema in properties.items()}
+
+    def convert(value):
+        if not isinstance(value, dict):
+            return FAIL
+        result = {}
+        for key, item in value.items():
+            converter = converters.get(key)
+            # Keys which are not in the schema are removed
+            if converter is None:
+                continue
+            item = converter(item)
+            if item is FAIL:
+                return FAIL
+            result[key] = item
+        return result
+
+    return convert
+
+
+def compile_array(items):
+    """Get the converter of an array type."""
+    converter = compile_schema(items)
+    if converter is identity:
+        return convert_list
+
+    def convert(value):
+        if not isinstance(value, list):
+            return FAIL
+        result = []
+        for item in value:
+            item = converter(item)
+            if item is FAIL:
+                return FAIL
+            result.append(item)
+        return result
+
+    return convert
+
+
+def compile_type(typ, schema):
+    """Get the converter of a single type of a schema, as singer.Transformer._transform."""
+    if typ == "null":
+        return convert_null
+    if schema.get("format") == "date-time":
+        return convert_datetime
+    if schema.get("format") == "singer.decimal":
+        return convert_decimal
+    if typ == "object":
+        if schema.get("patternProperties"):
+            return generic_converter({**schema, "type": typ})
+        properties = schema.get("properties", {})
+        if properties == {}:
+            return convert_dict
+        return compile_object(properties)
+    if typ == "array":
+        if "items" not in schema:
+            return generic_converter({**schema, "type": typ})
+        return compile_array(schema["items"])
+    return SCALAR_CONVERTERS.get(typ, fail)
+
+
+def compile_schema(schema):
+    """Get the converter of a schema, as singer.Transformer.transform_recur.
+
+    Args:
+        schema (dict): JSON schema of the value.
+
+    Returns:
+        callable: Converter of a value, returning FAIL if the value does not match the schema.
+    """
+    if "anyOf" in schema:
+        return first_match([compile_schema(sub_schema) for sub_schema in schema["anyOf"]])
+
+    if "type" not in schema:
+        return identity
+
+    types = schema["type"]
+    if not isinstance(types, list):
+        types = [types]
+    # The null type is always tried last
+    if "null" in types:
+        types = list(types)
+        types.remove("null")
+        types.append("null")
+    return first_match([compile_type(typ, schema) for typ in types])
+
+
+class RecordTransformer:
+    """Transformer of the records of a stream, compiled from its schema and metadata.
+
+    Args:
+        schema (dict): JSON schema of the stream.
+        stream_metadata (dict): Metadata map of the stream.
+    """
+
+    def __init__(self, schema, stream_metadata):
+        self.schema = schema
+        self.stream_metadata = stream_metadata
+        self.convert = compile_schema(schema)
+
+        self.filtered_fields = set()
+        self.nested_metadata = False
+        for breadcrumb, mdata in (stream_metadata or {}).items():
+            if len(breadcrumb) > 2:
+                self.nested_metadata = True
+            elif len(breadcrumb) == 2 and mdata.get("inclusion") != "automatic":
+                if mdata.get("selected") is False or mdata.get("inclusion") == "unsupported":
+                    self.filtered_fields.add(breadcrumb[1])
+
+    def transform(self, record):
+        """Transform the record as singer.Transformer().transform(record, schema, metadata).
+
+        Args:
+            record (dict): Record to transform, its deselected fields are removed in place.
+
+        Raises:
+            SchemaMismatch: Raises if the record does not match the schema.
+
+        Returns:
+            dict: Transformed record.
+        """
+        if self.nested_metadata and isinstance(record, dict):
+            # Metadata of the nested fields is applied by the generic filter
+            record = Transformer().filter_data_by_metadata(record, self.stream_metadata)
+        elif self.filtered_fields and isinstance(record, dict):
+            for field_name in self.filtered_fields:
+                record.pop(field_name, None)
+
+        transformed_record = self.convert(record)
+        if transformed_record is FAIL:
+            # Get the same error as singer.Transformer
+            with Transformer() as transformer:
+                return transformer.transform(record, self.schema, self.stream_metadata)
+        return transformed_record
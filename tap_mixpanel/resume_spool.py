@@ -0,0 +1,119 @@
+"""Spool of an export response, to resume a retried date window, see `export_resume_spool`.
+
+A body broken in the middle is requested again by the backoff of
+get_and_transform_records, and the records of the broken attempt were already
+written. ResumeSpool keeps the raw lines of the date window in a temporary
+file, in memory up to SPOOL_MEMORY_SIZE, with the number of lines whose records
+are written. A retried attempt is compared with the spooled lines and skips the
+written ones without decoding them, so only the download is repeated.
+
+If the retried body differs from the spooled lines, the lines from the first
+difference on are all processed again: records may then be written twice, as
+without the spool, but none is lost.
+"""
+
+import tempfile
+
+import singer
+
+from tap_mixpanel.decoder import iter_lines
+
+LOGGER = singer.get_logger()
+
+# Bytes of the spooled lines kept in memory before they are spooled to disk
+SPOOL_MEMORY_SIZE = 16 * 1024 * 1024
+
+
+class ResumeSpool:
+    """Raw lines of the attempts of a date window, and the progress of their records.
+
+    Args:
+        querystring (str): Params of the date window request, identifying its retries.
+    """
+
+    def __init__(self, querystring):
+        self.querystring = querystring
+        self.file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_SIZE)
+        self.attempts = 0
+        # Lines read by the current attempt, and the spool offset after them
+        self.lines = 0
+        self.offset = 0
+        # Lines whose records are written
+        self.written_lines = 0
+        # Records written and bookmark after the written lines
+        self.records = 0
+        self.max_bookmark_value = None
+
+    def iter_chunks(self, chunks):
+        """Read the lines of an attempt which are not written yet.
+
+        Args:
+            chunks (iterable): Decompressed chunks of the response body.
+
+        Yields:
+            bytes: Lines not written by an earlier attempt, as chunks ending with a new line.
+        """
+        self.attempts += 1
+        self.lines = 0
+        self.offset = 0
+        lines = iter_lines(chunks)
+
+        # Skip the lines written by the earlier attempts, if they are the same
+        for line in lines:
+            if self.lines >= self.written_lines:
+                break
+            self.file.seek(self.offset)
+            spooled = self.file.readline()
+            if spooled[:-1] != line:
+                LOGGER.warning(
+                    "Export response of %s differs from the earlier attempt at line %s, "
+                    "%s lines already written are processed again",
+                    self.querystring,
+                    self.lines + 1,
+                    self.written_lines - self.lines,
+                )
+                self.written_lines = self.lines
+                break
+            self.lines += 1
+            self.offset += len(spooled)
+        else:
+            return
+        if self.lines:
+            LOGGER.info("Export response of %s resumed after %s written lines", self.querystring, self.lines)
+
+        self.file.seek(self.offset)
+        self.file.truncate()
+        # The first line not skipped was already read
+        yield from self.spool([line])
+        yield from self.spool(lines)
+
+    def spool(self, lines):
+        """Append the lines to the spool.
+
+        Args:
+            lines (iterable): Lines of the response body.
+
+        Yields:
+            bytes: Each line, ending with a new line.
+        """
+        for line in lines:
+            line = line + b"\n"
+            self.file.write(line)
+            self.lines += 1
+            self.offset += len(line)
+            yield line
+
+    def commit(self, records, max_bookmark_value):
+        """Record the lines read so far as written.
+
+        Args:
+            records (int): Records written from the lines read since the last commit.
+            max_bookmark_value (str): Bookmark after the written records.
+        """
+        self.written_lines = self.lines
+        self.records += records
+        self.max_bookmark_value = max_bookmark_value
+
+    def close(self):
+        """Close and delete the spool."""
+        self.file.close()
@@ -5,7 +5,7 @@ import singer
 from singer import metadata
 
 from tap_mixpanel.client import MixpanelPaymentRequiredError
-from tap_mixpanel.streams import STREAMS
+from tap_mixpanel.streams import ENGAGE_BOOKMARK_PROPERTY, STREAMS, Engage
 
 LOGGER = singer.get_logger()
 
@@ -128,7 +128,26 @@ def get_schema(client, properties_flag, stream_name):
     return schema
 
 
-def get_schemas(client, properties_flag):
+def get_replication(config, stream_name):
+    """Get the replication method and keys of a stream, from the config.
+
+    The engage stream is incremental on its bookmark property if `engage_incremental` is set.
+
+    Args:
+        config (dict): The tap config.
+        stream_name (str): Name of the stream.
+
+    Returns:
+        tuple: Replication method and replication keys.
+    """
+    stream_metadata = STREAMS[stream_name]
+    if stream_name == "engage" and str(config.get("engage_incremental")).lower() == "true":
+        bookmark_property = config.get("engage_bookmark_property") or ENGAGE_BOOKMARK_PROPERTY
+        return "INCREMENTAL", [Engage.get_bookmark_field(bookmark_property)]
+    return stream_metadata.replication_method, stream_metadata.replication_keys
+
+
+def get_schemas(client, properties_flag, config=None):
     """Load the schema references, prepare metadata for each streams and return
     schema and metadata for the catalog.
 
@@ -136,6 +155,7 @@ def get_schemas(client, properties_flag):
         client (MixpanelClient): Client object to make http calls.
         properties_flag (bool): Setting this argument to true ensures that new properties on
                                    events and engage records are captured.
+        config (dict, optional): The tap config, for the replication of the streams.
 
     Returns:
         tuple: Returns tuple of Schemas and metadata.
@@ -162,6 +182,7 @@ def get_schemas(client, properties_flag):
             continue
 
         schemas[stream_name] = schema
+        replication_method, replication_keys = get_replication(config or {}, stream_name)
         mdata = metadata.new()
 
         # Documentation:
@@ -171,17 +192,17 @@ def get_schemas(client, properties_flag):
         mdata = metadata.get_standard_metadata(
             schema=schema,
             key_properties=stream_metadata.key_properties,
-            valid_replication_keys=stream_metadata.replication_keys,
-            replication_method=stream_metadata.replication_method,
+            valid_replication_keys=replication_keys,
+            replication_method=replication_method,
         )
 
         mdata = metadata.to_map(mdata)
 
-        if stream_metadata.replication_keys:
+        if replication_keys:
             mdata = metadata.write(
                 mdata,
                 ("properties",
-                 stream_metadata.replication_keys[0]),
+                 replication_keys[0]),
                 "inclusion",
                 "automatic",
             )
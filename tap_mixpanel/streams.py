@@ -2,22 +2,68 @@
 
 import json
 import math
-from copy import deepcopy
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from datetime import datetime, timedelta
+from operator import itemgetter
 
 import urllib
 import pytz
 import requests
 import backoff
 import singer
-from singer import Transformer, metadata, metrics, utils
-from singer.utils import strptime_to_utc
-
-from tap_mixpanel.client import MixpanelClient
-from tap_mixpanel.transform import transform_datetime, transform_record
+from singer import metadata, metrics, utils
+from singer.utils import strftime, strptime_to_utc
+
+from tap_mixpanel import output
+from tap_mixpanel.checkpoint import DAY_CONTINUES, DAY_FINISHED, OUT_OF_ORDER, DayCheckpoints
+from tap_mixpanel.client import MixpanelClient, ReadTimeoutError, Server5xxError
+from tap_mixpanel.dedup import DedupIndex, get_dedup_entry
+from tap_mixpanel.decoder import iter_jsonl
+from tap_mixpanel.engage_partitions import PartitionedScan
+from tap_mixpanel.event_shards import (
+    EVENT_NAMES_DAYS,
+    EVENT_NAMES_LIMIT,
+    EventShards,
+    get_event_querystring,
+    split_event_names,
+)
+from tap_mixpanel.page_sizing import DEFAULT_BYTE_BUDGET, DEFAULT_SECONDS_BUDGET, PageSizer
+from tap_mixpanel.parent_ids import ParentIds
+from tap_mixpanel.pipeline import Pipeline
+from tap_mixpanel.prefetch import PagePrefetcher
+from tap_mixpanel.record_transformer import RecordTransformer
+from tap_mixpanel.resume_spool import ResumeSpool
+from tap_mixpanel.transform import (
+    denest_properties,
+    get_event_time_converter,
+    normalize_datetime,
+    transform_datetime,
+    transform_record,
+)
+from tap_mixpanel.transform_pool import TransformPool
+from tap_mixpanel.window_sizing import DEFAULT_MAX_DAYS, DEFAULT_MIN_DAYS, WindowSizer
 
 LOGGER = singer.get_logger()
 
+# Records per page of the paginated endpoints, see `engage_page_size`
+PAGE_SIZE = 250
+# Export records whose event times are converted at once, see `EventTimeConverter.convert_records`
+EVENT_TIME_BATCH_SIZE = 1000
+# Options of the sequentially synced export date windows, not used with `export_window_concurrency`
+SEQUENTIAL_EXPORT_OPTIONS = (
+    "transform_processes",
+    "export_pipeline_workers",
+    "export_day_checkpoints",
+    "export_resume_spool",
+)
+# Hours before the engage bookmark synced again, see `engage_lookback_hours`
+ENGAGE_LOOKBACK_HOURS = 24
+# Profile property of the engage bookmark, see `engage_bookmark_property`
+ENGAGE_BOOKMARK_PROPERTY = "$last_seen"
+
 
 class MixPanel:
     """
@@ -39,12 +85,43 @@ class MixPanel:
     bookmark_query_field_from = None
     bookmark_query_field_to = None
     pagination = False
+    # Whether the date windows may be fetched concurrently with `sync_windows_concurrently`,
+    #   see `export_window_concurrency`
+    concurrent_windows = False
     parent_path = None
     parent_id_field = None
     url = "https://mixpanel.com/api/2.0"
 
     def __init__(self, client: MixpanelClient):
         self.client = client
+        # Record transformers compiled from the catalog, by stream name
+        self.record_transformers = {}
+        # Writer of the records to BATCH files, None to write RECORD messages
+        self.batch_writer = None
+        # Transform workers of the export pipeline, 0 to download and transform serially
+        self.pipeline_workers = 0
+        # Pool of the export transform processes, see `transform_processes`
+        self.transform_pool = None
+        # Index of the emitted export events, see `dedup_index_path`
+        self.dedup_index = None
+        # Whether the export bookmark is written at the day boundaries of the date windows
+        self.day_checkpoints = False
+        # Size of the date windows adapted to the observed volume, see `date_window_byte_budget`
+        self.window_sizer = None
+        # Downloader of the export event shards, see `export_event_shards`
+        self.event_shards = None
+        # Whether a retried export date window resumes after its written records,
+        #   and the spool of the current date window, see `export_resume_spool`
+        self.resume_retries = False
+        self.resume_spool = None
+        # Pages requested ahead and the querystring of a page of the current parent,
+        #   see `page_prefetch`
+        self.page_prefetcher = None
+        self.page_querystring = None
+        # Page size of the paginated streams, adapted to the responses by the sizer
+        #   in the auto mode, see `engage_page_size`
+        self.page_size = PAGE_SIZE
+        self.page_sizer = None
 
     def write_schema(self, catalog, stream_name):
         """Writes the schema of the stream form the catalog.
@@ -59,7 +136,7 @@ class MixPanel:
         stream = catalog.get_stream(stream_name)
         schema = stream.schema.to_dict()
         try:
-            singer.write_schema(stream_name, schema, stream.key_properties)
+            output.write_schema(stream_name, schema, stream.key_properties)
         except OSError as err:
             LOGGER.error("OS Error writing schema for: %s", stream_name)
             raise err
@@ -89,11 +166,60 @@ class MixPanel:
             stream (str): Name of stream whose bookmark will be written.
             value (str): Bookmark value of the stream.
         """
+        # The state must not cover records of an unannounced BATCH file
+        if self.batch_writer:
+            self.batch_writer.finish()
         if "bookmarks" not in state:
             state["bookmarks"] = {}
         state["bookmarks"][stream] = value
         LOGGER.info("Write state for stream: %s, value: %s", stream, value)
-        singer.write_state(state)
+        output.write_state(state)
+        # The emitted events are committed once the state covering them is written
+        if self.dedup_index:
+            self.dedup_index.commit()
+
+    def get_record_transformer(self, catalog, stream_name):
+        """Get the record transformer of the stream, compiled once per stream object.
+
+        Args:
+            catalog (singer.Catalog): Catalog object having schema and metadata of all the streams.
+            stream_name (str): Name of the syncing stream.
+
+        Returns:
+            RecordTransformer: Transformer of the stream records.
+        """
+        if stream_name not in self.record_transformers:
+            stream = catalog.get_stream(stream_name)
+            self.record_transformers[stream_name] = RecordTransformer(
+                stream.schema.to_dict(), metadata.to_map(stream.metadata)
+            )
+        return self.record_transformers[stream_name]
+
+    def write_record(self, stream_name, record, time_extracted):
+        """Write a record as a RECORD message, or to a BATCH file in batch mode.
+
+        Args:
+            stream_name (str): Name of the syncing stream.
+            record (dict): Transformed record.
+            time_extracted (datetime): Datetime when the data was extracted from the API
+        """
+        if self.batch_writer:
+            self.batch_writer.write_record(record)
+        else:
+            output.write_record(stream_name, record, time_extracted=time_extracted)
+
+    def write_record_json(self, stream_name, record_json, time_extracted):
+        """Write an already serialized record as a RECORD message, or to a BATCH file in batch mode.
+
+        Args:
+            stream_name (str): Name of the syncing stream.
+            record_json (str): Transformed record serialized with simplejson.dumps(record, use_decimal=True).
+            time_extracted (datetime): Datetime when the data was extracted from the API
+        """
+        if self.batch_writer:
+            self.batch_writer.write_record_json(record_json)
+        else:
+            output.write_record_json(stream_name, record_json, time_extracted=time_extracted)
 
     def process_records(
         self,  # pylint: disable=too-many-branches
@@ -125,53 +251,118 @@ class MixPanel:
         Returns:
             tuple: Tuple of maximum bookmark value if written records and written records count.
         """
-        stream = catalog.get_stream(stream_name)
-        schema = stream.schema.to_dict()
-        stream_metadata = metadata.to_map(stream.metadata)
+        record_transformer = self.get_record_transformer(catalog, stream_name)
 
+        # Bookmarks are compared as normalized date-time strings, parsed once per batch
+        last_dttm = transform_datetime(last_datetime)
+        max_dttm = None
+        if max_bookmark_value is not None:
+            max_dttm = transform_datetime(max_bookmark_value)
+
+        records_to_write = []
+        dedup_entries = []
+        dedup_entry = None
         with metrics.record_counter(stream_name) as counter:
             for record in records:
+                # The event key is taken before the deselected fields are removed
+                if self.dedup_index:
+                    dedup_entry = get_dedup_entry(record)
+
                 # Transform record for Singer.io
-                with Transformer() as transformer:
-                    try:
-                        transformed_record = transformer.transform(
-                            record, schema, stream_metadata
-                        )
-                    except Exception as err:
-                        LOGGER.error("Error: %s", str(err))
-                        LOGGER.error(
-                            "For schema: %s",
-                            json.dumps(schema, sort_keys=True, indent=2),
-                        )
-                        raise err
-
-                    # Reset max_bookmark_value to new value if higher
-                    if transformed_record.get(bookmark_field):
-                        if max_bookmark_value is None or transformed_record[
-                            bookmark_field
-                        ] > transform_datetime(max_bookmark_value):
-                            max_bookmark_value = transformed_record[bookmark_field]
-
-                    if bookmark_field and (bookmark_field in transformed_record):
-                        last_dttm = transform_datetime(last_datetime)
-                        bookmark_dttm = transform_datetime(
-                            transformed_record[bookmark_field]
-                        )
-                        # Keep only records whose bookmark is after the last_datetime
-                        if bookmark_dttm >= last_dttm:
-                            singer.write_record(
-                                stream_name,
-                                transformed_record,
-                                time_extracted=time_extracted,
-                            )
-                            counter.increment()
-                    else:
-                        singer.write_record(
-                            stream_name,
-                            transformed_record,
-                            time_extracted=time_extracted,
-                        )
-                        counter.increment()
+                try:
+                    transformed_record = record_transformer.transform(record)
+                except Exception as err:
+                    LOGGER.error("Error: %s", str(err))
+                    LOGGER.error(
+                        "For schema: %s",
+                        json.dumps(record_transformer.schema, sort_keys=True, indent=2),
+                    )
+                    raise err
+
+                bookmark_value = transformed_record.get(bookmark_field)
+                bookmark_dttm = normalize_datetime(bookmark_value) if bookmark_field else None
+
+                # Reset max_bookmark_value to new value if higher
+                if bookmark_value:
+                    if max_bookmark_value is None or bookmark_value > max_dttm:
+                        max_bookmark_value = bookmark_value
+                        max_dttm = bookmark_dttm
+
+                # Keep only records whose bookmark is after the last_datetime
+                if (
+                    not bookmark_field
+                    or bookmark_field not in transformed_record
+                    or bookmark_dttm >= last_dttm
+                ):
+                    records_to_write.append(transformed_record)
+                    dedup_entries.append(dedup_entry)
+
+            # Drop the records emitted by an earlier sync, see `dedup_index_path`
+            if self.dedup_index:
+                records_to_write = self.dedup_index.drop_emitted(records_to_write, dedup_entries)
+
+            for transformed_record in records_to_write:
+                self.write_record(stream_name, transformed_record, time_extracted)
+                counter.increment()
+
+            return max_bookmark_value, counter.value
+
+    def process_serialized_records(
+        self,
+        catalog,  # pylint: disable=unused-argument
+        stream_name,
+        records,
+        time_extracted,
+        bookmark_field=None,
+        max_bookmark_value=None,
+        last_datetime=None,
+    ):
+        """Write the records transformed and serialized by the transform processes,
+        as process_records does for the transformed records.
+
+        Args:
+            stream_name (str): Name of the syncing stream.
+            records (list): Tuples of the bookmark value, the normalized bookmark value,
+                            the serialized record and the dedup entry, see
+                            transform_pool.transform_block.
+            time_extracted (datetime): Datetime when the data was extracted from the API
+            bookmark_field (str, optional): Bookmark field in the state if stream is INCREMENTAL.
+                                            Defaults to None.
+            max_bookmark_value (str, optional): Maximum bookmark value if written records if replication key
+                                                is available. Defaults to None.
+            last_datetime (str, optional): Last datetime from which greater replication value records will be written.
+                                           Defaults to None.
+
+        Returns:
+            tuple: Tuple of maximum bookmark value if written records and written records count.
+        """
+        last_dttm = transform_datetime(last_datetime)
+        max_dttm = None
+        if max_bookmark_value is not None:
+            max_dttm = transform_datetime(max_bookmark_value)
+
+        records_to_write = []
+        dedup_entries = []
+        with metrics.record_counter(stream_name) as counter:
+            for bookmark_value, bookmark_dttm, record_json, dedup_entry in records:
+                # Reset max_bookmark_value to new value if higher
+                if bookmark_value:
+                    if max_bookmark_value is None or bookmark_value > max_dttm:
+                        max_bookmark_value = bookmark_value
+                        max_dttm = bookmark_dttm
+
+                # Keep only records whose bookmark is after the last_datetime
+                if bookmark_dttm is None or bookmark_dttm >= last_dttm:
+                    records_to_write.append(record_json)
+                    dedup_entries.append(dedup_entry)
+
+            # Drop the records emitted by an earlier sync, see `dedup_index_path`
+            if self.dedup_index:
+                records_to_write = self.dedup_index.drop_emitted(records_to_write, dedup_entries)
+
+            for record_json in records_to_write:
+                self.write_record_json(stream_name, record_json, time_extracted)
+                counter.increment()
 
             return max_bookmark_value, counter.value
 
@@ -223,13 +414,23 @@ class MixPanel:
         """
 
         session_id = None
-        data = self.client.request(
-            method="GET",
-            url=self.url,
-            path=self.path,
-            params=querystring,
-            endpoint=self.tap_stream_id,
-        )
+        if self.page_prefetcher:
+            data, response_bytes, seconds = self.page_prefetcher.get(querystring)
+            # The next pages are requested while this one is transformed and written
+            if isinstance(data, dict) and data.get("session_id"):
+                last_page = data.get("total", 0) // limit if page == 0 else total_records // limit
+                self.page_prefetcher.prefetch(
+                    self.page_querystring(next_page, data["session_id"])
+                    for next_page in range(page + 1, last_page + 1)
+                )
+        else:
+            data, response_bytes, seconds = self.request_page(querystring)
+        if self.page_sizer and isinstance(data, dict):
+            self.page_sizer.observe(
+                records=len(data.get(self.data_key) or []),
+                response_bytes=response_bytes,
+                seconds=seconds,
+            )
 
         full_url = f"{self.url}/{self.path}{f'?{querystring}' if querystring else ''}"
         if not data:
@@ -237,7 +438,7 @@ class MixPanel:
             # No data results
         else:  # Has data
 
-            # Sync child stream first
+            # Sync child stream first, with a view of the ids of the parent records
             if self.child and self.child in selected_streams:
                 child_obj = STREAMS[self.child](self.client)
                 child_obj.sync(
@@ -246,7 +447,10 @@ class MixPanel:
                     config,
                     config["start_date"],
                     selected_streams,
-                    parent_data=deepcopy(data),
+                    parent_data=ParentIds(
+                        (data.get(self.data_key) or []) if isinstance(data, dict) else data,
+                        child_obj.parent_id_field,
+                    ),
                 )
 
             # time_extracted: datetime when the data was extracted from the API
@@ -410,6 +614,149 @@ class MixPanel:
 
         return start_window, end_window, days_interval
 
+    def get_window_sizer(self, state, config, days_interval):
+        """Get the sizer of the date windows, if a byte or time budget is configured.
+
+        Args:
+            state (dict): State containing the volume observed by earlier syncs, if available.
+            config (dict): The tap config.
+            days_interval (int): Date window size from the config.
+
+        Returns:
+            WindowSizer: Sizer of the date windows, None to keep days_interval.
+        """
+        byte_budget = int(config.get("date_window_byte_budget") or 0)
+        seconds_budget = float(config.get("date_window_seconds_budget") or 0)
+        if not byte_budget and not seconds_budget:
+            return None
+        window_sizer = WindowSizer(
+            days_interval,
+            byte_budget=byte_budget,
+            seconds_budget=seconds_budget,
+            min_days=int(config.get("date_window_min_size") or DEFAULT_MIN_DAYS),
+            max_days=int(config.get("date_window_max_size") or DEFAULT_MAX_DAYS),
+            stats=(state or {}).get("window_stats", {}).get(self.tap_stream_id),
+        )
+        LOGGER.info(
+            "Date window size for stream %s: %s days", self.tap_stream_id, window_sizer.days_interval
+        )
+        return window_sizer
+
+    def request_page(self, querystring):
+        """Request a page of the stream, measured for the page sizer in the auto mode.
+
+        The page is measured by the request itself, so the pages requested ahead
+        on the worker threads of `page_prefetch` are measured alike.
+
+        Args:
+            querystring (str): Params in URL query format to join with stream path
+
+        Returns:
+            tuple: Response, and its decompressed bytes and the seconds of the request,
+                   None without page sizer.
+        """
+        if not self.page_sizer:
+            data = self.client.request(
+                method="GET",
+                url=self.url,
+                path=self.path,
+                params=querystring,
+                endpoint=self.tap_stream_id,
+            )
+            return data, None, None
+        started = time.monotonic()
+        data, response_bytes = self.client.request_with_size(
+            method="GET",
+            url=self.url,
+            path=self.path,
+            params=querystring,
+            endpoint=self.tap_stream_id,
+        )
+        return data, response_bytes, time.monotonic() - started
+
+    def get_page_size(self, state, config):
+        """Get the page size of the stream, and its sizer in the auto mode.
+
+        Args:
+            state (dict): State containing the responses observed by earlier syncs, if available.
+            config (dict): The tap config.
+
+        Returns:
+            tuple: Page size, and the PageSizer adapting it or None for a fixed page size.
+        """
+        page_size = config.get(f"{self.tap_stream_id}_page_size")
+        if str(page_size).lower() != "auto":
+            return int(page_size or PAGE_SIZE), None
+        page_sizer = PageSizer(
+            PAGE_SIZE,
+            seconds_budget=float(config.get("page_size_seconds_budget") or DEFAULT_SECONDS_BUDGET),
+            byte_budget=int(config.get("page_size_byte_budget") or DEFAULT_BYTE_BUDGET),
+            stats=(state or {}).get("page_stats", {}).get(self.tap_stream_id),
+        )
+        LOGGER.info("Page size for stream %s: auto, from %s", self.tap_stream_id, page_sizer.page_size)
+        return page_sizer.page_size, page_sizer
+
+    def get_date_windows(self, start_window, end_window, now_datetime, days_interval, window_sizer=None):
+        """Generate the date windows to sync, from start_window up to now_datetime.
+
+        Args:
+            start_window (datetime): Start of the first date window.
+            end_window (datetime): End of the first date window.
+            now_datetime (datetime): Datetime up to which records are synced.
+            days_interval (int): Number of days in each date window.
+            window_sizer (WindowSizer, optional): Sizer of the next date windows,
+                                                  read after each date window is synced.
+
+        Yields:
+            tuple: Tuple of start_window and end_window of each date window.
+        """
+        while start_window < now_datetime:
+            yield start_window, end_window
+            if window_sizer:
+                days_interval = window_sizer.days_interval
+
+            # Increment date window
+            # Start after the day of end_window
+            start_window = end_window + timedelta(days=1)
+            next_end_window = end_window + timedelta(days=days_interval)
+            if next_end_window > now_datetime:
+                end_window = now_datetime
+            else:
+                end_window = next_end_window
+
+    def get_querystring(self, params, parent_id, export_events=None):
+        """Squash query params into a URL querystring and replace [parent_id].
+
+        Args:
+            params (dict): Query params of the request.
+            parent_id (str): ID of the parent record.
+            export_events (str, optional): Comma separated events to export. Defaults to None.
+
+        Returns:
+            str: Params in URL query format to join with stream path.
+        """
+        querystring = "&".join([f"{key}={value}" for (key, value) in params.items()])
+        querystring = querystring.replace("[parent_id]", str(parent_id))
+
+        # To fetch specific event date add event from config if given
+        #   Event shards add their own events instead
+        if self.tap_stream_id == 'export' and export_events and not self.event_shards:
+            querystring += get_event_querystring(map(str.strip, export_events.split(',')))
+
+        return querystring
+
+    def update_url(self, config):
+        """Update url if eu_residency is selected.
+
+        Args:
+            config (dict): The tap config.
+        """
+        if str(config.get("eu_residency")).lower() == "true":
+            if self.tap_stream_id == "export":
+                self.url = "https://data-eu.mixpanel.com/api/2.0"
+            else:
+                self.url = "https://eu.mixpanel.com/api/2.0"
+
     def sync(
         self, state, catalog, config, start_date, selected_streams, parent_data=None
     ):
@@ -432,12 +779,7 @@ class MixPanel:
         attribution_window = int(config.get("attribution_window", "5"))
         export_events = config.get('export_events')
 
-        # Update url if eu_residency is selected
-        if str(config.get("eu_residency")).lower() == "true":
-            if self.tap_stream_id == "export":
-                self.url = "https://data-eu.mixpanel.com/api/2.0"
-            else:
-                self.url = "https://eu.mixpanel.com/api/2.0"
+        self.update_url(config)
 
         # Get the latest bookmark for the stream and set the last_integer/datetime
         last_datetime = self.get_bookmark(state, self.tap_stream_id, start_date)
@@ -451,15 +793,64 @@ class MixPanel:
         if end_date:
             now_datetime = strptime_to_utc(end_date)
 
+        # Export records may be written to BATCH files instead of RECORD messages
+        if self.tap_stream_id == "export" and str(config.get("export_batch_mode")).lower() == "true":
+            self.batch_writer = output.BatchWriter(
+                self.tap_stream_id,
+                config.get("batch_dir") or "batches",
+                int(config.get("batch_max_records") or output.BATCH_MAX_RECORDS),
+            )
+
+        # Export records may be downloaded, transformed and written on a staged pipeline,
+        #   checkpointed at the day boundaries of the date windows, and resumed on retries
+        if self.tap_stream_id == "export":
+            self.pipeline_workers = int(config.get("export_pipeline_workers") or 0)
+            self.day_checkpoints = str(config.get("export_day_checkpoints")).lower() == "true"
+            self.resume_retries = str(config.get("export_resume_spool")).lower() == "true"
+
+        # Export and funnels date windows may be sized from the volume of the previous ones
+        if self.tap_stream_id in ("export", "funnels"):
+            self.window_sizer = self.get_window_sizer(state, config, days_interval)
+            if self.window_sizer:
+                days_interval = self.window_sizer.days_interval
+
         start_window, end_window, days_interval = self.define_bookmark_filters(
             days_interval, last_datetime, now_datetime, attribution_window, start_date
         )
+        date_windows = self.get_date_windows(
+            start_window, end_window, now_datetime, days_interval, self.window_sizer
+        )
+
+        # Export date windows may be fetched concurrently, see `export_window_concurrency`
+        window_concurrency = int(config.get("export_window_concurrency") or 1)
+        if self.concurrent_windows and window_concurrency > 1:
+            # Defined by the streams with concurrent_windows
+            return self.sync_windows_concurrently(  # pylint: disable=no-member
+                date_windows,
+                window_concurrency,
+                state,
+                catalog,
+                project_timezone,
+                tzone,
+                export_events,
+                last_datetime,
+                max_bookmark_value,
+            )
+
+        if self.pagination:
+            self.page_size, self.page_sizer = self.get_page_size(state, config)
+
+        # Pages of the paginated streams may be requested ahead, see `page_prefetch`
+        page_prefetch = int(config.get("page_prefetch") or 0)
+        if self.pagination and page_prefetch > 0:
+            self.page_prefetcher = PagePrefetcher(self.request_page, page_prefetch)
+
         # LOOP order: Date Windows, Parent IDs, Page
         # Initialize counter
         endpoint_total = 0  # Total for ALL: parents, date windows, and pages
 
         # Begin date windowing loop
-        while start_window < now_datetime:
+        for start_window, end_window in date_windows:
             # Initialize counters
             date_total = 0  # Total records for a date window
             parent_total = 0  # Total records for parent ID
@@ -502,6 +893,11 @@ class MixPanel:
                     parent_data = [{"id": "none"}]
                     self.parent_id_field = "id"
 
+            # Volume of the date window, after the parent request
+            window_responses = self.client.response_count
+            window_bytes = self.client.response_bytes
+            window_started = time.monotonic()
+
             for parent_record in parent_data:
                 parent_id = parent_record.get(self.parent_id_field)
                 LOGGER.info(
@@ -511,7 +907,7 @@ class MixPanel:
                 # Pagination: loop thru all pages of data using next (if not None)
                 page = 0  # First page is page=0, second page is page=1, ...
                 offset = 0
-                limit = 250  # Default page_size
+                limit = self.page_sizer.page_size if self.page_sizer else self.page_size
                 # Initialize counters
                 parent_total = 0  # Total records for parent ID
                 total_records = 0  # Total records for all pages
@@ -525,57 +921,68 @@ class MixPanel:
                 params.pop("session_id", None)
                 params.pop("page", None)
 
+                if self.page_prefetcher:
+                    def get_page_querystring(next_page, page_session_id, parent_id=parent_id):
+                        page_params = {**params, "session_id": page_session_id, "page": next_page}
+                        return self.get_querystring(page_params, parent_id, export_events)
+
+                    self.page_querystring = get_page_querystring
+
                 while offset <= total_records and session_id is not None:
                     if self.pagination and page != 0:
                         params["session_id"] = session_id
                         params["page"] = page
 
-                    # querystring: Squash query params into string and replace [parent_id]
-                    querystring = "&".join(
-                        [f"{key}={value}" for (key, value) in params.items()]
-                    )
-                    querystring = querystring.replace("[parent_id]", str(parent_id))
-
-                    # To fetch specific event date add event from config if given
-                    if self.tap_stream_id == 'export' and export_events:
-                        event = json.dumps(
-                            list(map(str.strip, export_events.split(',')))
-                        )
-                        url_encoded = urllib.parse.quote(event)
-                        querystring += f'&event={url_encoded}'
+                    querystring = self.get_querystring(params, parent_id, export_events)
 
                     full_url = f"{self.url}/{self.path}{f'?{querystring}' if querystring else ''}"
 
                     LOGGER.info("URL for Stream %s: %s", self.tap_stream_id, full_url)
 
-                    (
-                        parent_total,
-                        date_total,
-                        offset,
-                        page,
-                        session_id,
-                        endpoint_total,
-                        max_bookmark_value,
-                        total_records,
-                    ) = self.get_and_transform_records(
-                        querystring,
-                        project_timezone,
-                        max_bookmark_value,
-                        state,
-                        config,
-                        catalog,
-                        selected_streams,
-                        last_datetime,
-                        endpoint_total,
-                        limit,
-                        total_records,
-                        parent_total,
-                        record_count,
-                        page,
-                        offset,
-                        parent_record,
-                        date_total,
-                    )
+                    try:
+                        (
+                            parent_total,
+                            date_total,
+                            offset,
+                            page,
+                            session_id,
+                            endpoint_total,
+                            max_bookmark_value,
+                            total_records,
+                        ) = self.get_and_transform_records(
+                            querystring,
+                            project_timezone,
+                            max_bookmark_value,
+                            state,
+                            config,
+                            catalog,
+                            selected_streams,
+                            last_datetime,
+                            endpoint_total,
+                            limit,
+                            total_records,
+                            parent_total,
+                            record_count,
+                            page,
+                            offset,
+                            parent_record,
+                            date_total,
+                        )
+                    except (Server5xxError, ReadTimeoutError):
+                        # Failed after the retries of the client: the page is requested again,
+                        #   in smaller pages from the same offset
+                        if not self.page_sizer or not self.page_sizer.back_off(limit):
+                            raise
+
+                    # The page size changes at an offset which is a multiple of the new size
+                    if self.page_sizer:
+                        next_limit, page = self.page_sizer.get_next_page(offset, limit)
+                        if next_limit != limit:
+                            limit = next_limit
+                            params["page_size"] = limit
+                            if self.page_prefetcher:
+                                # The pages requested ahead have the previous page size
+                                self.page_prefetcher.cancel()
                 # End stream != 'export'
                 LOGGER.info(
                     "FINISHED: Stream: %s, parent_id: %s", self.tap_stream_id, parent_id
@@ -586,19 +993,28 @@ class MixPanel:
             if self.bookmark_query_field_from:
                 LOGGER.info("Date window from: %s to %s", from_date, to_date)
             LOGGER.info("Total records for date window: %s", date_total)
-            # Increment date window
-            # Start after the day of end_window
-            start_window = end_window + timedelta(days=1)
-            next_end_window = end_window + timedelta(days=days_interval)
-            if next_end_window > now_datetime:
-                end_window = now_datetime
-            else:
-                end_window = next_end_window
+
+            if self.window_sizer:
+                self.window_sizer.observe(
+                    days=(end_window.astimezone(tzone).date() - start_window.astimezone(tzone).date()).days + 1,
+                    requests=self.client.response_count - window_responses,
+                    records=date_total,
+                    response_bytes=self.client.response_bytes - window_bytes,
+                    seconds=time.monotonic() - window_started,
+                )
+                # Kept with the bookmark for the next sync
+                state.setdefault("window_stats", {})[self.tap_stream_id] = self.window_sizer.stats
 
             # Update the state with the max_bookmark_value for the stream
             if bookmark_field:
                 self.write_bookmark(state, self.tap_stream_id, max_bookmark_value)
             # End date window loop
+        if self.page_prefetcher:
+            self.page_prefetcher.close()
+            self.page_prefetcher = None
+        if self.page_sizer:
+            # Kept in the state for the next sync
+            state.setdefault("page_stats", {})[self.tap_stream_id] = self.page_sizer.stats
         # Return endpoint_total across all batches
         return endpoint_total
 
@@ -641,6 +1057,159 @@ class CohortMembers(MixPanel):
     bookmark_query_field_from = None
     bookmark_query_field_to = None
 
+    def sync(
+        self, state, catalog, config, start_date, selected_streams, parent_data=None
+    ):
+        """Sync the members of the cohorts, several cohorts at a time if
+        `cohort_members_concurrency` is set.
+
+        Args:
+            state (dict): State containing bookmarks of the streams if available.
+            catalog (singer.Catalog): Catalog object having schema and metadata of all the streams.
+            config (dict): The tap config file for this tap should include these entries.
+            start_date (str): The default value to use if no bookmark exists for an endpoint
+            selected_streams (list): List of selected streams.
+            parent_data (list, optional): Cohorts of the members. Defaults to None.
+
+        Returns:
+            int: Returns total number of records.
+        """
+        concurrency = int(config.get("cohort_members_concurrency") or 1)
+        if concurrency <= 1 or not parent_data:
+            return super().sync(state, catalog, config, start_date, selected_streams, parent_data)
+
+        self.update_url(config)
+        # The page size is not adapted while the cohorts are paged concurrently
+        page_size, _ = self.get_page_size(state, config)
+        # The session and page of an earlier sequential sync are not reused
+        params = {
+            key: value for key, value in self.params.items()
+            if key not in ("session_id", "page", "page_size")
+        }
+        return self.sync_cohorts_concurrently(
+            iter(parent_data), concurrency, catalog, params, page_size, config.get("project_timezone", "UTC")
+        )
+
+    def sync_cohorts_concurrently(  # pylint: disable=too-many-arguments
+        self, cohorts, concurrency, catalog, params, page_size, project_timezone
+    ):
+        """Fetch the members of up to concurrency cohorts at once on a worker pool.
+
+        The members of a cohort are written as one block, in cohort order, while
+        the next cohorts are fetched. The requests of the workers are paced by the
+        rate limiter of the client, shared with the rest of the sync.
+
+        Args:
+            cohorts (iterator): Cohort records.
+            concurrency (int): Maximum number of cohorts fetched at once.
+            catalog (singer.Catalog): Catalog object having schema and metadata of all the streams.
+            params (dict): Query params of every request.
+            page_size (int): Members per page.
+            project_timezone (str): Time zone in which integer date times are stored.
+
+        Returns:
+            int: Returns total number of records.
+        """
+        endpoint_total = 0
+        pending = deque()
+
+        def submit_next_cohort(executor):
+            cohort = next(cohorts, None)
+            if cohort is not None:
+                pending.append((
+                    cohort.get(self.parent_id_field),
+                    executor.submit(self.fetch_cohort_records, cohort, params, page_size, project_timezone),
+                ))
+
+        LOGGER.info("START Sync for Stream: %s, %s cohorts at a time", self.tap_stream_id, concurrency)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            try:
+                for _ in range(concurrency):
+                    submit_next_cohort(executor)
+
+                while pending:
+                    parent_id, future = pending.popleft()
+                    time_extracted, transformed_data = future.result()
+                    # Keep the pool busy while the finished cohort is written
+                    submit_next_cohort(executor)
+
+                    parent_total = 0
+                    if transformed_data:
+                        _, parent_total = self.process_records(
+                            catalog=catalog,
+                            stream_name=self.tap_stream_id,
+                            records=transformed_data,
+                            time_extracted=time_extracted,
+                        )
+                    endpoint_total = endpoint_total + parent_total
+                    LOGGER.info(
+                        "FINISHED: Stream: %s, parent_id: %s, records: %s",
+                        self.tap_stream_id,
+                        parent_id,
+                        parent_total,
+                    )
+            finally:
+                # On failure, do not start the cohorts which are still queued
+                for _, future in pending:
+                    future.cancel()
+        LOGGER.info("FINISHED Sync for Stream: %s, total records: %s", self.tap_stream_id, endpoint_total)
+        return endpoint_total
+
+    def fetch_cohort_records(self, cohort, params, page_size, project_timezone):
+        """Request all the pages of the members of a cohort and transform them.
+
+        Args:
+            cohort (dict): Cohort record.
+            params (dict): Query params of every request.
+            page_size (int): Members per page.
+            project_timezone (str): Time zone in which integer date times are stored.
+
+        Raises:
+            Exception: Raises if any key-property is missing.
+
+        Returns:
+            tuple: Datetime of the first request and the transformed members.
+        """
+        parent_id = cohort.get(self.parent_id_field)
+        # time_extracted: datetime when the data was extracted from the API
+        time_extracted = utils.now()
+        transformed_data = []
+        page = 0
+        session_id = None
+        total_records = 0
+        while True:
+            page_params = {**params, "page_size": page_size}
+            if page:
+                page_params["session_id"] = session_id
+                page_params["page"] = page
+            data = self.client.request(
+                method="GET",
+                url=self.url,
+                path=self.path,
+                params=self.get_querystring(page_params, parent_id),
+                endpoint=self.tap_stream_id,
+            )
+            # An empty response ends the cohort
+            data = data or {}
+            results = data.get(self.data_key) or []
+            for record in results:
+                transformed_record = transform_record(record, self.tap_stream_id, project_timezone, cohort)
+                transformed_data.append(transformed_record)
+
+                # Check for missing keys
+                for key in self.key_properties:
+                    if not transformed_record.get(key):
+                        LOGGER.error("Error: Missing Key")
+                        raise Exception("Missing Key")
+
+            # The total is only returned with the first page
+            if page == 0:
+                total_records = data.get("total", len(results))
+            session_id = data.get("session_id") if results else None
+            page = page + 1
+            if session_id is None or page * page_size >= total_records:
+                return time_extracted, transformed_data
+
 
 class Cohorts(MixPanel):
     """
@@ -677,6 +1246,188 @@ class Engage(MixPanel):
     bookmark_query_field_to = None
     params = {}
     replication_keys = []
+    # Profile property of the incremental bookmark, see `engage_incremental`
+    bookmark_property = None
+    max_seen = None
+
+    def sync(
+        self, state, catalog, config, start_date, selected_streams, parent_data=None
+    ):
+        """Sync the engage stream, paging ranges of the profiles concurrently
+        if `engage_partitions` is set, and only the profiles seen since the last
+        sync if `engage_incremental` is set.
+
+        Args:
+            state (dict): State containing bookmarks of the streams if available.
+            catalog (singer.Catalog): Catalog object having schema and metadata of all the streams.
+            config (dict): The tap config file for this tap should include these entries.
+            start_date (str): The default value to use if no bookmark exists for an endpoint
+
+        Returns:
+            int: Returns total number of records.
+        """
+        where = None
+        if str(config.get("engage_incremental")).lower() == "true":
+            self.bookmark_property = config.get("engage_bookmark_property") or ENGAGE_BOOKMARK_PROPERTY
+            where = self.get_incremental_where(state, config, utils.now())
+        self.max_seen = None
+
+        total = None
+        partitions = int(config.get("engage_partitions") or 0)
+        if partitions > 1:
+            self.update_url(config)
+            # The session and page of an earlier sequential sync are not reused
+            params = {
+                key: value for key, value in self.params.items()
+                if key not in ("session_id", "page", "page_size", "where")
+            }
+            page_size, _ = self.get_page_size(state, config)
+            scan = PartitionedScan(self.client, self.url, self.path, params, page_size, where)
+            first_pages = scan.get_first_pages(partitions)
+            if first_pages:
+                total = self.sync_pages(
+                    scan.iter_pages(first_pages), catalog, config.get("project_timezone", "UTC")
+                )
+        if total is None:
+            # Instance params, the class params are shared by the engage syncs
+            self.params = {key: value for key, value in self.params.items() if key != "where"}
+            if where:
+                self.params["where"] = urllib.parse.quote(where)
+            total = super().sync(state, catalog, config, start_date, selected_streams, parent_data)
+
+        if self.bookmark_property:
+            self.write_incremental_state(state, full_refresh=where is None)
+        return total
+
+    @staticmethod
+    def get_bookmark_field(bookmark_property):
+        """Get the field of the bookmark property once the profile is transformed, see denest_properties."""
+        if bookmark_property.startswith("$"):
+            return f"mp_reserved_{bookmark_property[1:]}"
+        return bookmark_property
+
+    def get_incremental_where(self, state, config, now):
+        """Get the expression filtering the profiles seen since the bookmark, less the lookback.
+
+        Args:
+            state (dict): State containing bookmarks of the streams if available.
+            config (dict): The tap config.
+            now (datetime): Start of the sync.
+
+        Returns:
+            str: Expression of the profiles to sync, None for a full refresh.
+        """
+        bookmark = self.get_bookmark(state, self.tap_stream_id, None)
+        if not bookmark:
+            LOGGER.info("Stream %s: full refresh, no bookmark", self.tap_stream_id)
+            return None
+
+        full_refresh_days = int(config.get("engage_full_refresh_days") or 0)
+        last_full_refresh = (state.get("full_refresh") or {}).get(self.tap_stream_id)
+        if full_refresh_days and (
+            not last_full_refresh
+            or strptime_to_utc(last_full_refresh) + timedelta(days=full_refresh_days) <= now
+        ):
+            LOGGER.info(
+                "Stream %s: full refresh, last full refresh: %s", self.tap_stream_id, last_full_refresh
+            )
+            return None
+
+        lookback_hours = float(config.get("engage_lookback_hours") or ENGAGE_LOOKBACK_HOURS)
+        since = strptime_to_utc(bookmark) - timedelta(hours=lookback_hours)
+        where = f'properties[{json.dumps(self.bookmark_property)}] >= "{since.strftime("%Y-%m-%dT%H:%M:%S")}"'
+        LOGGER.info("Stream %s: profiles where %s", self.tap_stream_id, where)
+        return where
+
+    def write_incremental_state(self, state, full_refresh):
+        """Move the bookmark to the latest profile written, and write the state.
+
+        Args:
+            state (dict): State containing bookmarks of the streams if available.
+            full_refresh (bool): Whether all the profiles were synced.
+        """
+        if full_refresh:
+            state.setdefault("full_refresh", {})[self.tap_stream_id] = strftime(utils.now())
+        bookmark = self.get_bookmark(state, self.tap_stream_id, None)
+        if self.max_seen:
+            max_seen = strftime(strptime_to_utc(self.max_seen))
+            # The bookmark never moves back
+            if not bookmark or strptime_to_utc(max_seen) > strptime_to_utc(bookmark):
+                bookmark = max_seen
+        if bookmark:
+            self.write_bookmark(state, self.tap_stream_id, bookmark)
+        else:
+            output.write_state(state)
+
+    def process_records(
+        self,
+        catalog,
+        stream_name,
+        records,
+        time_extracted,
+        bookmark_field=None,
+        max_bookmark_value=None,
+        last_datetime=None,
+    ):
+        """Write the profiles, keeping the latest value of the bookmark property.
+
+        Returns:
+            tuple: Returns tuple of max_bookmark_value and record counter.
+        """
+        if self.bookmark_property:
+            field = self.get_bookmark_field(self.bookmark_property)
+            max_seen = max((str(record[field]) for record in records if record.get(field)), default=None)
+            if max_seen and (not self.max_seen or max_seen > self.max_seen):
+                self.max_seen = max_seen
+        return super().process_records(
+            catalog, stream_name, records, time_extracted, bookmark_field, max_bookmark_value, last_datetime
+        )
+
+    def sync_pages(self, pages, catalog, project_timezone):
+        """Transform and write the profiles of engage responses.
+
+        Args:
+            pages (iterable): Engage responses.
+            catalog (singer.Catalog): Catalog object having schema and metadata of all the streams.
+            project_timezone (str): Time zone in which integer date times are stored.
+
+        Raises:
+            Exception: Raises if any key-property is missing.
+
+        Returns:
+            int: Returns total number of records.
+        """
+        endpoint_total = 0
+        for data in pages:
+            # time_extracted: datetime when the data was extracted from the API
+            time_extracted = utils.now()
+            transformed_data = []
+            for record in data.get(self.data_key) or []:
+                transformed_record = transform_record(record, self.tap_stream_id, project_timezone)
+                transformed_data.append(transformed_record)
+
+                # Check for missing keys
+                for key in self.key_properties:
+                    if not transformed_record.get(key):
+                        LOGGER.error("Error: Missing Key")
+                        raise Exception("Missing Key")
+
+            if transformed_data:
+                _, record_count = self.process_records(
+                    catalog=catalog,
+                    stream_name=self.tap_stream_id,
+                    records=transformed_data,
+                    time_extracted=time_extracted,
+                    bookmark_field=None,
+                    max_bookmark_value=None,
+                    last_datetime=None,
+                )
+                endpoint_total = endpoint_total + record_count
+                LOGGER.info(
+                    "Stream %s, batch processed %s records", self.tap_stream_id, record_count
+                )
+        LOGGER.info("FINISHED Sync for Stream: %s, total records: %s", self.tap_stream_id, endpoint_total)
+        return endpoint_total
 
 
 class Export(MixPanel):
@@ -696,7 +1447,382 @@ class Export(MixPanel):
     bookmark_query_field_to = "to_date"
     replication_method = "INCREMENTAL"
     params = {}
+    concurrent_windows = True
+
+    def sync(
+        self, state, catalog, config, start_date, selected_streams, parent_data=None
+    ):
+        """Sync the export stream, transforming the records on a pool of processes
+        if `transform_processes` is set and dropping the events emitted by the earlier
+        syncs if `dedup_index_path` is set.
+
+        Args:
+            state (dict): State containing bookmarks of the streams if available.
+            catalog (singer.Catalog): Catalog object having schema and metadata of all the streams.
+            config (dict): The tap config file for this tap should include these entries.
+            start_date (str): The default value to use if no bookmark exists for an endpoint
+
+        Returns:
+            int: Returns total number of records.
+        """
+        with ExitStack() as stack:
+            dedup_index_path = config.get("dedup_index_path")
+            if dedup_index_path:
+                self.dedup_index = stack.enter_context(DedupIndex(dedup_index_path))
+                # The events before the attribution window of this sync are not exported again,
+                #   one more day covers the project timezone offset
+                attribution_window = int(config.get("attribution_window", "5"))
+                last_datetime = self.get_bookmark(state, self.tap_stream_id, start_date)
+                self.dedup_index.expire(
+                    strftime(strptime_to_utc(last_datetime) - timedelta(days=attribution_window + 1))
+                )
+
+            window_concurrency = int(config.get("export_window_concurrency") or 1)
+            if window_concurrency > 1:
+                ignored_options = [
+                    option for option in SEQUENTIAL_EXPORT_OPTIONS
+                    if str(config.get(option) or "false").lower() not in ("0", "false")
+                ]
+                if ignored_options:
+                    LOGGER.warning(
+                        "Options not used with export_window_concurrency: %s. "
+                        "Each date window is transformed in memory before it is written",
+                        ", ".join(ignored_options),
+                    )
+
+            transform_processes = int(config.get("transform_processes") or 0)
+            if transform_processes and window_concurrency <= 1:
+                self.transform_pool = stack.enter_context(TransformPool(
+                    transform_processes,
+                    self.tap_stream_id,
+                    self.get_record_transformer(catalog, self.tap_stream_id),
+                    config.get("project_timezone", "UTC"),
+                    next(iter(self.replication_keys), None),
+                    dedup=bool(self.dedup_index),
+                ))
+
+            event_shards = int(config.get("export_event_shards") or 0)
+            if event_shards > 1:
+                self.event_shards = self.get_event_shards(config, event_shards)
+
+            try:
+                return super().sync(state, catalog, config, start_date, selected_streams, parent_data)
+            finally:
+                self.transform_pool = None
+                self.dedup_index = None
+                self.event_shards = None
+                self.close_resume_spool()
+
+    def get_event_shards(self, config, shards):
+        """Split the events to export into disjoint sets, downloaded in parallel.
+
+        The events are the `export_events` if set, otherwise the event names of the project
+        seen in the last EVENT_NAMES_DAYS days: the date windows starting before are not sharded.
+
+        Args:
+            config (dict): The tap config.
+            shards (int): Maximum number of shards.
+
+        Returns:
+            EventShards: Downloader of the event shards, None if there are no events to split.
+        """
+        export_events = config.get("export_events")
+        since = None
+        if export_events:
+            names = [name.strip() for name in export_events.split(",")]
+        else:
+            url = MixPanel.url
+            if str(config.get("eu_residency")).lower() == "true":
+                url = "https://eu.mixpanel.com/api/2.0"
+            names = self.client.request(
+                method="GET",
+                url=url,
+                path="events/names",
+                params=f"type=general&limit={EVENT_NAMES_LIMIT}",
+                endpoint="event_names",
+            )
+            if len(names) >= EVENT_NAMES_LIMIT:
+                LOGGER.warning(
+                    "%s event names, the list may be incomplete and the export is not sharded: "
+                    "set export_events to shard the export",
+                    len(names),
+                )
+                return None
+            tzone = pytz.timezone(config.get("project_timezone", "UTC"))
+            since = str((datetime.now(tzone) - timedelta(days=EVENT_NAMES_DAYS)).date())
+            LOGGER.info(
+                "Event names of the last %s days, the date windows from %s are sharded", EVENT_NAMES_DAYS, since
+            )
+
+        event_sets = split_event_names(names, shards)
+        if len(event_sets) < 2:
+            LOGGER.warning("%s event names, the export is not sharded", len(names))
+            return None
+        LOGGER.info(
+            "Export of %s event names split into %s shards", len(names), len(event_sets)
+        )
+        return EventShards(self.client, event_sets, since)
+
+    def get_resume_spool(self, querystring):
+        """Get the spool of a date window, kept across the retries of the date window.
+
+        Args:
+            querystring (str): Params in URL query format to join with stream path
+
+        Returns:
+            ResumeSpool: Spool of the date window.
+        """
+        if self.resume_spool and self.resume_spool.querystring != querystring:
+            self.close_resume_spool()
+        if not self.resume_spool:
+            self.resume_spool = ResumeSpool(querystring)
+        return self.resume_spool
+
+    def close_resume_spool(self):
+        """Close the spool of the last date window, if any."""
+        if self.resume_spool:
+            self.resume_spool.close()
+            self.resume_spool = None
+
+    def request_records(self, querystring):
+        """Request the raw records of a date window, from its event shards if any.
+
+        Args:
+            querystring (str): Params in URL query format to join with stream path
+
+        Returns:
+            iterable: Raw records of the export endpoint.
+        """
+        if self.event_shards:
+            if self.event_shards.covers(querystring):
+                return self.event_shards.request_export(self.url, self.path, querystring)
+            LOGGER.warning(
+                "Export date window %s starts before the event names of the last %s days, "
+                "it is not sharded: set export_events to shard it",
+                querystring,
+                EVENT_NAMES_DAYS,
+            )
+        return self.client.request_export(
+            method="GET",
+            url=self.url,
+            path=self.path,
+            params=querystring,
+            endpoint=self.tap_stream_id,
+        )
+
+    def transform_records(self, records, project_timezone):
+        """Transform the export records and check them for missing key-properties.
 
+        Args:
+            records (iterable): Records of the export endpoint.
+            project_timezone (str): Time zone in which integer date times are stored.
+
+        Raises:
+            Exception: Raises if any key-property is missing.
+
+        Yields:
+            dict: Transformed record.
+        """
+        records = (record for record in records if record and str(record))
+        # The event times are converted a batch of records at a time
+        for batch in self.get_batches(records, EVENT_TIME_BATCH_SIZE):
+            transformed_data = get_event_time_converter(project_timezone).convert_records(
+                [denest_properties(record, "properties") for record in batch]
+            )
+
+            # Check for missing keys
+            for transformed_record in transformed_data:
+                for key in self.key_properties:
+                    val = transformed_record.get(key)
+                    if not val:
+                        LOGGER.error("Error: Missing Key")
+                        raise Exception("Missing Key")
+
+            yield from transformed_data
+
+    @staticmethod
+    def get_batches(records, limit):
+        """Group the records into lists of at most limit records.
+
+        Args:
+            records (iterable): Transformed records.
+            limit (int): Batch size.
+
+        Yields:
+            list: Batch of records.
+        """
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) == limit:
+                yield batch
+                batch = []
+        # Remaining, partial batch
+        if batch:
+            yield batch
+
+    def get_pipeline_batches(self, querystring, project_timezone):
+        """Download and transform the records on a staged pipeline, see `export_pipeline_workers`.
+
+        The body is read on a reader thread and transformed by the pipeline workers
+        while the caller writes the earlier batches. With `transform_processes`, the
+        pipeline workers hand the blocks to the transform processes, which also
+        serialize the records, see process_serialized_records.
+
+        Args:
+            querystring (str): Params in URL query format to join with stream path
+            project_timezone (str): Time zone in which integer date times are stored.
+
+        Returns:
+            Pipeline: Iterable of the lists of transformed records, in download order.
+        """
+        chunks = self.client.request_export_chunks(
+            method="GET",
+            url=self.url,
+            path=self.path,
+            params=querystring,
+            endpoint=self.tap_stream_id,
+        )
+
+        if self.transform_pool:
+            return Pipeline(
+                chunks,
+                self.transform_pool.transform_block,
+                workers=self.transform_pool.processes,
+                name=self.tap_stream_id,
+            )
+
+        def transform_block(block):
+            return list(self.transform_records(iter_jsonl([block]), project_timezone))
+
+        return Pipeline(
+            chunks, transform_block, workers=self.pipeline_workers, name=self.tap_stream_id
+        )
+
+    @backoff.on_exception(
+        backoff.expo,
+        (requests.exceptions.ChunkedEncodingError,),
+        max_tries=5,
+        factor=2,
+    )
+    def fetch_window_records(self, querystring, project_timezone):
+        """Download and transform all the records of a single date window.
+
+        Args:
+            querystring (str): Params in URL query format to join with stream path
+            project_timezone (str): Time zone in which integer date times are stored.
+
+        Returns:
+            tuple: Returns tuple of time_extracted and the list of transformed records.
+        """
+        data = self.request_records(querystring)
+        # time_extracted: datetime when the data was extracted from the API
+        time_extracted = utils.now()
+        return time_extracted, list(self.transform_records(data, project_timezone))
+
+    def sync_windows_concurrently(
+        self,
+        date_windows,
+        window_concurrency,
+        state,
+        catalog,
+        project_timezone,
+        tzone,
+        export_events,
+        last_datetime,
+        max_bookmark_value,
+    ):
+        """Fetch up to window_concurrency date windows at once on a worker pool.
+
+        Records are written per date window in window order and the bookmark is
+        written only after all the earlier windows are written, so the state never
+        moves past a window which is not completely written.
+
+        Args:
+            date_windows (iterable): Tuples of start_window and end_window to sync.
+            window_concurrency (int): Maximum number of date windows fetched at once.
+            state (dict): State containing bookmarks of the streams if available.
+            catalog (singer.Catalog): Catalog object having schema and metadata of all the streams.
+            project_timezone (str): Time zone in which integer date times are stored.
+            tzone (pytz.timezone): Project timezone used to normalize the request dates.
+            export_events (str): Comma separated events to export.
+            last_datetime (str): Last datetime from which greater replication value records will be written.
+            max_bookmark_value (str): Maximum bookmark value among written records.
+
+        Returns:
+            int: Returns total number of records.
+        """
+        bookmark_field = next(iter(self.replication_keys), None)
+        endpoint_total = 0
+        pending = deque()
+
+        def submit_next_window(executor):
+            window = next(date_windows, None)
+            if window is None:
+                return
+            start_window, end_window = window
+            # Request dates need to be normalized to project timezone
+            from_date = str(start_window.astimezone(tzone).date())
+            to_date = str(end_window.astimezone(tzone).date())
+            params = {
+                **self.params,
+                self.bookmark_query_field_from: from_date,
+                self.bookmark_query_field_to: to_date,
+            }
+            querystring = self.get_querystring(params, "none", export_events)
+            LOGGER.info(
+                "URL for Stream %s: %s/%s?%s",
+                self.tap_stream_id,
+                self.url,
+                self.path,
+                querystring,
+            )
+            future = executor.submit(
+                self.fetch_window_records, querystring, project_timezone
+            )
+            pending.append((from_date, to_date, future))
+
+        LOGGER.info(
+            "START Sync for Stream: %s, %s date windows at a time",
+            self.tap_stream_id,
+            window_concurrency,
+        )
+        with ThreadPoolExecutor(max_workers=window_concurrency) as executor:
+            try:
+                for _ in range(window_concurrency):
+                    submit_next_window(executor)
+
+                while pending:
+                    from_date, to_date, future = pending.popleft()
+                    time_extracted, transformed_data = future.result()
+                    # Keep the pool busy while the finished window is written
+                    submit_next_window(executor)
+
+                    date_total = 0
+                    if transformed_data:
+                        max_bookmark_value, date_total = self.process_records(
+                            catalog=catalog,
+                            stream_name=self.tap_stream_id,
+                            records=transformed_data,
+                            time_extracted=time_extracted,
+                            bookmark_field=bookmark_field,
+                            max_bookmark_value=max_bookmark_value,
+                            last_datetime=last_datetime,
+                        )
+                    endpoint_total = endpoint_total + date_total
+
+                    LOGGER.info("FINISHED Sync for Stream: %s", self.tap_stream_id)
+                    LOGGER.info("Date window from: %s to %s", from_date, to_date)
+                    LOGGER.info("Total records for date window: %s", date_total)
+
+                    # Update the state with the max_bookmark_value for the stream
+                    self.write_bookmark(state, self.tap_stream_id, max_bookmark_value)
+            finally:
+                # On failure, do not start the windows which are still queued
+                for _, _, future in pending:
+                    future.cancel()
+
+        return endpoint_total
 
     @backoff.on_exception(
         backoff.expo,
@@ -751,39 +1877,61 @@ class Export(MixPanel):
             tuple: Returns tuple of parent_total, date_total, offset, page, session_id,
                    endpoint_total, max_bookmark_value, total_records
         """
-        data = self.client.request_export(
-            method="GET",
-            url=self.url,
-            path=self.path,
-            params=querystring,
-            endpoint=self.tap_stream_id,
-        )
-
         # time_extracted: datetime when the data was extracted from the API
         time_extracted = utils.now()
-        transformed_data = []
-        for record in data:
-            if record and str(record):
-                # Transform record and append to transformed_data array
-                transformed_record = transform_record(
-                    record, self.tap_stream_id, project_timezone
-                )
-                transformed_data.append(transformed_record)
-
-                # Check for missing keys
-                for key in self.key_properties:
-                    val = transformed_record.get(key)
-                    if not val:
-                        LOGGER.error("Error: Missing Key")
-                        raise Exception("Missing Key")
-
-                if len(transformed_data) == limit:
-                    # Process full batch (limit = 250) records
+        # Bookmark written before the date window, restored if the days are out of order
+        window_bookmark_value = max_bookmark_value
+        process_records = self.process_records
+        resume_spool = None
+        # Event shards are merged as records, before they are transformed
+        if self.transform_pool and not self.event_shards:
+            batches = self.get_pipeline_batches(querystring, project_timezone)
+            process_records = self.process_serialized_records
+        elif self.pipeline_workers and not self.event_shards:
+            batches = self.get_pipeline_batches(querystring, project_timezone)
+        elif self.resume_retries and not self.event_shards:
+            resume_spool = self.get_resume_spool(querystring)
+            if resume_spool.attempts:
+                # Retry: the records of the lines written by the earlier attempts are skipped
+                max_bookmark_value = resume_spool.max_bookmark_value or max_bookmark_value
+                total_records = total_records + resume_spool.records
+                parent_total = parent_total + resume_spool.records
+                date_total = date_total + resume_spool.records
+                endpoint_total = endpoint_total + resume_spool.records
+            chunks = self.client.request_export_chunks(
+                method="GET",
+                url=self.url,
+                path=self.path,
+                params=querystring,
+                endpoint=self.tap_stream_id,
+            )
+            data = iter_jsonl(resume_spool.iter_chunks(chunks))
+            batches = self.get_batches(self.transform_records(data, project_timezone), limit)
+        else:
+            data = self.request_records(querystring)
+            batches = self.get_batches(self.transform_records(data, project_timezone), limit)
+
+        checkpoints = None
+        if self.day_checkpoints:
+            # Serialized records are tuples starting with the event time
+            serialized = process_records == self.process_serialized_records
+            checkpoints = DayCheckpoints(project_timezone, itemgetter(0) if serialized else itemgetter("time"))
+        checkpointed = False
+
+        for transformed_data in batches:
+            batch_total = date_total
+            parts = [(transformed_data, DAY_CONTINUES)]
+            if checkpoints:
+                parts = checkpoints.split(transformed_data)
+
+            for records, status in parts:
+                if records:
+                    # Process the batch of records (limit = 250, or a pipeline block)
                     #   and get the max_bookmark_value and record_count
-                    max_bookmark_value, record_count = self.process_records(
+                    max_bookmark_value, record_count = process_records(
                         catalog=catalog,
                         stream_name=self.tap_stream_id,
-                        records=transformed_data,
+                        records=records,
                         time_extracted=time_extracted,
                         bookmark_field=next(iter(self.replication_keys), None),
                         max_bookmark_value=max_bookmark_value,
@@ -799,33 +1947,23 @@ class Export(MixPanel):
                     parent_total = parent_total + record_count
                     date_total = date_total + record_count
                     endpoint_total = endpoint_total + record_count
-                    transformed_data = []
-                    # End if (batch = limit 250)
-                # End if record
-            # End has export_data records loop
 
-        # Process remaining, partial batch
-        if len(transformed_data) > 0:
-            max_bookmark_value, record_count = self.process_records(
-                catalog=catalog,
-                stream_name=self.tap_stream_id,
-                records=transformed_data,
-                time_extracted=time_extracted,
-                bookmark_field=next(iter(self.replication_keys), None),
-                max_bookmark_value=max_bookmark_value,
-                last_datetime=last_datetime,
-            )
-            LOGGER.info(
-                "Stream %s, batch processed %s records",
-                self.tap_stream_id,
-                record_count,
-            )
+                if status == DAY_FINISHED:
+                    # The earlier days of the date window are completely written
+                    LOGGER.info("Stream %s, checkpoint after day %s", self.tap_stream_id, checkpoints.day)
+                    self.write_bookmark(state, self.tap_stream_id, max_bookmark_value)
+                    checkpointed = True
+                elif status == OUT_OF_ORDER and checkpointed:
+                    # The days before the checkpoints may not be complete
+                    self.write_bookmark(state, self.tap_stream_id, window_bookmark_value)
+
+            if resume_spool:
+                # The lines of the batch are not processed again by a retry
+                resume_spool.commit(date_total - batch_total, max_bookmark_value)
+            # End has export_data records loop
 
-            total_records = total_records + record_count
-            parent_total = parent_total + record_count
-            date_total = date_total + record_count
-            endpoint_total = endpoint_total + record_count
-            # End if transformed_data
+        if resume_spool:
+            self.close_resume_spool()
 
         # Export does not provide pagination; session_id = None breaks out of loop.
         session_id = None
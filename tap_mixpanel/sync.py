@@ -1,5 +1,6 @@
 import singer
 
+from tap_mixpanel import output
 from tap_mixpanel.streams import STREAMS
 
 LOGGER = singer.get_logger()
@@ -60,7 +61,7 @@ def update_currently_syncing(state, stream_name):
         del state["currently_syncing"]
     else:
         singer.set_currently_syncing(state, stream_name)
-    singer.write_state(state)
+    output.write_state(state)
 
 
 def sync(client, config, catalog, state, start_date):
@@ -80,27 +81,33 @@ def sync(client, config, catalog, state, start_date):
     if not selected_streams:
         return
 
-    # Loop through selected_streams
-    for stream_name in streams_to_sync:
-        stream_obj = STREAMS[stream_name](client)
-
-        update_currently_syncing(state, stream_name)
-
-        # Write schema of only selected streams in parent-child stream
-        write_schemas_recursive(stream_name, catalog, selected_streams)
-
-        LOGGER.info("START Syncing: %s", stream_name)
-        endpoint_total = stream_obj.sync(
-            catalog=catalog,
-            state=state,
-            config=config,
-            start_date=start_date,
-            selected_streams=selected_streams,
-        )
-
-        update_currently_syncing(state, None)
-        LOGGER.info(
-            "FINISHED Syncing: %s, Total endpoint records: %s",
-            stream_name,
-            endpoint_total,
-        )
+    # RECORD messages are buffered, see output.py
+    output.configure(config)
+    try:
+        # Loop through selected_streams
+        for stream_name in streams_to_sync:
+            stream_obj = STREAMS[stream_name](client)
+
+            update_currently_syncing(state, stream_name)
+
+            # Write schema of only selected streams in parent-child stream
+            write_schemas_recursive(stream_name, catalog, selected_streams)
+
+            LOGGER.info("START Syncing: %s", stream_name)
+            endpoint_total = stream_obj.sync(
+                catalog=catalog,
+                state=state,
+                config=config,
+                start_date=start_date,
+                selected_streams=selected_streams,
+            )
+
+            update_currently_syncing(state, None)
+            LOGGER.info(
+                "FINISHED Syncing: %s, Total endpoint records: %s",
+                stream_name,
+                endpoint_total,
+            )
+    finally:
+        # Write the records buffered when the sync ends or fails
+        output.flush()
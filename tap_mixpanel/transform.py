@@ -1,4 +1,6 @@
 import datetime
+import functools
+import re
 
 import pytz
 import singer
@@ -33,6 +35,122 @@ def denest_properties(record, properties_node):
     return new_record
 
 
+# Date-time strings formatted by singer.utils.strftime
+NORMALIZED_DATETIME = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{6}Z")
+
+# Beginning of epoch time, the integer event times are seconds since then
+EPOCH = pytz.utc.localize(datetime.datetime(1970, 1, 1))
+SECONDS_PER_DAY = 86400
+# Maximum number of days whose formatted date is cached by an EventTimeConverter
+MAX_CACHED_DAYS = 4096
+
+
+class EventTimeConverter:
+    """Converter of the integer event times of a project to UTC date-time strings.
+
+    The event time is a number of seconds since 1970-01-01T00:00:00Z. Moving the
+    epoch to the project timezone, adding the seconds, normalizing for daylight
+    savings time and moving back to UTC always gives the same instant, so the
+    converted time does not depend on the DST offsets of the project timezone.
+    The formatted date of each day is cached and only the time of day is
+    formatted for each event.
+
+    Args:
+        project_timezone (str): Time zone in which integer date times are stored.
+    """
+
+    def __init__(self, project_timezone):
+        # Raises UnknownTimeZoneError for an invalid project timezone
+        self.timezone = pytz.timezone(project_timezone)
+        self.__days = {}
+
+    def get_day_prefix(self, day):
+        """Get the formatted date, up to the `T`, of the day since the epoch.
+
+        Args:
+            day (int): Number of days since 1970-01-01.
+
+        Returns:
+            str: Formatted date of the day.
+        """
+        prefix = self.__days.get(day)
+        if prefix is None:
+            if len(self.__days) >= MAX_CACHED_DAYS:
+                self.__days.clear()
+            prefix = strftime(EPOCH + datetime.timedelta(days=day))[:-16]
+            self.__days[day] = prefix
+        return prefix
+
+    def convert(self, time_value):
+        """Convert an integer event time to a UTC date-time string.
+
+        Args:
+            time_value (int|float|str): Seconds since the epoch, truncated to an integer.
+
+        Returns:
+            str: UTC date-time string.
+        """
+        day, seconds = divmod(int(time_value), SECONDS_PER_DAY)
+        hours, seconds = divmod(seconds, 3600)
+        minutes, seconds = divmod(seconds, 60)
+        return f"{self.get_day_prefix(day)}{hours:02d}:{minutes:02d}:{seconds:02d}.000000Z"
+
+    def convert_records(self, records):
+        """Convert the `time` of each record in place.
+
+        Args:
+            records (list): Records with an integer `time`.
+
+        Returns:
+            list: The same records.
+        """
+        convert = self.convert
+        for record in records:
+            record["time"] = convert(record.get("time"))
+        return records
+
+
+@functools.lru_cache(maxsize=None)
+def get_event_time_converter(project_timezone):
+    """Get the event time converter of the project timezone, built once per timezone.
+
+    Args:
+        project_timezone (str): Time zone in which integer date times are stored.
+
+    Returns:
+        EventTimeConverter: Converter of the event times.
+    """
+    return EventTimeConverter(project_timezone)
+
+
+@functools.lru_cache(maxsize=65536)
+def get_minute_project_day(minute, project_timezone):
+    """Get the date in the project timezone of a UTC minute, cached as many events share it.
+
+    Args:
+        minute (str): UTC date-time up to the minute, e.g. `2022-09-01T23:59`.
+        project_timezone (str): Time zone of the project.
+
+    Returns:
+        datetime.date: Date of the minute in the project timezone.
+    """
+    utc_minute = pytz.utc.localize(datetime.datetime.strptime(minute, "%Y-%m-%dT%H:%M"))
+    return utc_minute.astimezone(pytz.timezone(project_timezone)).date()
+
+
+def get_project_day(event_time, project_timezone):
+    """Get the date in the project timezone of a normalized event time.
+
+    Args:
+        event_time (str): Normalized UTC date-time string of the event.
+        project_timezone (str): Time zone of the project.
+
+    Returns:
+        datetime.date: Date of the event in the project timezone, the export days.
+    """
+    return get_minute_project_day(event_time[:16], project_timezone)
+
+
 # Reference: https://help.mixpanel.com/hc/en-us/articles/115004547203-Manage-Timezones-for-Projects-in-Mixpanel#exporting-data-from-mixpanel
 def transform_event_times(record, project_timezone):
     """Time conversion from $time integer using project_timezone.
@@ -45,28 +163,9 @@ def transform_event_times(record, project_timezone):
         dict: Updated record.
     """
     new_record = record
-    timezone = pytz.timezone(project_timezone)
-
-    # Create beginning_datetime: beginning of epoch time in project timezone
-    naive_time = datetime.time(0, 0)
-    date = datetime.date(1970, 1, 1)
-    naive_datetime = datetime.datetime.combine(date, naive_time)
-    # Move 1970-01-01T00:00:00Z to Mixpanel project timezone.
-    # For example, if Mixpanel timezone is in Eastern Time (UTC-5:00) then it calculates 1969-12-31T19:00:00-5:00.
-    beginning_datetime = pytz.utc.localize(naive_datetime).astimezone(timezone)
-
-    # Get integer time
-    time_int = int(record.get("time"))
-
-    # Create new_time_utc by adding seconds to beginning_datetime, normalizing,
-    #   and converting to string
-    add_seconds = datetime.timedelta(seconds=time_int)
-    new_time = beginning_datetime + add_seconds
-
-    # 'normalize' accounts for daylight savings time
-    new_time_utc_str = strftime(timezone.normalize(new_time).astimezone(pytz.utc))
-    new_record["time"] = new_time_utc_str
-
+    new_record["time"] = get_event_time_converter(project_timezone).convert(
+        record.get("time")
+    )
     return new_record
 
 
@@ -84,6 +183,48 @@ def transform_datetime(this_dttm):
     return new_dttm
 
 
+def is_normalized_datetime(this_dttm):
+    """Check if a value is a valid date-time string formatted by singer.utils.strftime.
+
+    Such a string is returned as it is by transform_datetime and compares in
+    chronological order with the other normalized strings.
+
+    Args:
+        this_dttm (object): Value to check.
+
+    Returns:
+        bool: True if the value is a normalized date-time string.
+    """
+    if not isinstance(this_dttm, str) or not NORMALIZED_DATETIME.fullmatch(this_dttm):
+        return False
+    try:
+        datetime.datetime(
+            int(this_dttm[0:4]),
+            int(this_dttm[5:7]),
+            int(this_dttm[8:10]),
+            int(this_dttm[11:13]),
+            int(this_dttm[14:16]),
+            int(this_dttm[17:19]),
+        )
+    except ValueError:
+        return False
+    return True
+
+
+def normalize_datetime(this_dttm):
+    """Normalize a date-time string, as transform_datetime, without parsing it when possible.
+
+    Args:
+        this_dttm (str): Formatted date-time string
+
+    Returns:
+        str: Normalized date-time string.
+    """
+    if is_normalized_datetime(this_dttm):
+        return this_dttm
+    return transform_datetime(this_dttm)
+
+
 def transform_engage(record):
     """Remove leading $ from engage $distinct_id.
 
@@ -108,10 +249,9 @@ def transform_funnels(record, parent_record):
         parent_record (dict): Parent record.
 
     Returns:
-        dict: Updated record.
+        dict: New record, the record and the parent record are not updated.
     """
-    record.update(parent_record)
-    return record
+    return {**record, **parent_record}
 
 
 def transform_cohort_members(record, parent_record):
@@ -0,0 +1,137 @@
+"""Process pool transforming the export records, see `transform_processes`.
+
+Decoding, transforming and serializing the export records is CPU-bound and
+holds the GIL, so the tap uses a single core however many threads it runs.
+TransformPool fans the blocks of raw export lines cut by the pipeline reader
+out to worker processes, which decode, denest, convert the event times, coerce
+the records to the schema and serialize them. The parent only compares the
+bookmarks and writes the serialized records, in the original order.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import simplejson
+import singer
+
+from tap_mixpanel.decoder import iter_jsonl
+from tap_mixpanel.dedup import get_dedup_entry
+from tap_mixpanel.record_transformer import RecordTransformer
+from tap_mixpanel.transform import normalize_datetime
+
+LOGGER = singer.get_logger()
+
+# Transform state of the worker process, set by init_worker
+WORKER = {}
+
+
+def init_worker(stream_name, schema, stream_metadata, project_timezone, bookmark_field, dedup=False):
+    """Initialize a worker process, compiling the record transformer once per process.
+
+    Args:
+        stream_name (str): Name of the stream.
+        schema (dict): JSON schema of the stream.
+        stream_metadata (dict): Metadata map of the stream.
+        project_timezone (str): Time zone in which integer date times are stored.
+        bookmark_field (str): Replication key of the stream.
+        dedup (bool, optional): Whether to get the dedup entries of the records.
+    """
+    # Imported here, the streams module creates the pools
+    from tap_mixpanel.streams import STREAMS  # pylint: disable=import-outside-toplevel
+
+    WORKER["stream"] = STREAMS[stream_name](None)
+    WORKER["record_transformer"] = RecordTransformer(schema, stream_metadata)
+    WORKER["project_timezone"] = project_timezone
+    WORKER["bookmark_field"] = bookmark_field
+    WORKER["dedup"] = dedup
+
+
+def transform_block(block):
+    """Decode, transform and serialize a block of raw export lines in a worker process.
+
+    Args:
+        block (bytes): Complete jsonl lines.
+
+    Raises:
+        Exception: Raises if any key-property is missing or a record does not match the schema.
+
+    Returns:
+        list: Tuples of the bookmark value, the normalized bookmark value (None if the
+              record has no bookmark field), the serialized record and the dedup entry
+              (None without dedup index).
+    """
+    stream = WORKER["stream"]
+    record_transformer = WORKER["record_transformer"]
+    bookmark_field = WORKER["bookmark_field"]
+    dedup = WORKER["dedup"]
+
+    results = []
+    records = stream.transform_records(iter_jsonl([block]), WORKER["project_timezone"])
+    for record in records:
+        # The event key is taken before the deselected fields are removed
+        dedup_entry = get_dedup_entry(record) if dedup else None
+        try:
+            transformed_record = record_transformer.transform(record)
+        except Exception as err:
+            LOGGER.error("Error: %s", str(err))
+            # singer's SchemaMismatch can not be sent back to the parent process
+            raise Exception(str(err)) from None
+
+        bookmark_value = transformed_record.get(bookmark_field) if bookmark_field else None
+        bookmark_dttm = None
+        if bookmark_field and bookmark_field in transformed_record:
+            bookmark_dttm = normalize_datetime(bookmark_value)
+        results.append((
+            bookmark_value,
+            bookmark_dttm,
+            simplejson.dumps(transformed_record, use_decimal=True),
+            dedup_entry,
+        ))
+    return results
+
+
+class TransformPool:
+    """Pool of worker processes transforming the blocks of a stream.
+
+    Args:
+        processes (int): Number of worker processes.
+        stream_name (str): Name of the stream.
+        record_transformer (RecordTransformer): Record transformer of the stream.
+        project_timezone (str): Time zone in which integer date times are stored.
+        bookmark_field (str): Replication key of the stream.
+        dedup (bool, optional): Whether to get the dedup entries of the records.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self, processes, stream_name, record_transformer, project_timezone, bookmark_field, dedup=False
+    ):
+        self.processes = processes
+        # Spawned, the tap threads and their locks are not copied to the workers
+        self.executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(
+                stream_name,
+                record_transformer.schema,
+                record_transformer.stream_metadata,
+                project_timezone,
+                bookmark_field,
+                dedup,
+            ),
+        )
+        LOGGER.info("Started %s transform processes for stream %s", processes, stream_name)
+
+    def transform_block(self, block):
+        """Transform a block on a worker process, see transform_block."""
+        return self.executor.submit(transform_block, block).result()
+
+    def close(self):
+        """Stop the worker processes."""
+        self.executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,108 @@
+"""Date window sizes adapted to the observed volume, see `date_window_byte_budget`.
+
+A single `date_window_size` either makes the requests of busy projects huge,
+until they time out, or spends many requests on quiet ones. WindowSizer keeps
+a moving average of the bytes, seconds and records per requested day, and
+sizes the next date window so its requests stay within the configured byte
+and time budgets. The averages are kept in the state, under `window_stats`, so
+the next sync starts with the right size.
+"""
+
+import math
+
+import singer
+
+LOGGER = singer.get_logger()
+
+# Weight of the latest date window in the moving averages
+SMOOTHING = 0.5
+# Maximum growth of the date window size from a date window to the next
+MAX_GROWTH = 4
+DEFAULT_MIN_DAYS = 1
+DEFAULT_MAX_DAYS = 365
+
+
+class WindowSizer:
+    """Size of the date windows of a stream, adapted to the observed volume.
+
+    Args:
+        days_interval (int): Date window size, used until the volume is known.
+        byte_budget (int, optional): Decompressed bytes targeted per request.
+        seconds_budget (float, optional): Seconds targeted per request.
+        min_days (int, optional): Minimum date window size.
+        max_days (int, optional): Maximum date window size.
+        stats (dict, optional): Averages per requested day, from the state.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        days_interval,
+        byte_budget=None,
+        seconds_budget=None,
+        min_days=DEFAULT_MIN_DAYS,
+        max_days=DEFAULT_MAX_DAYS,
+        stats=None,
+    ):
+        self.byte_budget = byte_budget
+        self.seconds_budget = seconds_budget
+        self.min_days = min_days
+        self.max_days = max(max_days, min_days)
+        self.stats = dict(stats or {})
+        self.days_interval = self.clamp(days_interval)
+        if self.stats:
+            self.days_interval = self.get_days_interval()
+
+    def clamp(self, days):
+        """Keep a date window size within the bounds."""
+        return min(max(int(days), self.min_days), self.max_days)
+
+    def get_days_interval(self):
+        """Get the largest date window size whose requests fit the budgets.
+
+        Returns:
+            int: Date window size in days.
+        """
+        limits = []
+        if self.byte_budget and self.stats.get("bytes_per_day"):
+            limits.append(self.byte_budget / self.stats["bytes_per_day"])
+        if self.seconds_budget and self.stats.get("seconds_per_day"):
+            limits.append(self.seconds_budget / self.stats["seconds_per_day"])
+        if not limits:
+            # Nothing measured yet, e.g. only empty days
+            return self.clamp(self.days_interval * MAX_GROWTH)
+        return self.clamp(math.floor(min(limits)))
+
+    def observe(self, days, requests, records, response_bytes, seconds):
+        """Update the averages from a synced date window and size the next one.
+
+        Args:
+            days (int): Number of days requested by the date window.
+            requests (int): Number of requests of the date window, e.g. one per funnel.
+            records (int): Records of the date window.
+            response_bytes (int): Decompressed bytes of the responses.
+            seconds (float): Duration of the date window sync.
+        """
+        if days <= 0 or requests <= 0:
+            return
+        observed = {
+            "bytes_per_day": response_bytes / requests / days,
+            "seconds_per_day": seconds / requests / days,
+            "records_per_day": records / requests / days,
+        }
+        for key, value in observed.items():
+            previous = self.stats.get(key)
+            if previous is None:
+                self.stats[key] = value
+            else:
+                self.stats[key] = SMOOTHING * value + (1 - SMOOTHING) * previous
+
+        previous_days = self.days_interval
+        self.days_interval = min(self.get_days_interval(), previous_days * MAX_GROWTH)
+        if self.days_interval != previous_days:
+            LOGGER.info(
+                "Date window size changed from %s to %s days (%.0f bytes, %.2f seconds per requested day)",
+                previous_days,
+                self.days_interval,
+                self.stats["bytes_per_day"],
+                self.stats["seconds_per_day"],
+            )
@@ -0,0 +1,119 @@
+"""Micro-benchmark of the export jsonl decoding, jsonlines.Reader vs. iter_jsonl.
+
+Usage:
+    python -m tests.benchmarks.bench_export_decoder --size-mb 4096
+
+A synthetic export body of --size-mb megabytes is generated on the fly and fed
+through a requests.Response, so the multi-GB runs do not need the body in memory.
+"""
+
+import argparse
+import json
+import random
+import time
+
+import jsonlines
+import requests
+
+from tap_mixpanel.decoder import EXPORT_CHUNK_SIZE, JSON_BACKEND, iter_jsonl
+
+EVENTS = ["Page View", "Sign Up", "Purchase", "Add To Cart", "Search"]
+
+
+def generate_block(seed=0, lines=10000):
+    """Generate a block of synthetic export lines."""
+    rand = random.Random(seed)
+    block = []
+    for i in range(lines):
+        properties = {
+            "time": 1583044147 + i,
+            "distinct_id": f"user_{rand.randint(1, 10 ** 6)}",
+            "$insert_id": f"{rand.getrandbits(64):016x}",
+            "$browser": rand.choice(["Chrome", "Firefox", "Safari"]),
+            "$city": rand.choice(["San Francisco", "Paris", "Tokyo", "São Paulo"]),
+            "$current_url": f"https://example.com/page/{rand.randint(1, 500)}",
+            "mp_lib": "web",
+            "price": round(rand.uniform(0, 500), 2),
+            "quantity": rand.randint(1, 10),
+            "is_member": rand.random() > 0.5,
+        }
+        for j in range(rand.randint(5, 25)):
+            properties[f"custom_property_{j}"] = f"value_{rand.randint(1, 1000)}"
+        block.append(json.dumps({"event": rand.choice(EVENTS), "properties": properties}))
+    return ("\n".join(block) + "\n").encode("utf-8")
+
+
+class SyntheticRaw:
+    """File-like raw body repeating a block of export lines up to size bytes."""
+
+    def __init__(self, block, size):
+        self.block = block
+        self.remaining = size
+        self.offset = 0
+
+    def read(self, amount):
+        """Read up to amount bytes of the body."""
+        chunks = []
+        amount = min(amount, self.remaining)
+        self.remaining -= amount
+        while amount > 0:
+            chunk = self.block[self.offset:self.offset + amount]
+            self.offset = (self.offset + len(chunk)) % len(self.block)
+            amount -= len(chunk)
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+
+def make_response(block, size):
+    """Make a streamed requests.Response with a synthetic body."""
+    response = requests.Response()
+    response.status_code = 200
+    response.raw = SyntheticRaw(block, size)
+    return response
+
+
+def decode_jsonlines(response):
+    """Decoding of request_export before iter_jsonl."""
+    reader = jsonlines.Reader(response.iter_lines())
+    return reader.iter(allow_none=True, skip_empty=True)
+
+
+def decode_iter_jsonl(response):
+    """Decoding of request_export with iter_jsonl."""
+    return iter_jsonl(response.iter_content(chunk_size=EXPORT_CHUNK_SIZE))
+
+
+def run(name, decode, block, size):
+    """Decode the synthetic body and report the lines/sec."""
+    response = make_response(block, size)
+    start = time.perf_counter()
+    lines = 0
+    for _ in decode(response):
+        lines += 1
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:>12}: {lines} lines in {elapsed:.2f}s, "
+        f"{lines / elapsed:,.0f} lines/sec, {size / elapsed / 2 ** 20:,.1f} MB/sec"
+    )
+    return lines / elapsed
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=512, help="Size of the synthetic export body")
+    args = parser.parse_args()
+
+    block = generate_block()
+    size = args.size_mb * 2 ** 20
+    # Stop on a line boundary
+    size -= size % len(block)
+
+    print(f"Synthetic export body: {size / 2 ** 20:,.0f} MB, JSON backend: {JSON_BACKEND}")
+    before = run("jsonlines", decode_jsonlines, block, size)
+    after = run("iter_jsonl", decode_iter_jsonl, block, size)
+    print(f"Speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import unittest
+
+from tap_mixpanel.bench import DECODE, TRANSFORM, OutputCounter, StageProfiler, compare_results
+
+
+class TestBench(unittest.TestCase):
+    """Test the measures and the baseline comparison of the benchmark."""
+
+    def test_output_counter(self):
+        """Test the Singer records and bytes written are counted."""
+        output = OutputCounter()
+        output.write('{"type": "RECORD", "stream": "engage", "record": {"name": "é"}}\n')
+        output.write('{"type": "STATE", "value": {}}\n')
+        self.assertEqual(output.records, 1)
+        self.assertEqual(output.bytes, 96)
+
+    def test_nested_calls_accounted_once(self):
+        """Test a profiled call made by another profiled call is accounted to the outer stage."""
+        profiler = StageProfiler()
+        inner = profiler.wrap(DECODE, lambda: sum(range(100000)))
+        outer = profiler.wrap(TRANSFORM, inner)
+        outer()
+        self.assertEqual(profiler.cpu_seconds[DECODE], 0)
+        self.assertGreater(profiler.cpu_seconds[TRANSFORM], 0)
+
+    def test_compare_results(self):
+        """Test only the streams slower than the baseline by more than the maximum are regressions."""
+        baseline = {"streams": {"export": {"records_per_sec": 1000}, "engage": {"records_per_sec": 100}}}
+        results = {"streams": {
+            "export": {"records_per_sec": 850},
+            "engage": {"records_per_sec": 95},
+            "funnels": {"records_per_sec": 10},
+        }}
+        self.assertEqual(compare_results(results, baseline, 0.1), ["export"])
@@ -0,0 +1,92 @@
+import gzip
+import io
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+from parameterized import parameterized
+from requests.structures import CaseInsensitiveDict
+from urllib3 import HTTPResponse
+from tap_mixpanel import client
+from tap_mixpanel.cassette import RECORD, REPLAY, Cassette, CassetteError
+
+EXPORT_BODY = (
+    b'{"event": "Page View", "properties": {"time": 1583044147, "distinct_id": "test_id_1"}}\n'
+    b'{"event": "Page View", "properties": {"time": 1583225657, "distinct_id": "test_id_2"}}\n'
+)
+ENGAGE_BODY = b'{"results": [{"$distinct_id": "test_id_1"}], "session_id": "1234", "total": 1}'
+
+
+def get_response(body, headers):
+    """Return a streamed requests.Response with the raw body."""
+    response = requests.Response()
+    response.status_code = 200
+    response.headers = CaseInsensitiveDict(headers)
+    response.raw = HTTPResponse(
+        body=io.BytesIO(body), headers=headers, preload_content=False, decode_content=False
+    )
+    return response
+
+
+def mock_request(method, url, params=None, stream=False, **kwargs):
+    """Mock the API: jsonl export (gzip or identity) and JSON engage responses."""
+    if "export" in url:
+        if kwargs["headers"].get("Accept-Encoding") == "gzip" and "gzip" in url:
+            return get_response(gzip.compress(EXPORT_BODY), {"Content-Encoding": "gzip"})
+        return get_response(EXPORT_BODY, {})
+    return get_response(ENGAGE_BODY, {"Content-Type": "application/json"})
+
+
+def get_client(cassette):
+    """Return a verified client using the cassette."""
+    mock_client = client.MixpanelClient("mock_api_secret", "mock_api_domain", 300, cassette=cassette)
+    mock_client._MixpanelClient__verified = True
+    return mock_client
+
+
+class TestCassette(unittest.TestCase):
+    """
+    Test that the recorded responses are replayed offline with the same content.
+    """
+
+    @parameterized.expand([
+        ["gzip_export", "https://data.mixpanel.com/api/2.0/export/gzip"],
+        ["identity_export", "https://data.mixpanel.com/api/2.0/export"],
+    ])
+    @mock.patch("requests.Session.request", side_effect=mock_request)
+    def test_record_and_replay(self, test_name, export_url, mock_session_request):
+        """
+        Test that `request` and `request_export` return the same data in record and replay mode.
+        """
+        with tempfile.TemporaryDirectory() as cassette_dir:
+            recording_client = get_client(Cassette(cassette_dir, RECORD))
+            recorded_export = list(recording_client.request_export(
+                "GET", url=export_url, params="from_date=2020-03-01&to_date=2020-03-02"))
+            recorded_engage = recording_client.request(
+                "GET", url="https://mixpanel.com/api/2.0", path="engage", params={"page_size": 250})
+
+            replaying_client = get_client(Cassette(cassette_dir, REPLAY))
+            replayed_export = list(replaying_client.request_export(
+                "GET", url=export_url, params="from_date=2020-03-01&to_date=2020-03-02"))
+            replayed_engage = replaying_client.request(
+                "GET", url="https://mixpanel.com/api/2.0", path="engage", params={"page_size": 250})
+
+        # Verify that the API is only called while recording
+        self.assertEqual(mock_session_request.call_count, 2)
+
+        # Verify that the replayed data is the recorded data
+        self.assertEqual(len(recorded_export), 2)
+        self.assertEqual(replayed_export, recorded_export)
+        self.assertEqual(replayed_engage, recorded_engage)
+
+    def test_replay_missing_request(self):
+        """
+        Test that replaying a request which is not recorded raises CassetteError.
+        """
+        with tempfile.TemporaryDirectory() as cassette_dir:
+            Cassette(cassette_dir, RECORD).write_index()
+            replaying_client = get_client(Cassette(cassette_dir, REPLAY))
+
+            with self.assertRaises(CassetteError):
+                replaying_client.request("GET", url="https://mixpanel.com/api/2.0", path="annotations")
@@ -0,0 +1,99 @@
+import unittest
+from datetime import date
+from unittest import mock
+
+from tap_mixpanel.checkpoint import DAY_CONTINUES, DAY_FINISHED, OUT_OF_ORDER, DayCheckpoints
+from tap_mixpanel.streams import Export
+
+
+def get_event(day, hour):
+    """Get a raw export event of September 2022, in UTC."""
+    return {
+        "event": "Signed up",
+        "properties": {"time": 1661990400 + (day - 1) * 86400 + hour * 3600, "distinct_id": f"{day}-{hour}"},
+    }
+
+
+def get_record(day, hour):
+    """Get a transformed export record of September 2022, in UTC."""
+    return {"time": f"2022-09-{day:02d}T{hour:02d}:00:00.000000Z"}
+
+
+class TestDayCheckpoints(unittest.TestCase):
+    """Test the day boundaries of the export records."""
+
+    def split(self, checkpoints, records):
+        return [
+            ([record["time"][8:13] for record in part], status)
+            for part, status in checkpoints.split(records)
+        ]
+
+    def test_split_across_batches(self):
+        """Test the batches are split at the day boundaries of the project timezone."""
+        checkpoints = DayCheckpoints("US/Pacific")
+
+        # Days start at 07:00 UTC in September for US/Pacific
+        self.assertEqual(
+            self.split(checkpoints, [get_record(1, 5), get_record(1, 9), get_record(1, 20)]),
+            [(["01T05"], DAY_FINISHED), (["01T09", "01T20"], DAY_CONTINUES)],
+        )
+        self.assertEqual(
+            self.split(checkpoints, [get_record(2, 7), get_record(2, 8), get_record(3, 1)]),
+            [([], DAY_FINISHED), (["02T07", "02T08", "03T01"], DAY_CONTINUES)],
+        )
+        self.assertEqual(checkpoints.day, date(2022, 9, 2))
+
+    def test_out_of_order(self):
+        """Test the checkpoints are disabled by an event of an earlier day."""
+        checkpoints = DayCheckpoints("UTC")
+
+        self.assertEqual(
+            self.split(checkpoints, [get_record(1, 5), get_record(2, 5), get_record(1, 6), get_record(3, 5)]),
+            [(["01T05"], DAY_FINISHED), (["02T05"], OUT_OF_ORDER), (["01T06", "03T05"], DAY_CONTINUES)],
+        )
+        self.assertFalse(checkpoints.enabled)
+        self.assertEqual(
+            self.split(checkpoints, [get_record(4, 5), get_record(5, 5)]),
+            [(["04T05", "05T05"], DAY_CONTINUES)],
+        )
+
+
+class TestExportDayCheckpoints(unittest.TestCase):
+    """Test the export bookmark written at the day boundaries of a date window."""
+
+    def get_written_bookmarks(self, events):
+        mock_client = mock.Mock()
+        mock_client.request_export.return_value = iter(events)
+        stream = Export(mock_client)
+        stream.day_checkpoints = True
+
+        def process_records(**kwargs):
+            return kwargs["records"][-1]["time"], len(kwargs["records"])
+
+        with mock.patch.object(Export, "process_records", side_effect=process_records), \
+                mock.patch.object(Export, "write_bookmark") as mock_write_bookmark:
+            result = stream.get_and_transform_records(
+                querystring="", project_timezone="UTC", max_bookmark_value="2022-09-01T00:00:00Z",
+                state={}, config={}, catalog=None, selected_streams=["export"],
+                last_datetime="2022-09-01T00:00:00Z", endpoint_total=0, limit=2, total_records=0,
+                parent_total=0, record_count=0, page=0, offset=0, parent_record=None, date_total=0,
+            )
+        return [call.args[2] for call in mock_write_bookmark.call_args_list], result[5]
+
+    def test_checkpoint_at_day_boundaries(self):
+        """Test the bookmark is written once each day of the date window is written."""
+        events = [get_event(1, 1), get_event(1, 2), get_event(1, 3), get_event(2, 1), get_event(3, 1)]
+
+        bookmarks, total = self.get_written_bookmarks(events)
+
+        self.assertEqual(bookmarks, ["2022-09-01T03:00:00.000000Z", "2022-09-02T01:00:00.000000Z"])
+        self.assertEqual(total, 5)
+
+    def test_restored_if_out_of_order(self):
+        """Test the bookmark before the date window is restored if the days are out of order."""
+        events = [get_event(1, 1), get_event(2, 1), get_event(1, 2), get_event(3, 1)]
+
+        bookmarks, total = self.get_written_bookmarks(events)
+
+        self.assertEqual(bookmarks, ["2022-09-01T01:00:00.000000Z", "2022-09-01T00:00:00Z"])
+        self.assertEqual(total, 4)
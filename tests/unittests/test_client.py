@@ -1,4 +1,5 @@
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from unittest import mock
 
 from tap_mixpanel import client
@@ -7,6 +8,7 @@ from tap_mixpanel import client
 class MockResponse:
     """Mocked standard HTTPResponse to test error handling."""
     status_code = 200
+    content = b"{}"
 
     def iter_lines(self):
         """Mock generator(list) to return in response."""
@@ -15,6 +17,10 @@ class MockResponse:
             b'{"event": "Page View", "properties": {"time": 1583225657, "distinct_id": "test_id_2"}}'
         ]
 
+    def iter_content(self, chunk_size=1):
+        """Mock generator(list) of raw chunks to return in response."""
+        return [b"\n".join(self.iter_lines())]
+
     def json(self):
         """JSON formatted response"""
         return {}
@@ -142,3 +148,27 @@ class TestClientMethods(unittest.TestCase):
 
         # Verify that returned response is expected.
         self.assertEqual(list(response), expected_data)
+
+    @mock.patch("tap_mixpanel.client.MixpanelClient.check_access", return_value=True)
+    @mock.patch("tap_mixpanel.client.MixpanelClient.perform_request", return_value=MockResponse())
+    def test_response_counters_across_threads(self, mock_perform_request, mock_check_access):
+        """
+        Test that the responses of concurrent requests are all counted.
+        """
+        mock_client = client.MixpanelClient(
+            api_secret="mock_api_secret",
+            api_domain="mock_api_domain",
+            request_timeout=300,
+        )
+
+        def request(_):
+            mock_client.request(method="GET", path="sample_path", endpoint={})
+            list(mock_client.request_export(method="GET", path="sample_path", endpoint={}))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(request, range(200)))
+
+        # Verify that every response and its bytes are counted
+        export_bytes = len(b"\n".join(MockResponse().iter_lines()))
+        self.assertEqual(mock_client.response_count, 400)
+        self.assertEqual(mock_client.response_bytes, 200 * (len(MockResponse.content) + export_bytes))
@@ -0,0 +1,123 @@
+import unittest
+from unittest import mock
+
+from parameterized import parameterized
+
+from tap_mixpanel.client import MixpanelClient
+from tap_mixpanel.fake_server import FakeMixpanelServer, SyntheticData
+from tap_mixpanel.rate_limiter import RateLimiter
+from tap_mixpanel.streams import CohortMembers
+
+START_DATE = "2022-01-01T00:00:00Z"
+
+
+class TestCohortMembersConcurrency(unittest.TestCase):
+    """Test the members of several cohorts fetched at once, against the fake server."""
+
+    def setUp(self):
+        self.data = SyntheticData(seed=1, profiles=1500, properties_per_profile=2, cohorts=6)
+        self.server = FakeMixpanelServer(self.data, latency=0.01).start()
+        self.rate_limiter = RateLimiter(None, None)
+        self.client = MixpanelClient(
+            "secret", "mixpanel.com", 30, rate_limiter=self.rate_limiter, base_url=self.server.url
+        )
+
+    def tearDown(self):
+        self.server.stop()
+
+    def sync(self, config):
+        blocks = []
+
+        def process_records(**kwargs):
+            blocks.append(kwargs["records"])
+            return None, len(kwargs["records"])
+
+        with mock.patch.object(CohortMembers, "process_records", side_effect=process_records):
+            total = CohortMembers(self.client).sync(
+                {},
+                None,
+                {**config, "start_date": START_DATE},
+                START_DATE,
+                ["cohort_members"],
+                parent_data=self.data.cohorts_list(),
+            )
+        self.assertEqual(total, 1500)
+        return blocks
+
+    def test_same_records_as_sequential(self):
+        """Test the members are written in the same order, one block per cohort."""
+        expected = [record for block in self.sync({}) for record in block]
+
+        with mock.patch.object(self.rate_limiter, "acquire", wraps=self.rate_limiter.acquire) as mock_acquire:
+            blocks = self.sync({"cohort_members_concurrency": "3"})
+
+        self.assertEqual([record for block in blocks for record in block], expected)
+        self.assertEqual(
+            [{record["cohort_id"] for record in block} for block in blocks], [{1}, {2}, {3}, {4}, {5}, {6}]
+        )
+        # Every request is paced by the shared rate limiter, a page of 250 members per cohort
+        self.assertEqual(mock_acquire.call_count, 6)
+
+    def test_failed_cohort_raises(self):
+        """Test a cohort failing stops the sync, without writing the later cohorts."""
+        request = self.client.request
+
+        def fail_cohort(**kwargs):
+            if '"id": 2' in kwargs["params"]:
+                raise Exception("Cohort failed")
+            return request(**kwargs)
+
+        blocks = []
+        self.client.request = mock.Mock(side_effect=fail_cohort)
+        with mock.patch.object(
+            CohortMembers, "process_records", side_effect=lambda **kwargs: blocks.append(kwargs) or (None, 0)
+        ), self.assertRaisesRegex(Exception, "Cohort failed"):
+            CohortMembers(self.client).sync(
+                {},
+                None,
+                {"cohort_members_concurrency": "2", "start_date": START_DATE},
+                START_DATE,
+                ["cohort_members"],
+                parent_data=self.data.cohorts_list(),
+            )
+        self.assertEqual(len(blocks), 1)
+
+
+class TestFetchCohortRecords(unittest.TestCase):
+    """Test the pages of the members of a cohort."""
+
+    def test_total_of_first_page(self):
+        """Test the pages are requested up to the total of the first page, missing from the next pages."""
+        def request(**kwargs):
+            page = int(kwargs["params"].split("page=")[1]) if "page=" in kwargs["params"] else 0
+            data = {
+                "session_id": "session",
+                "results": [{"$distinct_id": f"user-{page}-{index}"} for index in range(min(250, 600 - page * 250))],
+            }
+            if page == 0:
+                data["total"] = 600
+            return data
+
+        mock_client = mock.Mock()
+        mock_client.request.side_effect = request
+        stream = CohortMembers(mock_client)
+
+        params = {"filter_by_cohort": '{"id": [parent_id]}'}
+        _, records = stream.fetch_cohort_records({"id": 1}, params, 250, "UTC")
+
+        self.assertEqual(mock_client.request.call_count, 3)
+        self.assertEqual(len(records), 600)
+        self.assertEqual(records[-1], {"distinct_id": "user-2-99", "cohort_id": 1})
+
+    @parameterized.expand([("null", None), ("empty", {})])
+    def test_empty_response(self, name, response):
+        """Test an empty response ends the cohort without records."""
+        mock_client = mock.Mock()
+        mock_client.request.return_value = response
+        stream = CohortMembers(mock_client)
+
+        params = {"filter_by_cohort": '{"id": [parent_id]}'}
+        _, records = stream.fetch_cohort_records({"id": 1}, params, 250, "UTC")
+
+        self.assertEqual(mock_client.request.call_count, 1)
+        self.assertEqual(records, [])
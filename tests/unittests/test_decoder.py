@@ -0,0 +1,112 @@
+import gzip
+import io
+import unittest
+from unittest import mock
+
+import jsonlines
+import requests
+from parameterized import parameterized
+from requests.structures import CaseInsensitiveDict
+from singer import metrics
+from urllib3 import HTTPResponse
+from urllib3.exceptions import ProtocolError
+from tap_mixpanel.decoder import get_json_loads, iter_jsonl, iter_response_chunks, stdlib_loads
+
+EXPORT_BODY = (
+    b'{"event": "Page View", "properties": {"time": 1583044147, "distinct_id": "id_1", "price": 1.1}}\n'
+    b'\n'
+    b'   \r\n'
+    b'null\n'
+    b'{"event": "Sign Up", "properties": {"time": 1583225657, "big": 123456789012345678901234567890}}\r\n'
+    b'{"event": "Purchase", "properties": {"time": 1583225658, "name": "caf\xc3\xa9 \\ud83d\\ude00"}}'
+)
+
+
+def get_response(body, content_encoding=None):
+    """Return a streamed requests.Response with the raw body."""
+    headers = {"Content-Encoding": content_encoding} if content_encoding else {}
+    response = requests.Response()
+    response.status_code = 200
+    response.headers = CaseInsensitiveDict(headers)
+    response.raw = HTTPResponse(
+        body=io.BytesIO(body), headers=headers, preload_content=False, decode_content=False
+    )
+    return response
+
+
+def split_chunks(body, chunk_size):
+    """Split the body into raw chunks of chunk_size bytes."""
+    return [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+
+class TestIterJsonl(unittest.TestCase):
+    """
+    Test that `iter_jsonl` decodes the same records as jsonlines.Reader.
+    """
+
+    expected = list(
+        jsonlines.Reader(EXPORT_BODY.splitlines()).iter(allow_none=True, skip_empty=True)
+    )
+
+    @parameterized.expand([
+        ["single_chunk", len(EXPORT_BODY)],
+        ["tiny_chunks", 1],
+        ["odd_chunks", 7],
+    ])
+    def test_same_records_as_jsonlines(self, test_name, chunk_size):
+        """
+        Test that the records are identical, wherever the chunk boundaries fall.
+        """
+        for loads in (get_json_loads()[1], stdlib_loads):
+            records = list(iter_jsonl(split_chunks(EXPORT_BODY, chunk_size), loads=loads))
+
+            # Verify that the decoded records are the same as jsonlines.Reader
+            self.assertEqual(records, self.expected)
+
+    def test_invalid_line(self):
+        """
+        Test that an invalid line raises the same error as jsonlines.Reader.
+        """
+        with self.assertRaises(jsonlines.InvalidLineError) as error:
+            list(iter_jsonl([b'{"event": "Page View"}\n{"event": \n']))
+
+        # Verify that the line number of the invalid line is reported
+        self.assertEqual(error.exception.lineno, 2)
+
+
+class TestIterResponseChunks(unittest.TestCase):
+    """
+    Test that `iter_response_chunks` decompresses the body and counts its bytes.
+    """
+
+    @parameterized.expand([
+        ["gzip", gzip.compress(EXPORT_BODY), "gzip"],
+        ["multi_member_gzip", gzip.compress(EXPORT_BODY[:100]) + gzip.compress(EXPORT_BODY[100:]), "gzip"],
+        ["identity", EXPORT_BODY, None],
+    ])
+    def test_decompressed_body(self, test_name, body, content_encoding):
+        """
+        Test that the decompressed body and both byte counts are expected.
+        """
+        compressed_counter = metrics.Counter("http_compressed_bytes")
+        decompressed_counter = metrics.Counter("http_decompressed_bytes")
+        chunks = iter_response_chunks(
+            get_response(body, content_encoding), compressed_counter, decompressed_counter
+        )
+
+        # Verify that the body is decompressed
+        self.assertEqual(b"".join(chunks), EXPORT_BODY)
+
+        # Verify that the transferred and decompressed bytes are counted
+        self.assertEqual(compressed_counter.value, len(body))
+        self.assertEqual(decompressed_counter.value, len(EXPORT_BODY))
+
+    def test_broken_stream_raises_chunked_encoding_error(self):
+        """
+        Test that a broken raw stream raises ChunkedEncodingError, which the export retries.
+        """
+        response = get_response(gzip.compress(EXPORT_BODY), "gzip")
+        response.raw.stream = mock.Mock(side_effect=ProtocolError("Connection broken"))
+
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            list(iter_response_chunks(response, mock.Mock(), mock.Mock()))
@@ -0,0 +1,136 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from tap_mixpanel.dedup import DedupIndex, get_dedup_entry
+from tap_mixpanel.streams import Export
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "event": {"type": ["null", "string"]},
+        "time": {"type": ["null", "string"], "format": "date-time"},
+        "distinct_id": {"type": ["null", "string"]},
+    },
+}
+
+
+def get_record(index, day=1):
+    """Get a transformed export record."""
+    return {
+        "event": "Signed up",
+        "distinct_id": f"user-{index}",
+        "time": f"2022-09-{day:02d}T00:00:{index % 60:02d}.000000Z",
+        "$insert_id": f"{index:016x}",
+    }
+
+
+class TestDedupEntry(unittest.TestCase):
+    """Test the keys of the export events."""
+
+    def test_key(self):
+        """Test the key follows the event, distinct_id, time and $insert_id of the event."""
+        record = get_record(1)
+        key, day = get_dedup_entry(record)
+
+        self.assertEqual(len(key), 12)
+        self.assertEqual(day, 738399)
+        # The $insert_id is renamed by some schemas
+        renamed = {name: value for name, value in record.items() if name != "$insert_id"}
+        renamed["mp_reserved_insert_id"] = record["$insert_id"]
+        self.assertEqual(get_dedup_entry(renamed)[0], key)
+        self.assertNotEqual(get_dedup_entry({**renamed, "mp_reserved_insert_id": "other"})[0], key)
+        self.assertNotEqual(get_dedup_entry({**renamed, "event": "other"})[0], key)
+
+    def test_invalid_time(self):
+        """Test an event without time gets an expired day."""
+        self.assertEqual(get_dedup_entry({"event": "Signed up"})[1], 0)
+
+
+class TestDedupIndex(unittest.TestCase):
+    """Test the index of the emitted export events."""
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "state", "dedup.sqlite")
+
+    def drop_emitted(self, index, records):
+        return index.drop_emitted(records, [get_dedup_entry(record) for record in records])
+
+    def test_drop_emitted(self):
+        """Test the records emitted by an earlier sync, or earlier in the batch, are dropped."""
+        records = [get_record(i) for i in range(10)]
+        with DedupIndex(self.path) as index:
+            self.assertEqual(self.drop_emitted(index, records[:5] + records[:2]), records[:5])
+            index.commit()
+
+        with DedupIndex(self.path) as index:
+            self.assertEqual(self.drop_emitted(index, records), records[5:])
+            self.assertEqual(index.dropped, 5)
+
+    def test_not_committed(self):
+        """Test the keys are not kept if the state covering their records is not written."""
+        records = [get_record(i) for i in range(10)]
+        with DedupIndex(self.path) as index:
+            self.drop_emitted(index, records)
+
+        with DedupIndex(self.path) as index:
+            self.assertEqual(self.drop_emitted(index, records), records)
+
+    def test_expire(self):
+        """Test the keys of the events before the attribution window are deleted."""
+        records = [get_record(i, day=1 + i % 5) for i in range(10)]
+        with DedupIndex(self.path) as index:
+            self.drop_emitted(index, records)
+            index.commit()
+            index.expire("2022-09-03T12:00:00Z")
+
+            self.assertEqual(
+                self.drop_emitted(index, records), [record for record in records if record["time"] < "2022-09-03"]
+            )
+
+
+class TestExportDedup(unittest.TestCase):
+    """Test the export records are deduplicated when they are written."""
+
+    def setUp(self):
+        self.catalog = mock.Mock()
+        self.catalog.get_stream.return_value.schema.to_dict.return_value = SCHEMA
+        self.catalog.get_stream.return_value.metadata = []
+        self.path = os.path.join(tempfile.mkdtemp(), "dedup.sqlite")
+
+    def process_records(self, stream, records):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            result = stream.process_records(
+                self.catalog, "export", records, None, "time", None, "2022-09-01T00:00:00Z"
+            )
+            stream.write_bookmark({}, "export", result[0])
+        return result, stdout.getvalue().count('"type": "RECORD"')
+
+    def test_process_records(self):
+        """Test the records written by an earlier sync are dropped, the bookmark still moves."""
+        stream = Export(mock.Mock())
+        with DedupIndex(self.path) as stream.dedup_index:
+            self.process_records(stream, [get_record(i) for i in range(5)])
+
+        with DedupIndex(self.path) as stream.dedup_index:
+            result, written = self.process_records(stream, [get_record(i) for i in range(10)])
+
+        self.assertEqual(result, ("2022-09-01T00:00:09.000000Z", 5))
+        self.assertEqual(written, 5)
+
+    @mock.patch("tap_mixpanel.streams.MixPanel.sync", return_value=0)
+    def test_expired_at_sync_start(self, mock_sync):
+        """Test the index is opened and expired from the bookmark and attribution window."""
+        stream = Export(mock.Mock())
+        state = {"bookmarks": {"export": "2022-09-10T00:00:00Z"}}
+        config = {"dedup_index_path": self.path, "attribution_window": 3}
+
+        with mock.patch("tap_mixpanel.streams.DedupIndex.expire") as mock_expire:
+            stream.sync(state, self.catalog, config, "2022-09-01T00:00:00Z", ["export"])
+
+        mock_expire.assert_called_with("2022-09-06T00:00:00.000000Z")
+        self.assertIsNone(stream.dedup_index)
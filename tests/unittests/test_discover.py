@@ -1,6 +1,7 @@
 import unittest
 from unittest import mock
 from parameterized import parameterized
+from singer import metadata
 from singer.catalog import Catalog
 from tap_mixpanel.discover import discover
 from tap_mixpanel.schema import get_schema, get_schemas
@@ -102,3 +103,24 @@ class TestGetSchema(unittest.TestCase):
         # Verify that dynamic schema stream is not written in catalog.
         self.assertNotIn("export", schemas)
         self.assertNotIn("engage", schemas)
+
+    @parameterized.expand([
+        ["full_table", {}, "FULL_TABLE", []],
+        ["incremental", {"engage_incremental": "true"}, "INCREMENTAL", ["mp_reserved_last_seen"]],
+        ["bookmark_property", {"engage_incremental": "true", "engage_bookmark_property": "updated"},
+         "INCREMENTAL", ["updated"]],
+    ])
+    def test_engage_replication(self, name, config, replication_method, replication_keys):
+        """
+        Test the engage metadata reports the incremental replication of `engage_incremental`.
+        """
+        client = mock.Mock()
+        client.disable_engage_endpoint = False
+        client.request.return_value = self.engage_schema_response
+
+        _, field_metadata = get_schemas(client, True, config)
+        mdata = metadata.to_map(field_metadata["engage"])
+
+        # Verify the replication method and key of the stream
+        self.assertEqual(metadata.get(mdata, (), "forced-replication-method"), replication_method)
+        self.assertEqual(metadata.get(mdata, (), "valid-replication-keys"), replication_keys)
@@ -0,0 +1,120 @@
+import contextlib
+import io
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from parameterized import parameterized
+
+from tap_mixpanel.client import MixpanelClient
+from tap_mixpanel.fake_server import FakeMixpanelServer, SyntheticData
+from tap_mixpanel.rate_limiter import RateLimiter
+from tap_mixpanel.streams import Engage, MixPanel
+
+START_DATE = "2022-01-01T00:00:00Z"
+NOW = datetime(2022, 9, 20, tzinfo=timezone.utc)
+
+
+class TestIncrementalWhere(unittest.TestCase):
+    """Test the filter of the profiles seen since the bookmark."""
+
+    def setUp(self):
+        self.stream = Engage(None)
+        self.stream.bookmark_property = "$last_seen"
+
+    def test_lookback(self):
+        """Test the profiles seen since the bookmark less the lookback are synced."""
+        state = {"bookmarks": {"engage": "2022-09-10T06:00:00.000000Z"}}
+
+        self.assertEqual(
+            self.stream.get_incremental_where(state, {}, NOW),
+            'properties["$last_seen"] >= "2022-09-09T06:00:00"',
+        )
+        self.assertEqual(
+            self.stream.get_incremental_where(state, {"engage_lookback_hours": "2"}, NOW),
+            'properties["$last_seen"] >= "2022-09-10T04:00:00"',
+        )
+
+    @parameterized.expand([
+        ("no_bookmark", {}, {}, True),
+        ("incremental", {"bookmarks": {"engage": "2022-09-10T00:00:00Z"}}, {}, False),
+        ("never_refreshed", {"bookmarks": {"engage": "2022-09-10T00:00:00Z"}}, {"engage_full_refresh_days": 7}, True),
+        (
+            "refresh_due",
+            {"bookmarks": {"engage": "2022-09-10T00:00:00Z"}, "full_refresh": {"engage": "2022-09-13T00:00:00Z"}},
+            {"engage_full_refresh_days": 7},
+            True,
+        ),
+        (
+            "refresh_not_due",
+            {"bookmarks": {"engage": "2022-09-10T00:00:00Z"}, "full_refresh": {"engage": "2022-09-14T00:00:00Z"}},
+            {"engage_full_refresh_days": 7},
+            False,
+        ),
+    ])
+    def test_full_refresh(self, name, state, config, full_refresh):
+        """Test the full refresh without bookmark, or every `engage_full_refresh_days` days."""
+        self.assertEqual(self.stream.get_incremental_where(state, config, NOW) is None, full_refresh)
+
+
+class TestEngageIncremental(unittest.TestCase):
+    """Test the incremental engage sync against the fake server."""
+
+    def setUp(self):
+        self.data = SyntheticData(seed=1, profiles=600, properties_per_profile=2)
+        self.server = FakeMixpanelServer(self.data).start()
+        self.client = MixpanelClient(
+            "secret", "mixpanel.com", 30, rate_limiter=RateLimiter(None, None), base_url=self.server.url
+        )
+
+    def tearDown(self):
+        self.server.stop()
+
+    def sync(self, state, config):
+        written = []
+
+        def process_records(_, catalog, stream_name, records, *args):
+            written.extend(records)
+            return None, len(records)
+
+        config = {"engage_incremental": "true", "start_date": START_DATE, **config}
+        with mock.patch.object(MixPanel, "process_records", autospec=True, side_effect=process_records), \
+                contextlib.redirect_stdout(io.StringIO()):
+            Engage(self.client).sync(state, None, config, START_DATE, ["engage"])
+        return written
+
+    @parameterized.expand([("sequential", {}), ("partitions", {"engage_partitions": "3"})])
+    def test_profiles_seen_since_bookmark(self, name, config):
+        """Test a full first sync, then only the profiles seen since the bookmark less the lookback."""
+        state = {}
+        written = self.sync(state, config)
+        self.assertEqual(len(written), 600)
+        last_seen = [record["mp_reserved_last_seen"] for record in written]
+        self.assertEqual(state["bookmarks"]["engage"], f"{max(last_seen)}.000000Z")
+        self.assertIn("engage", state["full_refresh"])
+
+        since = (datetime.fromisoformat(max(last_seen)) - timedelta(days=10)).strftime("%Y-%m-%dT%H:%M:%S")
+        state["bookmarks"]["engage"] = f"{since}Z"
+        written = self.sync(state, config)
+
+        expected = {
+            f"user-{index}"
+            for index, seen in enumerate(last_seen_by_index(self.data))
+            if seen >= (datetime.fromisoformat(since) - timedelta(hours=24)).strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        self.assertTrue(0 < len(expected) < 600)
+        self.assertEqual({record["distinct_id"] for record in written}, expected)
+        # The bookmark moves to the latest profile seen
+        self.assertEqual(state["bookmarks"]["engage"], f"{max(last_seen)}.000000Z")
+
+    def test_bookmark_not_moved_back(self):
+        """Test a sync without newer profiles keeps the bookmark."""
+        state = {"bookmarks": {"engage": "2099-01-01T00:00:00.000000Z"}}
+
+        self.assertEqual(self.sync(state, {}), [])
+        self.assertEqual(state["bookmarks"]["engage"], "2099-01-01T00:00:00.000000Z")
+
+
+def last_seen_by_index(data):
+    """Get the $last_seen of every generated profile."""
+    return [data.generate_profile(index)["$properties"]["$last_seen"] for index in range(data.profiles)]
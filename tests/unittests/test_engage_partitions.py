@@ -0,0 +1,90 @@
+import unittest
+from unittest import mock
+
+from tap_mixpanel.client import MixpanelClient
+from tap_mixpanel.engage_partitions import get_partition_bounds, get_partition_wheres
+from tap_mixpanel.fake_server import FakeMixpanelServer, SyntheticData, match_where
+from tap_mixpanel.rate_limiter import RateLimiter
+from tap_mixpanel.streams import Engage
+
+START_DATE = "2022-01-01T00:00:00Z"
+
+
+class TestPartitionBounds(unittest.TestCase):
+    """Test the ranges of distinct_id splitting the profiles."""
+
+    def test_bounds(self):
+        """Test the bounds are quantiles of the sampled distinct_ids."""
+        distinct_ids = [f"{index:02d}" for index in range(20)] + [None, "05"]
+        self.assertEqual(get_partition_bounds(distinct_ids, 4), ["05", "10", "15"])
+        self.assertEqual(get_partition_bounds(["a", "b"], 4), ["b"])
+        self.assertEqual(get_partition_bounds([], 4), [])
+
+    def test_every_profile_in_one_range(self):
+        """Test the ranges are disjoint and cover every distinct_id."""
+        wheres = get_partition_wheres(["b", 'quote"'])
+        self.assertEqual(wheres[0], 'properties["$distinct_id"] < "b"')
+
+        for distinct_id in ["", "a", "b", "c", "quote", 'quote"', "z"]:
+            profile = {"$distinct_id": distinct_id, "$properties": {}}
+            self.assertEqual(sum(match_where(profile, where) for where in wheres), 1, distinct_id)
+
+
+class TestEngagePartitions(unittest.TestCase):
+    """Test the engage profiles paged as concurrent partitions, against the fake server."""
+
+    def setUp(self):
+        self.server = FakeMixpanelServer(SyntheticData(seed=1, profiles=1200, properties_per_profile=2)).start()
+        self.client = MixpanelClient(
+            "secret", "mixpanel.com", 30, rate_limiter=RateLimiter(None, None), base_url=self.server.url
+        )
+
+    def tearDown(self):
+        self.server.stop()
+
+    def sync(self, config):
+        written = []
+
+        def process_records(**kwargs):
+            written.extend(record["distinct_id"] for record in kwargs["records"])
+            return None, len(kwargs["records"])
+
+        stream = Engage(self.client)
+        with mock.patch.object(Engage, "process_records", side_effect=process_records):
+            total = stream.sync({}, None, {**config, "start_date": START_DATE}, START_DATE, ["engage"])
+        return total, written
+
+    def test_same_profiles_as_sequential(self):
+        """Test every profile is written once, with the ranges paged concurrently."""
+        total, written = self.sync({"engage_partitions": "4"})
+
+        self.assertEqual(total, 1200)
+        self.assertEqual(sorted(written), sorted(f"user-{index}" for index in range(1200)))
+        # Unfiltered first page, 3 sampled pages, 4 ranges of at most 2 pages of 250 profiles
+        self.assertLessEqual(self.server.stats["requests"]["engage"], 12)
+
+    def test_skewed_ranges(self):
+        """Test the profiles are paged sequentially if a range has most of the profiles."""
+        # The first page alone holds the lowest user-N, far from the quantiles of all the profiles
+        with mock.patch("tap_mixpanel.engage_partitions.SAMPLE_PAGES", 1), \
+                mock.patch("tap_mixpanel.engage_partitions.LOGGER.warning") as mock_warning:
+            total, written = self.sync({"engage_partitions": "4"})
+
+        mock_warning.assert_called_once()
+        self.assertIn("skewed", mock_warning.call_args[0][0])
+        self.assertEqual(total, 1200)
+        self.assertEqual(written, [f"user-{index}" for index in range(1200)])
+
+    def test_ranges_not_covering_total(self):
+        """Test the profiles are paged sequentially if the ranges miss profiles."""
+        def match_last_range_none(profile, where):
+            # As if the profiles of the last range had no distinct_id property
+            return "<" in where and match_where(profile, where)
+
+        with mock.patch("tap_mixpanel.fake_server.match_where", side_effect=match_last_range_none), \
+                mock.patch("tap_mixpanel.engage_partitions.LOGGER.warning") as mock_warning:
+            total, written = self.sync({"engage_partitions": "4"})
+
+        mock_warning.assert_called_once()
+        self.assertEqual(total, 1200)
+        self.assertEqual(len(set(written)), 1200)
@@ -252,7 +252,7 @@ class TestMixpanelConnectionResetErrorHandling(unittest.TestCase):
         # Verify that requests.Session.request is called 5 times
         self.assertEqual(mock_request.call_count, 5)
 
-    @mock.patch("jsonlines.jsonlines.Reader.iter", side_effect=requests.exceptions.ChunkedEncodingError)
+    @mock.patch("tap_mixpanel.client.iter_jsonl", side_effect=requests.exceptions.ChunkedEncodingError)
     def test_ChunkedEncodingError(self, mock_jsonlines, mock_time):
         """
         Check whether the request backoffs properly for `check_access` method for 5 times in case of Timeout error.
@@ -261,7 +261,7 @@ class TestMixpanelConnectionResetErrorHandling(unittest.TestCase):
         mock_client._MixpanelClient__verified = True
 
         fake_response = MockResponse(500)
-        fake_response.iter_lines = lambda : []
+        fake_response.iter_content = lambda chunk_size: []
         mock_client.perform_request = lambda *args, **kwargs: fake_response
 
         stream = streams.Export(mock_client)
@@ -0,0 +1,117 @@
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+
+import requests
+from tap_mixpanel.client import MixpanelClient
+from tap_mixpanel.event_shards import EventShards, split_event_names
+from tap_mixpanel.fake_server import FakeMixpanelServer, SyntheticData
+from tap_mixpanel.rate_limiter import RateLimiter
+from tap_mixpanel.streams import Export
+
+QUERYSTRING = "from_date=2020-01-01&to_date=2020-01-02"
+# Date window within the days of the event names of events/names
+RECENT_QUERYSTRING = f"from_date={date.today() - timedelta(days=3)}&to_date={date.today() - timedelta(days=2)}"
+
+
+class TestSplitEventNames(unittest.TestCase):
+    """Test the event names are split into disjoint sets."""
+
+    def test_split(self):
+        """Test every event name is in exactly one set."""
+        names = [f"Event {i}" for i in range(10)] + ["Event 0"]
+        event_sets = split_event_names(names, 3)
+
+        self.assertEqual(len(event_sets), 3)
+        self.assertEqual(sorted(name for events in event_sets for name in events), sorted(set(names)))
+        self.assertEqual([len(events) for events in event_sets], [4, 3, 3])
+
+    def test_more_shards_than_names(self):
+        """Test there are no empty sets."""
+        self.assertEqual(split_event_names(["b", "a"], 5), [["a"], ["b"]])
+        self.assertEqual(split_event_names([], 5), [])
+
+
+class TestEventShards(unittest.TestCase):
+    """Test the export date windows downloaded as event shards, against the fake server."""
+
+    def setUp(self):
+        self.server = FakeMixpanelServer(SyntheticData(seed=1, events_per_day=500)).start()
+        self.client = MixpanelClient(
+            "secret", "mixpanel.com", 30, rate_limiter=RateLimiter(None, None), base_url=self.server.url
+        )
+        self.stream = Export(self.client)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_same_records_as_single_request(self):
+        """Test the merged shards have the records of a single request, in the same order."""
+        expected = list(self.stream.request_records(RECENT_QUERYSTRING))
+
+        self.stream.event_shards = self.stream.get_event_shards({}, 3)
+        records = list(self.stream.request_records(RECENT_QUERYSTRING))
+
+        self.assertEqual(len(self.stream.event_shards.event_sets), 3)
+        self.assertEqual(self.server.stats["requests"]["events/names"], 1)
+        self.assertEqual(self.server.stats["requests"]["export"], 4)
+        self.assertEqual(records, expected)
+
+    @mock.patch("tap_mixpanel.streams.LOGGER.warning")
+    def test_window_before_event_names_not_sharded(self, mock_warning):
+        """Test a date window older than the event names of events/names is requested without shards."""
+        expected = list(self.stream.request_records(QUERYSTRING))
+
+        self.stream.event_shards = self.stream.get_event_shards({}, 3)
+        records = list(self.stream.request_records(QUERYSTRING))
+
+        mock_warning.assert_called_once()
+        self.assertEqual(self.server.stats["requests"]["export"], 2)
+        self.assertEqual(records, expected)
+
+    @mock.patch("tap_mixpanel.streams.LOGGER.warning")
+    def test_event_names_limit_not_sharded(self, mock_warning):
+        """Test the export is not sharded if events/names may have left out event names."""
+        with mock.patch("tap_mixpanel.streams.EVENT_NAMES_LIMIT", 2):
+            self.assertIsNone(self.stream.get_event_shards({}, 3))
+        mock_warning.assert_called_once()
+
+    def test_export_events(self):
+        """Test the `export_events` are sharded instead of the event names of the project."""
+        self.stream.event_shards = self.stream.get_event_shards({"export_events": "Sign Up, Purchase"}, 4)
+        records = list(self.stream.request_records(QUERYSTRING))
+
+        self.assertEqual(self.stream.event_shards.event_sets, [["Purchase"], ["Sign Up"]])
+        self.assertNotIn("events/names", self.server.stats["requests"])
+        self.assertEqual({record["event"] for record in records}, {"Sign Up", "Purchase"})
+        # The querystring of the stream does not restrict the events itself
+        self.assertEqual(self.stream.get_querystring({}, "none", "Sign Up, Purchase"), "")
+
+    def test_single_event_not_sharded(self):
+        """Test a single event is exported without shards."""
+        self.assertIsNone(self.stream.get_event_shards({"export_events": "Sign Up"}, 4))
+
+    @mock.patch("time.sleep")
+    def test_shard_retried_from_start(self, mock_sleep):
+        """Test a broken shard body is downloaded again without the records of the failed attempt."""
+        expected = list(self.stream.request_records(QUERYSTRING))
+        event_shards = EventShards(self.client, [["Sign Up"], ["Purchase", "Page View", "Search"]])
+        request_export_chunks = self.client.request_export_chunks
+        attempts = []
+
+        def broken_chunks(**kwargs):
+            # The first attempt of the first shard breaks after its first chunk
+            chunks = request_export_chunks(**kwargs)
+            yield next(chunks)
+            if "Sign" in kwargs["params"] and kwargs["params"] not in attempts:
+                attempts.append(kwargs["params"])
+                raise requests.exceptions.ChunkedEncodingError()
+            yield from chunks
+
+        with mock.patch.object(self.client, "request_export_chunks", side_effect=broken_chunks):
+            records = list(event_shards.request_export(self.stream.url, self.stream.path, QUERYSTRING))
+
+        self.assertEqual(len(attempts), 1)
+        mock_sleep.assert_called_once()
+        events = {"Sign Up", "Purchase", "Page View", "Search"}
+        self.assertEqual(records, [record for record in expected if record["event"] in events])
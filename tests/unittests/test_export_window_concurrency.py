@@ -0,0 +1,106 @@
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import pytz
+from tap_mixpanel.streams import Export
+
+NOW_TIME = datetime(year=2022, month=10, day=10).replace(tzinfo=pytz.UTC)
+
+
+def mock_fetch_window_records(querystring, project_timezone):
+    """Mock window fetch where the earlier windows take longer to download."""
+    from_date = querystring.split("from_date=")[1][:10]
+    time.sleep(0.05 if from_date == "2022-09-01" else 0)
+    return NOW_TIME, [{"time": f"{from_date}T00:00:00.000000Z"}]
+
+
+class TestExportWindowConcurrency(unittest.TestCase):
+    """
+    Test that concurrently fetched export date windows are written in order.
+    """
+
+    @mock.patch("tap_mixpanel.streams.Export.write_bookmark")
+    @mock.patch("tap_mixpanel.streams.Export.process_records")
+    @mock.patch("tap_mixpanel.streams.Export.fetch_window_records", side_effect=mock_fetch_window_records)
+    def test_windows_written_in_order(self, mock_fetch, mock_process_records, mock_write_bookmark):
+        """
+        Test that records and bookmarks are written in date window order,
+        even if later windows finish downloading first.
+        """
+        mock_process_records.side_effect = lambda **kwargs: (kwargs["records"][0]["time"], 1)
+        stream = Export(mock.Mock())
+        date_windows = stream.get_date_windows(
+            start_window=datetime(2022, 9, 1, tzinfo=pytz.UTC),
+            end_window=datetime(2022, 9, 10, tzinfo=pytz.UTC),
+            now_datetime=NOW_TIME,
+            days_interval=10,
+        )
+
+        total = stream.sync_windows_concurrently(
+            date_windows=date_windows,
+            window_concurrency=3,
+            state={},
+            catalog=None,
+            project_timezone="UTC",
+            tzone=pytz.UTC,
+            export_events=None,
+            last_datetime="2022-09-01T00:00:00Z",
+            max_bookmark_value="2022-09-01T00:00:00Z",
+        )
+
+        # Verify that all the date windows are fetched and written
+        self.assertEqual(mock_fetch.call_count, 4)
+        self.assertEqual(total, 4)
+
+        # Verify that the bookmark moves forward one finished window at a time
+        written_bookmarks = [call.args[2] for call in mock_write_bookmark.call_args_list]
+        self.assertEqual(written_bookmarks, [
+            "2022-09-01T00:00:00.000000Z",
+            "2022-09-11T00:00:00.000000Z",
+            "2022-09-21T00:00:00.000000Z",
+            "2022-10-01T00:00:00.000000Z",
+        ])
+
+    @mock.patch("tap_mixpanel.streams.Export.sync_windows_concurrently", return_value=0)
+    @mock.patch("tap_mixpanel.streams.Export.get_and_transform_records")
+    def test_sequential_sync_by_default(self, mock_get_and_transform_records, mock_concurrent_sync):
+        """
+        Test that the date windows are synced sequentially if `export_window_concurrency` is not set.
+        """
+        mock_get_and_transform_records.return_value = (0, 0, 0, 0, None, 0, None, 0)
+        stream = Export(mock.Mock())
+        config = {"start_date": "2022-10-01T00:00:00Z", "end_date": "2022-10-05T00:00:00Z"}
+
+        stream.sync(state={}, catalog=None, config=config, start_date=config["start_date"],
+                    selected_streams=["export"])
+
+        # Verify that the concurrent sync is not used
+        self.assertFalse(mock_concurrent_sync.called)
+        self.assertTrue(mock_get_and_transform_records.called)
+
+    @mock.patch("tap_mixpanel.streams.TransformPool")
+    @mock.patch("tap_mixpanel.streams.LOGGER.warning")
+    @mock.patch("tap_mixpanel.streams.Export.sync_windows_concurrently", return_value=0)
+    def test_sequential_options_warned(self, mock_concurrent_sync, mock_warning, mock_transform_pool):
+        """
+        Test that the options of the sequential date windows are reported, and the transform pool not started.
+        """
+        stream = Export(mock.Mock())
+        config = {
+            "start_date": "2022-10-01T00:00:00Z",
+            "end_date": "2022-10-05T00:00:00Z",
+            "export_window_concurrency": "2",
+            "transform_processes": "2",
+            "export_day_checkpoints": "true",
+            "export_resume_spool": "false",
+        }
+
+        stream.sync(state={}, catalog=None, config=config, start_date=config["start_date"],
+                    selected_streams=["export"])
+
+        self.assertTrue(mock_concurrent_sync.called)
+        self.assertFalse(mock_transform_pool.called)
+        mock_warning.assert_called_once()
+        self.assertEqual(mock_warning.call_args.args[1], "transform_processes, export_day_checkpoints")
@@ -0,0 +1,75 @@
+import unittest
+from unittest import mock
+
+from tap_mixpanel.client import MixpanelClient, Server429Error
+from tap_mixpanel.fake_server import FakeMixpanelServer, SyntheticData
+from tap_mixpanel.rate_limiter import RateLimiter
+
+
+class TestFakeServer(unittest.TestCase):
+    """Test the MixpanelClient against the local fake server."""
+
+    def setUp(self):
+        self.data = SyntheticData(seed=1, events_per_day=500, profiles=25, cohorts=2)
+        self.server = FakeMixpanelServer(self.data).start()
+        self.client = MixpanelClient(
+            "secret", "mixpanel.com", 30, rate_limiter=RateLimiter(None, None), base_url=self.server.url
+        )
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_export(self):
+        """Test the export events are streamed gzip compressed, ordered by time and filtered by event."""
+        records = list(self.client.request_export(
+            "GET",
+            url="https://data.mixpanel.com/api/2.0",
+            path="export",
+            params="from_date=2020-01-01&to_date=2020-01-02",
+        ))
+        self.assertEqual(len(records), 1000)
+        times = [record["properties"]["time"] for record in records]
+        self.assertEqual(times, sorted(times))
+
+        events = list(self.client.request_export(
+            "GET",
+            url="https://data.mixpanel.com/api/2.0",
+            path="export",
+            params='from_date=2020-01-01&to_date=2020-01-01&event=["Sign Up"]',
+        ))
+        self.assertEqual({record["event"] for record in events}, {"Sign Up"})
+        self.assertEqual(events, [record for record in records[:500] if record["event"] == "Sign Up"])
+
+    def test_engage_paging(self):
+        """Test the engage profiles are paged with page and page_size."""
+        first_page = self.client.request("GET", path="engage", params="page_size=10")
+        last_page = self.client.request(
+            "GET", path="engage", params=f"page_size=10&session_id={first_page['session_id']}&page=2"
+        )
+        self.assertEqual(first_page["total"], 25)
+        self.assertEqual(len(first_page["results"]), 10)
+        self.assertEqual(len(last_page["results"]), 5)
+        self.assertEqual(last_page["results"][-1]["$distinct_id"], "user-24")
+
+    def test_cohort_members(self):
+        """Test the engage profiles are filtered by cohort."""
+        cohorts = self.client.request("GET", path="cohorts/list")
+        members = self.client.request("GET", path="engage", params='filter_by_cohort={"id": 2}')
+        self.assertEqual(cohorts[1]["count"], 12)
+        self.assertEqual(len(members["results"]), 12)
+
+    def test_seeded_data(self):
+        """Test the same seed generates the same data."""
+        other = SyntheticData(seed=1, events_per_day=500, profiles=25, cohorts=2)
+        day = self.data.today
+        self.assertEqual(list(self.data.generate_events(day)), list(other.generate_events(day)))
+        self.assertEqual(self.data.generate_profile(3), other.generate_profile(3))
+
+    @mock.patch("time.sleep")
+    def test_injected_429(self, mocked_sleep):
+        """Test the injected 429s are retried by the client until the maximum tries."""
+        self.client.request("GET", path="funnels/list")
+        self.server.error_429_rate = 1
+        with self.assertRaises(Server429Error):
+            self.client.request("GET", path="funnels/list")
+        self.assertEqual(self.server.stats["requests"]["funnels/list"], 8)
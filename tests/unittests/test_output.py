@@ -0,0 +1,125 @@
+import contextlib
+import decimal
+import gzip
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+from urllib.parse import urlparse
+
+import pytz
+import singer
+
+from tap_mixpanel.output import BatchWriter, BufferedOutput
+from tap_mixpanel.streams import Export
+
+
+class TestBufferedOutput(unittest.TestCase):
+    """Test the buffered output of the Singer messages."""
+
+    def test_record_serialized_as_singer(self):
+        """Test the RECORD messages are serialized as singer.write_record does."""
+        record = {"id": 1, "amount": decimal.Decimal("1.10"), "name": "é", "tags": ["a"]}
+        for time_extracted in (None, datetime(2022, 9, 1, 1, 2, 3, 456, tzinfo=pytz.utc),
+                               pytz.timezone("US/Eastern").localize(datetime(2022, 9, 1, 1, 2, 3))):
+            expected = singer.format_message(
+                singer.RecordMessage(stream="export", record=record, time_extracted=time_extracted)
+            )
+            self.assertEqual(BufferedOutput().format_record("export", record, time_extracted), expected)
+
+    def test_records_flushed_before_state(self):
+        """Test the buffered records are written before a STATE or SCHEMA message, in order."""
+        buffered_output = BufferedOutput()
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            buffered_output.write_schema("export", {"type": "object"}, [])
+            buffered_output.write_record("export", {"id": 1})
+            buffered_output.write_record("export", {"id": 2})
+            self.assertEqual(stdout.getvalue().count("RECORD"), 0)
+            buffered_output.write_state({"bookmarks": {"export": "2022-09-01T00:00:00Z"}})
+
+        types = [singer.parse_message(line).__class__.__name__ for line in stdout.getvalue().splitlines()]
+        self.assertEqual(types, ["SchemaMessage", "RecordMessage", "RecordMessage", "StateMessage"])
+
+    def test_flush_on_size(self):
+        """Test the buffer is written when it is full."""
+        buffered_output = BufferedOutput(buffer_size=150)
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            for i in range(10):
+                buffered_output.write_record("export", {"id": i})
+
+        # Each message is 60 characters, the buffer is written every 3 messages
+        self.assertEqual(len(stdout.getvalue().splitlines()), 9)
+
+    @mock.patch("tap_mixpanel.output.time.monotonic")
+    def test_flush_on_interval(self, mock_monotonic):
+        """Test the buffer is written when its oldest message is older than the flush interval."""
+        buffered_output = BufferedOutput(flush_interval=1)
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            mock_monotonic.return_value = 10
+            buffered_output.write_record("export", {"id": 1})
+            mock_monotonic.return_value = 10.5
+            buffered_output.write_record("export", {"id": 2})
+            self.assertEqual(stdout.getvalue(), "")
+            mock_monotonic.return_value = 11
+            buffered_output.write_record("export", {"id": 3})
+
+        self.assertEqual(len(stdout.getvalue().splitlines()), 3)
+
+
+class TestBatchWriter(unittest.TestCase):
+    """Test the records written to BATCH files."""
+
+    def setUp(self):
+        self.batch_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+
+    def tearDown(self):
+        self.batch_dir.cleanup()
+
+    def test_rotated_files_announced(self):
+        """Test the records are written to rotated gzip jsonl files, each announced by a BATCH message."""
+        batch_writer = BatchWriter("export", self.batch_dir.name, max_records=2)
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            for i in range(5):
+                batch_writer.write_record({"id": i, "amount": decimal.Decimal("1.10")})
+            # The third file is announced once finished
+            self.assertEqual(len(stdout.getvalue().splitlines()), 2)
+            batch_writer.finish()
+
+        messages = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        records = []
+        for message in messages:
+            self.assertEqual(message["type"], "BATCH")
+            self.assertEqual(message["stream"], "export")
+            self.assertEqual(message["encoding"], {"format": "jsonl", "compression": "gzip"})
+            with gzip.open(urlparse(message["manifest"][0]).path, "rt") as file:
+                records += [json.loads(line) for line in file]
+        self.assertEqual([record["id"] for record in records], [0, 1, 2, 3, 4])
+        self.assertEqual(records[0]["amount"], 1.1)
+        # No temporary file is left
+        self.assertEqual(len(os.listdir(self.batch_dir.name)), 3)
+
+    def test_finish_without_records(self):
+        """Test no BATCH message is written without records."""
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            BatchWriter("export", self.batch_dir.name).finish()
+        self.assertEqual(stdout.getvalue(), "")
+
+    def test_batch_written_before_state(self):
+        """Test the export bookmark is written after the BATCH message of its records."""
+        stream = Export(None)
+        stream.batch_writer = BatchWriter("export", self.batch_dir.name)
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            stream.write_record("export", {"id": 1}, None)
+            stream.write_bookmark({}, "export", "2022-09-01T00:00:00.000000Z")
+
+        types = [json.loads(line)["type"] for line in stdout.getvalue().splitlines()]
+        self.assertEqual(types, ["BATCH", "STATE"])
@@ -0,0 +1,154 @@
+import unittest
+from unittest import mock
+
+from parameterized import parameterized
+
+from tap_mixpanel.client import MixpanelClient, Server5xxError
+from tap_mixpanel.fake_server import FakeMixpanelServer, SyntheticData
+from tap_mixpanel.page_sizing import PageSizer
+from tap_mixpanel.rate_limiter import RateLimiter
+from tap_mixpanel.streams import Engage
+
+START_DATE = "2022-01-01T00:00:00Z"
+
+
+class TestPageSizer(unittest.TestCase):
+    """Test the page size adapted to the responses."""
+
+    def test_grows_within_budgets(self):
+        """Test the page size doubles after full pages while a page twice as large fits the budgets."""
+        sizer = PageSizer(250, seconds_budget=10, byte_budget=1000000)
+
+        sizer.observe(records=250, response_bytes=250000, seconds=1)
+        self.assertEqual(sizer.page_size, 500)
+        # A partial page, e.g. the last one, does not grow the page size
+        sizer.observe(records=100, response_bytes=100000, seconds=0.4)
+        self.assertEqual(sizer.page_size, 500)
+        # 1000 records would take 1000000 bytes, within the budget
+        sizer.observe(records=500, response_bytes=500000, seconds=2)
+        self.assertEqual(sizer.page_size, 1000)
+        # The maximum page size
+        sizer.observe(records=1000, response_bytes=1000, seconds=0.1)
+        self.assertEqual(sizer.page_size, 1000)
+
+    def test_halved_over_budget(self):
+        """Test the page size is halved until a page fits the budgets, down to the minimum."""
+        sizer = PageSizer(1000, seconds_budget=10, stats={"seconds_per_record": 0.01})
+
+        sizer.observe(records=1000, response_bytes=1000, seconds=40)
+        # 40 and 10 milliseconds per record, 25 on average
+        self.assertEqual(sizer.page_size, 250)
+        self.assertEqual(sizer.stats["page_size"], 250)
+
+        sizer.observe(records=250, response_bytes=1000, seconds=250)
+        self.assertEqual(sizer.page_size, 125)
+
+    def test_back_off(self):
+        """Test a failed request halves its page size, which is not grown again."""
+        sizer = PageSizer(500, stats={"seconds_per_record": 0.001})
+
+        self.assertTrue(sizer.back_off(500))
+        self.assertEqual(sizer.page_size, 250)
+        sizer.observe(records=250, response_bytes=1000, seconds=0.01)
+        self.assertEqual(sizer.page_size, 250)
+
+        self.assertTrue(sizer.back_off(250))
+        self.assertFalse(sizer.back_off(125))
+
+    @parameterized.expand([
+        ("grown_not_aligned", 500, 250, 750, (250, 3)),
+        ("grown_aligned", 500, 250, 1000, (500, 2)),
+        ("halved", 250, 500, 1000, (250, 4)),
+        ("unchanged", 250, 250, 750, (250, 3)),
+    ])
+    def test_next_page(self, name, page_size, limit, offset, expected):
+        """Test the page size only changes at an offset which is a multiple of the new size."""
+        sizer = PageSizer(page_size)
+        self.assertEqual(sizer.get_next_page(offset, limit), expected)
+
+
+class TestEngagePageSize(unittest.TestCase):
+    """Test the engage page size from the config, against the fake server."""
+
+    def setUp(self):
+        self.server = FakeMixpanelServer(SyntheticData(seed=1, profiles=2200, properties_per_profile=2)).start()
+        self.client = MixpanelClient(
+            "secret", "mixpanel.com", 30, rate_limiter=RateLimiter(None, None), base_url=self.server.url
+        )
+        self.page_sizes = []
+        request_with_size = self.client.request_with_size
+
+        def record_page_size(*args, **kwargs):
+            self.page_sizes.append(int(kwargs["params"].split("page_size=")[1].split("&")[0]))
+            return request_with_size(*args, **kwargs)
+
+        # Also called by the requests of a fixed page size
+        self.client.request_with_size = mock.Mock(side_effect=record_page_size)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def sync(self, state, config):
+        written = []
+
+        def process_records(**kwargs):
+            written.extend(record["distinct_id"] for record in kwargs["records"])
+            return None, len(kwargs["records"])
+
+        with mock.patch.object(Engage, "process_records", side_effect=process_records):
+            total = Engage(self.client).sync(
+                state, None, {**config, "start_date": START_DATE}, START_DATE, ["engage"]
+            )
+        self.assertEqual(total, 2200)
+        self.assertEqual(written, [f"user-{index}" for index in range(2200)])
+
+    def test_fixed_page_size(self):
+        """Test the configured page size is requested."""
+        self.sync({}, {"engage_page_size": "1000"})
+        self.assertEqual(self.page_sizes, [1000, 1000, 1000])
+
+    def test_auto_page_size(self):
+        """Test the page size grows from the default size, and is kept in the state."""
+        state = {}
+        self.sync(state, {"engage_page_size": "auto"})
+
+        # 250 + 500 + 1000 + 1000 records, the page size changing at its multiples
+        self.assertEqual(self.page_sizes, [250, 250, 500, 1000, 1000])
+        self.assertEqual(state["page_stats"]["engage"]["page_size"], 1000)
+
+    @mock.patch("tap_mixpanel.page_sizing.LOGGER.warning")
+    def test_auto_page_size_backs_off(self, mock_warning):
+        """Test a page failing with a 5xx is requested again in smaller pages."""
+        request_with_size = self.client.request_with_size.side_effect
+
+        def fail_large_pages(*args, **kwargs):
+            if "page_size=1000" in kwargs["params"]:
+                raise Server5xxError()
+            return request_with_size(*args, **kwargs)
+
+        self.client.request_with_size.side_effect = fail_large_pages
+        state = {"page_stats": {"engage": {"page_size": 1000}}}
+        self.sync(state, {"engage_page_size": "auto"})
+
+        mock_warning.assert_called_once()
+        # Pages of 500 records from the start, where the page of 1000 failed
+        self.assertEqual(self.page_sizes, [500] * 5)
+        self.assertEqual(state["page_stats"]["engage"]["page_size"], 500)
+
+    def test_auto_page_size_with_prefetch(self):
+        """Test the pages requested ahead are measured by their own requests."""
+        observed = []
+        observe = PageSizer.observe
+
+        def record_observe(sizer, **kwargs):
+            observed.append(kwargs)
+            return observe(sizer, **kwargs)
+
+        with mock.patch.object(PageSizer, "observe", autospec=True, side_effect=record_observe):
+            self.sync({}, {"engage_page_size": "auto", "page_prefetch": "2"})
+
+        self.assertEqual([kwargs["records"] for kwargs in observed], [250, 250, 500, 1000, 200])
+        for kwargs in observed:
+            # The bytes of the page alone, not of the pages received meanwhile
+            self.assertGreater(kwargs["seconds"], 0)
+            self.assertTrue(150 * kwargs["records"] < kwargs["response_bytes"] < 300 * kwargs["records"])
@@ -0,0 +1,58 @@
+import unittest
+from unittest import mock
+
+from tap_mixpanel.client import MixpanelClient
+from tap_mixpanel.fake_server import FakeMixpanelServer, SyntheticData
+from tap_mixpanel.parent_ids import ParentIds
+from tap_mixpanel.rate_limiter import RateLimiter
+from tap_mixpanel.streams import Cohorts, MixPanel
+
+START_DATE = "2022-01-01T00:00:00Z"
+
+
+class TestParentIds(unittest.TestCase):
+    """Test the view of the parent ids handed to a child stream."""
+
+    def test_read_only_ids(self):
+        """Test the child sees read-only mappings of the ids, read from the parent records."""
+        records = [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]
+        parent_ids = ParentIds(records, "id")
+        # Not copied, the records are read when iterated
+        records.append({"id": 3})
+
+        parent_records = list(parent_ids)
+        self.assertEqual(len(parent_ids), 3)
+        self.assertEqual([dict(record) for record in parent_records], [{"id": 1}, {"id": 2}, {"id": 3}])
+        with self.assertRaises(TypeError):
+            parent_records[0]["id"] = 4
+        self.assertFalse(ParentIds([], "id"))
+
+
+class TestCohortsChild(unittest.TestCase):
+    """Test the cohort members are synced from the ids of the cohorts, against the fake server."""
+
+    def setUp(self):
+        self.data = SyntheticData(seed=1, profiles=600, properties_per_profile=2, cohorts=3)
+        self.server = FakeMixpanelServer(self.data).start()
+        self.client = MixpanelClient(
+            "secret", "mixpanel.com", 30, rate_limiter=RateLimiter(None, None), base_url=self.server.url
+        )
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_parent_records_unchanged(self):
+        """Test the cohorts written after their members are the records of the response."""
+        written = {}
+
+        def process_records(_, catalog, stream_name, records, *args, **kwargs):
+            written.setdefault(stream_name, []).extend(records)
+            return None, len(records)
+
+        config = {"start_date": START_DATE}
+        with mock.patch.object(MixPanel, "process_records", autospec=True, side_effect=process_records):
+            Cohorts(self.client).sync({}, None, config, START_DATE, ["cohorts", "cohort_members"])
+
+        self.assertEqual(written["cohorts"], self.data.cohorts_list())
+        self.assertEqual(len(written["cohort_members"]), 600)
+        self.assertEqual({record["cohort_id"] for record in written["cohort_members"]}, {1, 2, 3})
@@ -0,0 +1,161 @@
+import json
+import random
+import time
+import unittest
+from unittest import mock
+
+import requests
+from parameterized import parameterized
+
+from tap_mixpanel.decoder import iter_jsonl
+from tap_mixpanel.pipeline import Pipeline
+from tap_mixpanel.streams import Export
+
+
+def get_chunks(lines, chunk_size):
+    """Get the jsonl body of the lines cut into chunks of chunk_size bytes."""
+    body = b"".join(json.dumps(line).encode("utf-8") + b"\n" for line in lines)
+    return [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+
+def decode_block(block):
+    """Transform of a block, taking a random time to finish the blocks out of order."""
+    time.sleep(random.random() / 1000)
+    return list(iter_jsonl([block]))
+
+
+class TestPipeline(unittest.TestCase):
+    """Test the staged pipeline of the export download."""
+
+    @parameterized.expand([
+        ["single_worker", 1, 7],
+        ["several_workers", 4, 7],
+        ["single_chunk", 4, 100000],
+    ])
+    def test_records_in_read_order(self, name, workers, chunk_size):
+        """Test the blocks are yielded in read order, with the lines spanning chunks joined."""
+        lines = [{"id": i, "name": "x" * (i % 5)} for i in range(300)]
+        pipeline = Pipeline(get_chunks(lines, chunk_size), decode_block, workers=workers)
+
+        records = [record for block in pipeline for record in block]
+
+        self.assertEqual(records, lines)
+
+    def test_last_line_without_new_line(self):
+        """Test the last line is transformed even if the body does not end with a new line."""
+        pipeline = Pipeline([b'{"id": 1}\n{"i', b'd": 2}'], decode_block)
+
+        self.assertEqual([record for block in pipeline for record in block], [{"id": 1}, {"id": 2}])
+
+    def test_reader_error_raised(self):
+        """Test an exception of the reader is raised by the iteration."""
+        def chunks():
+            yield b'{"id": 1}\n'
+            raise requests.exceptions.ChunkedEncodingError()
+
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            list(Pipeline(chunks(), decode_block, workers=2))
+
+    def test_transform_error_raised(self):
+        """Test an exception of a transform worker is raised by the iteration."""
+        def transform(block):
+            raise Exception("Missing Key")
+
+        with self.assertRaises(Exception) as error:
+            list(Pipeline(get_chunks([{"id": 1}], 100), transform))
+
+        self.assertEqual(str(error.exception), "Missing Key")
+
+    def test_bounded_read_ahead(self):
+        """Test the reader stops reading ahead of a slow writer once the queues are full."""
+        read = []
+
+        def chunks():
+            for i in range(100):
+                read.append(i)
+                yield b'{"id": %d}\n' % i
+
+        pipeline = Pipeline(chunks(), decode_block, workers=2, queue_size=2)
+        iterator = iter(pipeline)
+        next(iterator)
+        # Let the reader and the workers fill the queues
+        time.sleep(0.2)
+
+        # At most 2 queued blocks, 2 blocks being transformed, 2 results and 1 blocked put
+        self.assertLessEqual(len(read), 10)
+        iterator.close()
+
+    def test_stats(self):
+        """Test the busy time of every stage is measured."""
+        pipeline = Pipeline(get_chunks([{"id": i} for i in range(50)], 10), decode_block, workers=2)
+        for _ in pipeline:
+            time.sleep(0.001)
+
+        self.assertEqual(pipeline.stats.blocks["write"], pipeline.stats.blocks["transform"])
+        utilization = pipeline.stats.utilization({"transform": 2})
+        self.assertEqual(set(utilization), {"read", "transform", "write"})
+        self.assertTrue(all(0 <= value <= 1 for value in utilization.values()))
+        self.assertGreater(utilization["write"], 0)
+
+
+class TestExportPipeline(unittest.TestCase):
+    """Test the export stream written through the pipeline."""
+
+    def get_written_records(self, pipeline_workers):
+        lines = [
+            {"event": "Signed up", "properties": {"time": 1662000000 + i, "distinct_id": str(i), "n": i}}
+            for i in range(1000)
+        ]
+        mock_client = mock.Mock()
+        mock_client.request_export_chunks.side_effect = lambda **kwargs: iter(get_chunks(lines, 997))
+        mock_client.request_export.side_effect = lambda **kwargs: iter(lines)
+        stream = Export(mock_client)
+        stream.pipeline_workers = pipeline_workers
+
+        written = []
+
+        def process_records(**kwargs):
+            written.extend(kwargs["records"])
+            return None, len(kwargs["records"])
+
+        with mock.patch.object(Export, "process_records", side_effect=process_records):
+            result = stream.get_and_transform_records(
+                querystring="", project_timezone="UTC", max_bookmark_value=None, state={},
+                config={}, catalog=None, selected_streams=["export"], last_datetime=None,
+                endpoint_total=0, limit=250, total_records=0, parent_total=0, record_count=0,
+                page=0, offset=0, parent_record=None, date_total=0,
+            )
+        return result, written
+
+    def test_same_records_as_serial(self):
+        """Test the pipeline writes the same records in the same order as the serial download."""
+        serial_result, serial_records = self.get_written_records(0)
+        pipeline_result, pipeline_records = self.get_written_records(2)
+
+        self.assertEqual(len(serial_records), 1000)
+        self.assertEqual(pipeline_records, serial_records)
+        # Same endpoint_total and total_records
+        self.assertEqual(pipeline_result[5], serial_result[5])
+        self.assertEqual(pipeline_result[7], serial_result[7])
+
+    @mock.patch("time.sleep", return_value=None)
+    def test_chunked_encoding_error_retried(self, mock_sleep):
+        """Test a ChunkedEncodingError of the pipeline reader is retried as the serial download."""
+        def chunks(**kwargs):
+            raise requests.exceptions.ChunkedEncodingError()
+            yield  # pylint: disable=unreachable
+
+        mock_client = mock.Mock()
+        mock_client.request_export_chunks.side_effect = chunks
+        stream = Export(mock_client)
+        stream.pipeline_workers = 1
+
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            stream.get_and_transform_records(
+                querystring="", project_timezone="UTC", max_bookmark_value=None, state={},
+                config={}, catalog=None, selected_streams=["export"], last_datetime=None,
+                endpoint_total=0, limit=250, total_records=0, parent_total=0, record_count=0,
+                page=0, offset=0, parent_record=None, date_total=0,
+            )
+
+        self.assertEqual(mock_client.request_export_chunks.call_count, 5)
@@ -0,0 +1,111 @@
+import threading
+import unittest
+from unittest import mock
+
+from parameterized import parameterized
+
+from tap_mixpanel.client import MixpanelClient
+from tap_mixpanel.fake_server import FakeMixpanelServer, SyntheticData
+from tap_mixpanel.prefetch import PagePrefetcher
+from tap_mixpanel.rate_limiter import RateLimiter
+from tap_mixpanel.streams import CohortMembers, Engage
+
+START_DATE = "2022-01-01T00:00:00Z"
+
+
+class TestPagePrefetcher(unittest.TestCase):
+    """Test the pages requested ahead."""
+
+    def test_max_pages_not_read(self):
+        """Test at most max_pages are requested ahead, and read pages make room for the next ones."""
+        mock_request = mock.Mock(side_effect=lambda querystring: {"querystring": querystring})
+        prefetcher = PagePrefetcher(mock_request, 2)
+
+        prefetcher.prefetch(["page=1", "page=2", "page=3"])
+        self.assertEqual(list(prefetcher.pages), ["page=1", "page=2"])
+        self.assertEqual(prefetcher.get("page=1"), {"querystring": "page=1"})
+
+        prefetcher.prefetch(["page=2", "page=3", "page=4"])
+        self.assertEqual(list(prefetcher.pages), ["page=2", "page=3"])
+        # A page not requested ahead is requested directly
+        self.assertEqual(prefetcher.get("page=0"), {"querystring": "page=0"})
+        prefetcher.close()
+
+        self.assertEqual(mock_request.call_count, 4)
+
+    def test_close_cancels_queued_pages(self):
+        """Test the pages not started yet are not requested once closed."""
+        started = threading.Event()
+        release = threading.Event()
+
+        def request(querystring):
+            started.set()
+            release.wait(5)
+            return {}
+
+        mock_request = mock.Mock(side_effect=request)
+        prefetcher = PagePrefetcher(mock_request, 1)
+        prefetcher.max_pages = 3
+        prefetcher.prefetch(["page=1", "page=2", "page=3"])
+        started.wait(5)
+        # The first page completes while the queued pages are cancelled
+        threading.Timer(0.1, release.set).start()
+        prefetcher.close()
+
+        self.assertEqual(mock_request.call_count, 1)
+
+
+class TestPagePrefetch(unittest.TestCase):
+    """Test the paginated streams with the next pages requested ahead, against the fake server."""
+
+    def setUp(self):
+        self.server = FakeMixpanelServer(
+            SyntheticData(seed=1, profiles=1100, properties_per_profile=2, cohorts=2), latency=0.01
+        ).start()
+        self.client = MixpanelClient(
+            "secret", "mixpanel.com", 30, rate_limiter=RateLimiter(None, None), base_url=self.server.url
+        )
+
+    def tearDown(self):
+        self.server.stop()
+
+    def sync(self, stream_class, config, parent_data=None):
+        written = []
+
+        def process_records(**kwargs):
+            written.extend(kwargs["records"])
+            return None, len(kwargs["records"])
+
+        stream = stream_class(self.client)
+        with mock.patch.object(stream_class, "process_records", side_effect=process_records):
+            total = stream.sync(
+                {}, None, {**config, "start_date": START_DATE}, START_DATE, [stream.tap_stream_id], parent_data
+            )
+        self.assertIsNone(stream.page_prefetcher)
+        return total, written
+
+    @parameterized.expand([("one_page", "1"), ("pages", "3")])
+    def test_engage_same_records(self, name, page_prefetch):
+        """Test the same profiles are written in the same order, without extra requests."""
+        _, expected = self.sync(Engage, {})
+        # Less the request checking the access
+        requests = self.server.stats["requests"]["engage"] - 1
+
+        total, written = self.sync(Engage, {"page_prefetch": page_prefetch})
+
+        self.assertEqual(total, 1100)
+        self.assertEqual(written, expected)
+        self.assertEqual(self.server.stats["requests"]["engage"] - 1, 2 * requests)
+
+    def test_cohort_members_same_records(self):
+        """Test the members of every cohort are written after each other."""
+        parent_data = [{"id": 1}, {"id": 2}]
+        _, expected = self.sync(CohortMembers, {}, parent_data)
+
+        total, written = self.sync(CohortMembers, {"page_prefetch": "2"}, parent_data)
+
+        self.assertEqual(total, 1100)
+        self.assertEqual(written, expected)
+        self.assertEqual(
+            [record["cohort_id"] for record in written], [1] * 550 + [2] * 550
+        )
@@ -0,0 +1,70 @@
+import unittest
+from unittest import mock
+
+from singer import Catalog
+
+from tap_mixpanel.streams import Export
+
+
+def get_catalog():
+    """Return a catalog of the export stream with its date-time replication key."""
+    return Catalog.from_dict({
+        "streams": [{
+            "tap_stream_id": "export",
+            "stream": "export",
+            "key_properties": [],
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "event": {"type": ["null", "string"]},
+                    "time": {"type": ["null", "string"], "format": "date-time"},
+                },
+            },
+            "metadata": [{"breadcrumb": [], "metadata": {"selected": True}}],
+        }]
+    })
+
+
+class TestProcessRecords(unittest.TestCase):
+    """Test the bookmark filtering and max tracking of `process_records`."""
+
+    @mock.patch("tap_mixpanel.streams.output.write_record")
+    def test_bookmark_filter_and_max(self, mock_write_record):
+        """Test records before last_datetime are skipped and the max bookmark is tracked."""
+        records = [
+            {"event": "a", "time": "2022-09-01T04:59:59Z"},
+            {"event": "b", "time": "2022-09-01T05:00:00Z"},
+            {"event": "c", "time": "2022-09-03T00:00:00+02:00"},
+            {"event": "d", "time": "2022-09-02T00:00:00Z"},
+        ]
+        max_bookmark_value, record_count = Export(None).process_records(
+            catalog=get_catalog(),
+            stream_name="export",
+            records=records,
+            time_extracted=None,
+            bookmark_field="time",
+            # State values are not necessarily normalized
+            max_bookmark_value="2022-09-01T05:00:00+00:00",
+            last_datetime="2022-09-01T07:00:00+02:00",
+        )
+
+        written = [call.args[1]["event"] for call in mock_write_record.call_args_list]
+        self.assertEqual(written, ["b", "c", "d"])
+        self.assertEqual(record_count, 3)
+        self.assertEqual(max_bookmark_value, "2022-09-02T22:00:00.000000Z")
+
+    @mock.patch("tap_mixpanel.streams.output.write_record")
+    def test_max_bookmark_kept(self, mock_write_record):
+        """Test the max bookmark is kept when no record is after it."""
+        max_bookmark_value, _ = Export(None).process_records(
+            catalog=get_catalog(),
+            stream_name="export",
+            records=[{"event": "a", "time": "2022-09-01T00:00:00Z"}],
+            time_extracted=None,
+            bookmark_field="time",
+            max_bookmark_value="2022-09-05T00:00:00Z",
+            last_datetime="2022-09-01T00:00:00Z",
+        )
+
+        self.assertEqual(mock_write_record.call_count, 1)
+        self.assertEqual(max_bookmark_value, "2022-09-05T00:00:00Z")
@@ -0,0 +1,88 @@
+import unittest
+from unittest import mock
+
+from parameterized import parameterized
+from tap_mixpanel import client
+from tap_mixpanel.rate_limiter import RateLimiter, get_endpoint_class
+
+EXPORT_URL = "https://data.mixpanel.com/api/2.0/export"
+QUERY_URL = "https://mixpanel.com/api/2.0/engage"
+
+
+class MockResponse:
+    """Mocked HTTPResponse with rate limit headers."""
+
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class TestRateLimiter(unittest.TestCase):
+    """
+    Test that the rate limiter paces requests and honors rate limit headers.
+    """
+
+    @mock.patch("time.sleep")
+    @mock.patch("time.monotonic", return_value=1000.0)
+    def test_requests_paced_per_endpoint_class(self, mock_monotonic, mock_sleep):
+        """
+        Test that export requests beyond the burst wait for a token,
+        while the query API is not paced by default.
+        """
+        rate_limiter = RateLimiter(export_rate_limit=2)
+        for _ in range(3):
+            rate_limiter.acquire(EXPORT_URL)
+            rate_limiter.acquire(QUERY_URL)
+
+        # Verify that only the 3rd export request waited for half a second
+        mock_sleep.assert_called_once_with(0.5)
+
+    @parameterized.expand([
+        ["retry_after_seconds", {"Retry-After": "30"}, 30],
+        ["rate_limit_reset_delay", {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "12"}, 12],
+        ["rate_limit_remaining", {"X-RateLimit-Remaining": "10", "X-RateLimit-Reset": "12"}, None],
+    ])
+    @mock.patch("time.sleep")
+    @mock.patch("time.monotonic", return_value=1000.0)
+    def test_rate_limit_headers(self, test_name, headers, expected_wait, mock_monotonic, mock_sleep):
+        """
+        Test that the requests are blocked as requested by the response headers.
+        """
+        rate_limiter = RateLimiter()
+        rate_limiter.update_from_response(QUERY_URL, MockResponse(429, headers))
+        rate_limiter.acquire(QUERY_URL)
+
+        if expected_wait:
+            mock_sleep.assert_called_once_with(expected_wait)
+        else:
+            self.assertFalse(mock_sleep.called)
+
+    @mock.patch("time.sleep")
+    @mock.patch("time.monotonic", return_value=1000.0)
+    @mock.patch("requests.Session.request")
+    def test_client_shares_rate_limiter(self, mock_request, mock_monotonic, mock_sleep):
+        """
+        Test that a `Retry-After` from one response pauses the next request of the client.
+        """
+        mock_request.side_effect = [
+            MockResponse(200, {"Retry-After": "5"}),
+            MockResponse(200),
+        ]
+        mock_client = client.MixpanelClient("mock_api_secret", "mock_api_domain", 300)
+
+        mock_client.perform_request("GET", url=QUERY_URL)
+        mock_client.perform_request("GET", url=QUERY_URL)
+
+        # Verify that the second request waited for the `Retry-After` delay
+        mock_sleep.assert_called_once_with(5)
+
+    @parameterized.expand([
+        ["export", EXPORT_URL, "export"],
+        ["eu_export", "https://data-eu.mixpanel.com/api/2.0/export", "export"],
+        ["query", QUERY_URL, "query"],
+    ])
+    def test_get_endpoint_class(self, test_name, url, expected_class):
+        """
+        Test that URLs are classified as export or query API endpoints.
+        """
+        self.assertEqual(get_endpoint_class(url), expected_class)
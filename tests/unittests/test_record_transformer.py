@@ -0,0 +1,128 @@
+import copy
+import decimal
+import random
+import unittest
+
+from parameterized import parameterized
+from singer import Transformer, metadata
+from singer.transform import SchemaMismatch
+
+from tap_mixpanel.record_transformer import RecordTransformer
+
+ENGAGE_TYPES = {
+    "boolean": {"type": ["null", "boolean"]},
+    "number": {"type": ["null", "string"], "format": "singer.decimal"},
+    "datetime": {"type": ["null", "string"], "format": "date-time"},
+    "object": {"type": ["null", "object"], "additionalProperties": True},
+    "list": {"type": ["null", "array"], "items": {}},
+    "string": {"type": ["null", "string"]},
+}
+
+SCHEMA = {
+    "type": "object",
+    "additionalProperties": True,
+    "properties": {
+        "distinct_id": {"type": ["null", "string"]},
+        "time": {"type": ["null", "string"], "format": "date-time"},
+        "count": {"type": ["null", "integer"]},
+        "ratio": {"type": ["null", "number"]},
+        "labels": {"anyOf": [{"type": "array", "items": {"type": "string"}}, {"type": "null"}]},
+        "steps": {
+            "anyOf": [
+                {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "count": {"type": ["null", "integer"]},
+                            "avg_time": {"type": ["null", "number"]},
+                            "event": {"type": ["null", "string"]},
+                        },
+                    },
+                },
+                {"type": "null"},
+            ]
+        },
+        # Engage properties, each type first in turn
+        **{
+            f"prop_{name}": {"anyOf": [ENGAGE_TYPES[name]] + [
+                value for key, value in ENGAGE_TYPES.items() if key != name
+            ]}
+            for name in ENGAGE_TYPES
+        },
+    },
+}
+
+VALUES = [
+    None, "", "abc", "false", "False", "1,234", "12.5", "2020-01-01T10:00:00Z",
+    "2020-02-30", 0, 1, -7, 3.75, True, False, decimal.Decimal("1.10"),
+    [], ["a", 1], {}, {"nested": [1, 2]},
+]
+
+
+def generate_record(rng):
+    """Generate a record with random values for the schema fields."""
+    record = {}
+    for key in SCHEMA["properties"]:
+        if rng.random() < 0.9:
+            record[key] = copy.deepcopy(rng.choice(VALUES))
+    if rng.random() < 0.5:
+        record["steps"] = [{"count": rng.choice(VALUES), "event": "Sign Up", "extra": 1}]
+    record["unknown"] = "removed"
+    return record
+
+
+def singer_transform(record, schema, stream_metadata):
+    """Transform the record with singer.Transformer."""
+    with Transformer() as transformer:
+        return transformer.transform(record, schema, stream_metadata)
+
+
+class TestRecordTransformer(unittest.TestCase):
+    """Test the compiled record transformer against singer.Transformer."""
+
+    def setUp(self):
+        mdata = metadata.get_standard_metadata(
+            schema=SCHEMA, key_properties=["distinct_id"], valid_replication_keys=["time"]
+        )
+        mdata = metadata.to_map(mdata)
+        mdata = metadata.write(mdata, ("properties", "time"), "inclusion", "automatic")
+        mdata = metadata.write(mdata, ("properties", "prop_string"), "selected", False)
+        self.stream_metadata = mdata
+
+    @parameterized.expand([(seed,) for seed in range(5)])
+    def test_same_records_as_singer_transformer(self, seed):
+        """Test the records are the same as singer.Transformer ones, or both raise SchemaMismatch."""
+        rng = random.Random(seed)
+        record_transformer = RecordTransformer(copy.deepcopy(SCHEMA), self.stream_metadata)
+        for _ in range(500):
+            record = generate_record(rng)
+            try:
+                expected = repr(singer_transform(copy.deepcopy(record), copy.deepcopy(SCHEMA), self.stream_metadata))
+            except SchemaMismatch:
+                expected = SchemaMismatch
+            try:
+                transformed = repr(record_transformer.transform(record))
+            except SchemaMismatch:
+                transformed = SchemaMismatch
+            self.assertEqual(transformed, expected)
+
+    def test_deselected_field_removed(self):
+        """Test the deselected fields are removed and the automatic fields are kept."""
+        self.stream_metadata = metadata.write(self.stream_metadata, ("properties", "time"), "selected", False)
+        record_transformer = RecordTransformer(SCHEMA, self.stream_metadata)
+        transformed = record_transformer.transform(
+            {"distinct_id": "1", "prop_string": "a", "time": "2020-01-01T00:00:00Z"}
+        )
+        self.assertEqual(transformed, {"distinct_id": "1", "time": "2020-01-01T00:00:00.000000Z"})
+
+    def test_nested_metadata(self):
+        """Test the metadata of the nested fields is applied."""
+        schema = {"type": "object", "properties": {"a": {"type": "object", "properties": {
+            "b": {"type": "string"}, "c": {"type": "string"}}}}}
+        stream_metadata = {("properties", "a", "properties", "b"): {"selected": False}}
+        record = {"a": {"b": "x", "c": "y"}}
+        self.assertEqual(
+            RecordTransformer(schema, stream_metadata).transform(copy.deepcopy(record)),
+            singer_transform(record, schema, stream_metadata),
+        )
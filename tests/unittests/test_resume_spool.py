@@ -0,0 +1,92 @@
+import json
+import unittest
+from unittest import mock
+
+import requests
+
+from tap_mixpanel.resume_spool import ResumeSpool
+from tap_mixpanel.streams import Export
+
+LINES = [
+    {"event": "Signed up", "properties": {"time": 1662000000 + i, "distinct_id": str(i)}}
+    for i in range(1000)
+]
+
+
+def get_chunks(lines, chunk_size=997, break_at=None):
+    """Get the jsonl body of the lines in chunks, broken after break_at bytes if set."""
+    body = b"".join(json.dumps(line).encode("utf-8") + b"\n" for line in lines)
+    for index in range(0, len(body), chunk_size):
+        if break_at is not None and index >= break_at:
+            raise requests.exceptions.ChunkedEncodingError()
+        yield body[index:index + chunk_size]
+
+
+class TestResumeSpool(unittest.TestCase):
+    """Test the lines written by an earlier attempt are skipped."""
+
+    def read(self, spool, chunks, commit_after):
+        lines = []
+        try:
+            for line in spool.iter_chunks(chunks):
+                lines.append(line)
+                if len(lines) == commit_after:
+                    spool.commit(len(lines), "bookmark")
+        except requests.exceptions.ChunkedEncodingError:
+            pass
+        return lines
+
+    def test_resume_after_written_lines(self):
+        """Test a retry reads only the lines after the committed ones."""
+        spool = ResumeSpool("from_date=2022-09-01")
+        body = [1, 2, 3, 4, 5]
+
+        chunks = get_chunks(body, chunk_size=4, break_at=8)
+        self.assertEqual(self.read(spool, chunks, commit_after=2), [b"1\n", b"2\n", b"3\n", b"4\n"])
+        # Lines read but not committed are read again
+        self.assertEqual(self.read(spool, get_chunks(body), commit_after=None), [b"3\n", b"4\n", b"5\n"])
+        self.assertEqual((spool.records, spool.max_bookmark_value), (2, "bookmark"))
+
+    def test_different_body_read_again(self):
+        """Test the lines from the first difference with the earlier attempt are read again."""
+        spool = ResumeSpool("from_date=2022-09-01")
+        self.read(spool, iter([b"1\n2\n3\n4\n"]), commit_after=3)
+
+        with self.assertLogs(level="WARNING"):
+            lines = self.read(spool, iter([b"1\n3\n2\n4\n"]), commit_after=None)
+
+        self.assertEqual(lines, [b"3\n", b"2\n", b"4\n"])
+        spool.close()
+
+
+class TestExportResume(unittest.TestCase):
+    """Test a retried export date window resumes after its written records."""
+
+    @mock.patch("time.sleep", return_value=None)
+    def test_retry_resumes(self, mock_sleep):
+        """Test each record is written once and the totals cover both attempts."""
+        attempts = iter([get_chunks(LINES, break_at=60000), get_chunks(LINES)])
+        mock_client = mock.Mock()
+        mock_client.request_export_chunks.side_effect = lambda **kwargs: next(attempts)
+        stream = Export(mock_client)
+        stream.resume_retries = True
+        written = []
+
+        def process_records(**kwargs):
+            written.extend(kwargs["records"])
+            return kwargs["records"][-1]["time"], len(kwargs["records"])
+
+        with mock.patch.object(Export, "process_records", side_effect=process_records):
+            result = stream.get_and_transform_records(
+                querystring="", project_timezone="UTC", max_bookmark_value=None, state={},
+                config={}, catalog=None, selected_streams=["export"], last_datetime=None,
+                endpoint_total=0, limit=100, total_records=0, parent_total=0, record_count=0,
+                page=0, offset=0, parent_record=None, date_total=0,
+            )
+
+        self.assertEqual(mock_client.request_export_chunks.call_count, 2)
+        self.assertEqual([record["distinct_id"] for record in written], [str(i) for i in range(1000)])
+        # date_total, endpoint_total and max_bookmark_value
+        self.assertEqual((result[1], result[5]), (1000, 1000))
+        self.assertEqual(result[6], written[-1]["time"])
+        self.assertIsNone(stream.resume_spool)
@@ -78,3 +78,15 @@ class TestTransformRecord(unittest.TestCase):
 
         # Verify that returned record is expected
         self.assertEqual(transformed_dict, expected_dict)
+
+    def test_transform_funnels_not_updating_records(self):
+        """
+        Test that the funnels record and its parent record are not updated in place.
+        """
+        record = {"count": 1}
+        parent_record = {"funnel_id": 2}
+
+        transformed_dict = transform_record(record, "funnels", "UTC", parent_record)
+
+        self.assertEqual(transformed_dict, {"count": 1, "funnel_id": 2})
+        self.assertEqual((record, parent_record), ({"count": 1}, {"funnel_id": 2}))
@@ -1,8 +1,10 @@
 import pytz
 import unittest
+from unittest import mock
 
 from datetime import datetime
-from tap_mixpanel.transform import transform_event_times
+from tap_mixpanel.streams import Export
+from tap_mixpanel.transform import EventTimeConverter, get_event_time_converter, transform_event_times
 
 UTC = pytz.utc
 
@@ -50,3 +52,65 @@ class TestTransformEventTimes(unittest.TestCase):
 
         # Verify that record uis converted as expected.
         self.assertEqual(expected, actual)
+
+    def test_daylight_saving_time_changes(self):
+        """
+        Testcase for the event times around the DST changes of the project timezone.
+        """
+        project_timezone = "US/Eastern"
+        EASTERN = pytz.timezone(project_timezone)
+        converter = get_event_time_converter(project_timezone)
+        for dst_change in (datetime(2021, 3, 14, 2, 0, 0), datetime(2021, 11, 7, 1, 0, 0)):
+            start = int(EASTERN.localize(dst_change).timestamp()) - 7200
+            for time_int in range(start, start + 4 * 3600, 601):
+                expected = datetime.fromtimestamp(time_int, UTC).strftime("%04Y-%m-%dT%H:%M:%S.000000Z")
+                # Verify that the time is the same instant in UTC
+                self.assertEqual(expected, transform_event_times({"time": time_int}, project_timezone)["time"])
+                self.assertEqual(expected, converter.convert(time_int))
+
+    def test_convert_records(self):
+        """
+        Testcase for the batch conversion of the event times of a list of records.
+        """
+        converter = get_event_time_converter("Asia/Kolkata")
+        records = [{"time": 0}, {"time": -1}, {"time": 1628780400.9}]
+
+        actual = converter.convert_records(records)
+
+        # Verify that the records are converted in place
+        self.assertIs(actual, records)
+        self.assertEqual(
+            [record["time"] for record in records],
+            ["1970-01-01T00:00:00.000000Z", "1969-12-31T23:59:59.000000Z", "2021-08-12T15:00:00.000000Z"],
+        )
+
+    @mock.patch("tap_mixpanel.streams.EVENT_TIME_BATCH_SIZE", 2)
+    def test_export_transform_records(self):
+        """
+        Testcase for the export records converted by batches of records.
+        """
+        records = [{"event": "a", "properties": {"time": time_int, "$os": "Linux"}} for time_int in (0, 60, 3600)]
+        convert_records = EventTimeConverter.convert_records
+
+        with mock.patch.object(
+            EventTimeConverter, "convert_records", autospec=True, side_effect=convert_records
+        ) as mock_convert_records:
+            transformed = list(Export(mock.Mock()).transform_records(iter(records + [{}]), "UTC"))
+
+        # Verify that the event times are converted once per batch
+        self.assertEqual([len(call[0][1]) for call in mock_convert_records.call_args_list], [2, 1])
+        self.assertEqual(
+            transformed,
+            [
+                {"event": "a", "time": "1970-01-01T00:00:00.000000Z", "mp_reserved_os": "Linux"},
+                {"event": "a", "time": "1970-01-01T00:01:00.000000Z", "mp_reserved_os": "Linux"},
+                {"event": "a", "time": "1970-01-01T01:00:00.000000Z", "mp_reserved_os": "Linux"},
+            ],
+        )
+
+    def test_invalid_timezone(self):
+        """
+        Testcase for an unknown project timezone.
+        """
+        with self.assertRaises(pytz.UnknownTimeZoneError):
+            transform_event_times({"time": 0}, "Mars/Olympus_Mons")
@@ -0,0 +1,125 @@
+import contextlib
+import io
+import json
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import pytz
+import singer
+
+from tap_mixpanel import transform_pool
+from tap_mixpanel.record_transformer import RecordTransformer
+from tap_mixpanel.streams import Export
+from tap_mixpanel.transform_pool import TransformPool
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "event": {"type": ["null", "string"]},
+        "time": {"type": ["null", "string"], "format": "date-time"},
+        "distinct_id": {"type": ["null", "string"]},
+        "amount": {"type": ["null", "number"]},
+    },
+}
+TIME_EXTRACTED = datetime(2022, 9, 2, tzinfo=pytz.utc)
+
+
+def get_block(count, start=1661990400):
+    """Get a block of raw export lines, one event per minute."""
+    return b"".join(
+        json.dumps({
+            "event": "Signed up",
+            "properties": {"time": start + 60 * i, "distinct_id": f"user-{i}", "amount": i},
+        }).encode("utf-8") + b"\n"
+        for i in range(count)
+    )
+
+
+class TestTransformWorker(unittest.TestCase):
+    """Test the transform of a block in the worker process."""
+
+    def setUp(self):
+        transform_pool.init_worker("export", SCHEMA, {}, "UTC", "time")
+
+    def tearDown(self):
+        transform_pool.WORKER.clear()
+
+    def test_same_messages_as_process_records(self):
+        """Test the serialized records are written as the transformed records are."""
+        last_datetime = "2022-09-01T00:30:00Z"
+        stream = Export(mock.Mock())
+        catalog = mock.Mock()
+        catalog.get_stream.return_value.schema.to_dict.return_value = SCHEMA
+        catalog.get_stream.return_value.metadata = []
+
+        serial, serialized = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(serial):
+            records = list(stream.transform_records(
+                (json.loads(line) for line in get_block(100).splitlines()), "UTC"
+            ))
+            serial_result = stream.process_records(
+                catalog, "export", records, TIME_EXTRACTED, "time", None, last_datetime
+            )
+            singer.write_state({})
+        with contextlib.redirect_stdout(serialized):
+            serialized_result = stream.process_serialized_records(
+                catalog, "export", transform_pool.transform_block(get_block(100)),
+                TIME_EXTRACTED, "time", None, last_datetime,
+            )
+            singer.write_state({})
+
+        # The records before last_datetime are not written, the max bookmark is the last record
+        self.assertEqual(serialized_result, ("2022-09-01T01:39:00.000000Z", 70))
+        self.assertEqual(serialized_result, serial_result)
+        self.assertEqual(serialized.getvalue(), serial.getvalue())
+
+    def test_schema_mismatch(self):
+        """Test a record not matching the schema raises a plain exception with the singer message."""
+        block = b'{"event": "Signed up", "properties": {"time": 1661990400, "distinct_id": "a", "amount": "x"}}\n'
+
+        with self.assertRaises(Exception) as error:
+            transform_pool.transform_block(block)
+
+        self.assertIs(type(error.exception), Exception)
+        self.assertIn("amount", str(error.exception))
+
+
+class TestTransformPool(unittest.TestCase):
+    """Test the blocks transformed on worker processes."""
+
+    def test_transform_on_processes(self):
+        """Test the worker processes transform the blocks and send back their errors."""
+        record_transformer = RecordTransformer(SCHEMA, {})
+        with TransformPool(1, "export", record_transformer, "UTC", "time") as pool:
+            records = pool.transform_block(get_block(3))
+            with self.assertRaises(Exception) as error:
+                pool.transform_block(
+                    b'{"event": "Signed up", "properties": {"time": 1661990400, "distinct_id": "a", "amount": "x"}}\n'
+                )
+
+        self.assertEqual([record[1] for record in records], [
+            "2022-09-01T00:00:00.000000Z",
+            "2022-09-01T00:01:00.000000Z",
+            "2022-09-01T00:02:00.000000Z",
+        ])
+        self.assertEqual(json.loads(records[0][2])["distinct_id"], "user-0")
+        self.assertIn("amount", str(error.exception))
+
+    @mock.patch("tap_mixpanel.streams.MixPanel.sync", return_value=5)
+    @mock.patch("tap_mixpanel.streams.TransformPool")
+    def test_pool_per_sync(self, mock_pool, mock_sync):
+        """Test the pool is started for the export sync only if `transform_processes` is set."""
+        catalog = mock.Mock()
+        catalog.get_stream.return_value.schema.to_dict.return_value = SCHEMA
+        catalog.get_stream.return_value.metadata = []
+        stream = Export(mock.Mock())
+
+        stream.sync({}, catalog, {}, "2022-09-01T00:00:00Z", ["export"])
+        self.assertFalse(mock_pool.called)
+
+        total = stream.sync({}, catalog, {"transform_processes": "4"}, "2022-09-01T00:00:00Z", ["export"])
+        self.assertEqual(total, 5)
+        self.assertEqual(mock_pool.call_args.args[0], 4)
+        self.assertTrue(mock_pool.return_value.__exit__.called)
+        self.assertIsNone(stream.transform_pool)
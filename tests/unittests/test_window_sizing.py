@@ -0,0 +1,133 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import pytz
+from tap_mixpanel.streams import Export, Funnels
+from tap_mixpanel.window_sizing import WindowSizer
+
+NOW_TIME = datetime(year=2022, month=10, day=1).replace(tzinfo=pytz.UTC)
+
+
+class TestWindowSizer(unittest.TestCase):
+    """Test the date window size follows the observed volume."""
+
+    def test_initial_size(self):
+        """Test the configured size is used until the volume is known, within the bounds."""
+        self.assertEqual(WindowSizer(30, byte_budget=1000).days_interval, 30)
+        self.assertEqual(WindowSizer(30, byte_budget=1000, max_days=10).days_interval, 10)
+        self.assertEqual(WindowSizer(0, byte_budget=1000, min_days=2).days_interval, 2)
+        # The volume observed by an earlier sync
+        stats = {"bytes_per_day": 100, "seconds_per_day": 0.1, "records_per_day": 1}
+        self.assertEqual(WindowSizer(30, byte_budget=1000, stats=stats).days_interval, 10)
+
+    def test_shrink_to_budgets(self):
+        """Test the size follows the tightest budget per request."""
+        sizer = WindowSizer(30, byte_budget=10000, seconds_budget=5)
+
+        # 100 bytes and 0.5 seconds per day for each of the 2 requests
+        sizer.observe(days=30, requests=2, records=600, response_bytes=6000, seconds=30)
+
+        self.assertEqual(sizer.days_interval, 10)
+        self.assertEqual(sizer.stats, {"bytes_per_day": 100, "seconds_per_day": 0.5, "records_per_day": 10})
+
+    def test_growth_is_capped(self):
+        """Test the size grows at most 4 times per date window and up to the maximum."""
+        sizer = WindowSizer(2, byte_budget=10 ** 9, max_days=100)
+
+        sizer.observe(days=2, requests=1, records=2, response_bytes=200, seconds=0.01)
+        self.assertEqual(sizer.days_interval, 8)
+        sizer.observe(days=8, requests=1, records=8, response_bytes=800, seconds=0.01)
+        self.assertEqual(sizer.days_interval, 32)
+        sizer.observe(days=32, requests=1, records=32, response_bytes=3200, seconds=0.01)
+        self.assertEqual(sizer.days_interval, 100)
+
+    def test_moving_average(self):
+        """Test a single busy date window does not collapse the size."""
+        sizer = WindowSizer(10, byte_budget=1000, stats={"bytes_per_day": 100})
+
+        sizer.observe(days=10, requests=1, records=10, response_bytes=3000, seconds=1)
+
+        self.assertEqual(sizer.stats["bytes_per_day"], 200)
+        self.assertEqual(sizer.days_interval, 5)
+
+    def test_empty_days(self):
+        """Test a date window without any volume grows the size, without dividing by zero."""
+        sizer = WindowSizer(5, byte_budget=1000, max_days=60)
+
+        sizer.observe(days=5, requests=1, records=0, response_bytes=0, seconds=0)
+        self.assertEqual(sizer.days_interval, 20)
+        sizer.observe(days=0, requests=0, records=0, response_bytes=0, seconds=0)
+        self.assertEqual(sizer.days_interval, 20)
+
+
+class TestDateWindowSizing(unittest.TestCase):
+    """Test the date windows of the streams are sized from the observed volume."""
+
+    def test_date_windows_follow_sizer(self):
+        """Test the size of each date window is read after the previous one is synced."""
+        stream = Export(mock.Mock())
+        sizer = WindowSizer(10, byte_budget=1000)
+        date_windows = stream.get_date_windows(
+            start_window=datetime(2022, 9, 1, tzinfo=pytz.UTC),
+            end_window=datetime(2022, 9, 11, tzinfo=pytz.UTC),
+            now_datetime=NOW_TIME,
+            days_interval=10,
+            window_sizer=sizer,
+        )
+
+        windows = []
+        for start_window, end_window in date_windows:
+            windows.append((start_window.day, end_window.day))
+            sizer.days_interval = 2
+
+        self.assertEqual(windows, [(1, 11), (12, 13), (14, 15), (16, 17)] + [
+            (day, day + 1) for day in range(18, 30, 2)
+        ] + [(30, 1)])
+
+    def test_not_sized_without_budget(self):
+        """Test the date window size is only adapted if a budget is configured."""
+        stream = Funnels(mock.Mock())
+        self.assertIsNone(stream.get_window_sizer({}, {}, 30))
+
+        sizer = stream.get_window_sizer(
+            {"window_stats": {"funnels": {"seconds_per_day": 1}}},
+            {"date_window_seconds_budget": "7", "date_window_max_size": "60"},
+            30,
+        )
+        self.assertEqual(sizer.days_interval, 7)
+        self.assertEqual(sizer.max_days, 60)
+
+    @mock.patch("tap_mixpanel.streams.Funnels.write_bookmark")
+    @mock.patch("tap_mixpanel.streams.MixPanel.get_and_transform_records")
+    def test_sync_observes_date_windows(self, mock_get_and_transform_records, mock_write_bookmark):
+        """Test the funnels sync sizes its date windows and keeps the volume in the state."""
+        client = mock.Mock(response_count=0, response_bytes=0)
+
+        def get_and_transform_records(*args):
+            # A funnel request of 1000 bytes per requested day
+            from_date, to_date = [
+                datetime.strptime(args[0].split(f"{name}=")[1][:10], "%Y-%m-%d") for name in ("from_date", "to_date")
+            ]
+            client.response_count += 1
+            client.response_bytes += 1000 * ((to_date - from_date).days + 1)
+            return 1, 1, 1, 0, None, 1, args[2], 1
+
+        mock_get_and_transform_records.side_effect = get_and_transform_records
+        stream = Funnels(client)
+        state = {}
+        config = {
+            "date_window_size": "8",
+            "date_window_byte_budget": "2000",
+            "attribution_window": "0",
+            "end_date": "2022-09-20T00:00:00Z",
+        }
+
+        stream.sync(state, None, config, "2022-09-01T00:00:00Z", ["funnels"], parent_data=[{"funnel_id": 1}])
+
+        from_dates = [
+            call.args[0].split("from_date=")[1][:10] for call in mock_get_and_transform_records.call_args_list
+        ]
+        self.assertEqual(from_dates[:3], ["2022-09-01", "2022-09-10", "2022-09-12"])
+        self.assertEqual(state["window_stats"]["funnels"]["bytes_per_day"], 1000)
+        self.assertEqual(mock_write_bookmark.call_count, len(from_dates))